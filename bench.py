@@ -0,0 +1,1019 @@
+"""
+Timing comparison for the section generators in menu.py.
+
+Renders the real sheet tiled up to larger catalogs, once with the row-at-a-time
+loops menu.py used to run (kept below as reference implementations) and once with
+the column renderers, checks that both produce byte-identical LaTeX and prints
+the time each one took.
+
+Run with `python3 bench.py [rows ...]`; `python3 bench.py --help` lists the
+other comparisons (build stages, targets, server, images, backends, chunks).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import math
+import tempfile
+import time
+
+import pandas as pd
+
+import menu
+from menu import escape_latex, format_grape_variety, format_region
+
+
+### Row-at-a-time reference implementations
+
+def legacy_generate_wine_entry(glass_price, carafe_price, bottle_price, vintage, winery, wine_name, grape_variety, winemaker, region, description, current_heading):
+    """
+    Generate LaTeX code for a wine entry.
+    
+    Arguments:
+    glass_price    - Price for a glass of wine
+    carafe_price   - Price for a carafe of wine
+    bottle_price   - Price for a bottle of wine
+    vintage        - Wine vintage (year)
+    winery         - Winery name
+    wine_name      - Name of the wine
+    grape_variety  - Grape variety used
+    winemaker      - Winemaker(s) name(s)
+    region         - Wine region
+    description    - Description of the wine
+    
+    Returns:
+    LaTeX formatted string
+    """
+    if type(carafe_price) == str:
+        carafe_price = 0
+    if current_heading in ["Wine - Sweet", "Wine - Sparkling"]:
+
+        return f"""    
+    {{\\\\{glass_price}/{bottle_price}}} & {{{vintage} {winery} {wine_name} \\\\ {format_grape_variety(grape_variety)} \\\\ {winemaker}}} & {{{format_region(region)}}} \\\\
+    \\\\
+    \\SetCell[c=3]{{\\linewidth}}{{{description}}} \\\\
+    \\SetCell[c=3]{{\\linewidth}} & & \\\\
+"""
+    else:
+        return f"""    
+    {{\\\\{glass_price}/{math.ceil(carafe_price)}/{bottle_price}}} & {{{vintage} {winery} {wine_name} \\\\ {format_grape_variety(grape_variety)} \\\\ {winemaker}}} & {{{format_region(region)}}} \\\\
+    \\\\
+    \\SetCell[c=3]{{\\linewidth}}{{{description}}} \\\\
+    \\SetCell[c=3]{{\\linewidth}} & & \\\\
+"""
+
+def legacy_generate_wine_menu(data):
+    current_heading = None
+    table = ""
+    count = 0
+
+    for index, row in data.iterrows():
+        # Check for new heading
+        if row["Heading"] != current_heading:
+            # Close previous longtblr environment if necessary
+            if current_heading is not None:
+                table += "\\end{longtblr}\n\n\\vspace{-15pt} \n"
+            # Start new longtblr environment
+            current_heading = row["Heading"]
+            count += 1
+            table += f"""
+\\begin{{longtblr}}[
+    theme = TASMenu,
+    caption = \\LARGE{{{escape_latex(current_heading)}}},
+    halign = j,
+    valign = m,
+]{{
+    width = \\linewidth,
+    colspec = llr,
+}}
+
+\\hline\\hline
+    \\SetCell[c=3]{{\\linewidth}} & & \\\\
+            """
+            # count = 0  # Reset the count for the new heading
+
+        # Prepare the row data
+        glass_price = row["Glass"] if pd.notna(row["Glass"]) else ""
+        glass_price = int(glass_price) if isinstance(glass_price, (float, int)) and glass_price == int(glass_price) else glass_price
+        carafe_price = row["Carafe"] if pd.notna(row["Carafe"]) else ""
+        carafe_price = int(carafe_price) if isinstance(carafe_price, (float, int)) and carafe_price == int(carafe_price) else carafe_price
+        bottle_price = row["Bottle"] if pd.notna(row["Bottle"]) else ""
+        bottle_price = int(bottle_price) if isinstance(bottle_price, (float, int)) and bottle_price == int(bottle_price) else bottle_price
+        vintage = escape_latex(str(row["Vintage"])) if pd.notna(row["Vintage"]) else ""
+        winery = escape_latex(row["Winery"]) if pd.notna(row["Winery"]) else ""
+        wine_name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else ""
+        grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else ""
+        winemaker = escape_latex(row["Winemaker and/or Owner"]) if pd.notna(row["Winemaker and/or Owner"]) else ""
+        region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
+        description = escape_latex(row["Description"]) if pd.notna(row["Description"]) else ""
+
+        # Add the wine entry
+        table += legacy_generate_wine_entry(glass_price, carafe_price, bottle_price, vintage, winery, wine_name, grape_variety, winemaker, region, description, current_heading)
+        count += 1
+
+        # Add a pagebreak if needed
+        if count >= 4:
+            table += """    \\pagebreak
+    \\\\"""
+            count = 0
+
+    # Close the last longtblr environment
+    if current_heading is not None:
+        table += "\\end{longtblr}\n\n\\vspace{-15pt} \n"
+    
+    table = table.replace(
+        """    \\pagebreak
+    \\\\\\end{longtblr}
+
+\\vspace{-15pt} 
+""",
+"""    
+    \\end{longtblr}
+
+\\vspace{-15pt} 
+\\pagebreak"""
+    )
+
+    table = table.replace(
+        """"Hill of Dreams" \\\\ Sauvignon Blanc, \\\\""",""""Hill of Dreams" \\\\ Sauvignon Blanc, """)
+    
+    table = table.replace("""Wines "Block 5""", """Wines \\\\ "Block 5""")
+
+    table = table.replace(
+    r"""    \SetCell[c=3]{\linewidth} & & \\
+    \pagebreak
+    \\    
+    {\\17/64/85} & {2022 Nashdale Lane "Legacy Rosé" \\ Shiraz \\ 	Tanya and Nick Segger} & {Nashdale, \\Orange} \\
+    \\
+    \SetCell[c=3]{\linewidth}{The Legacy series is all about a patient winemaking approach. Using the heavier grape pressings and aged in seasoned oak for 10 months, this richer style is for everyone enjoying a chilled red. This wine shows aromas of wild strawberries, raspberries and exotic spices leading to a smooth textured finish.} \\
+    \SetCell[c=3]{\linewidth} & & \\
+\end{longtblr}
+
+\vspace{-15pt} 
+
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{Wine - Red},
+    halign = j,
+    valign = m,
+]{
+    width = \linewidth,
+    colspec = llr,
+}
+""",
+    r"""    \\    
+    {\\17/64/85} & {2022 Nashdale Lane "Legacy Rosé" \\ Shiraz \\ 	Tanya and Nick Segger} & {Nashdale, \\Orange} \\
+    \\
+    \SetCell[c=3]{\linewidth}{The Legacy series is all about a patient winemaking approach. Using the heavier grape pressings and aged in seasoned oak for 10 months, this richer style is for everyone enjoying a chilled red. This wine shows aromas of wild strawberries, raspberries and exotic spices leading to a smooth textured finish.} \\
+    \SetCell[c=3]{\linewidth} & & \\
+\end{longtblr}
+
+\vspace{-15pt} 
+\pagebreak
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{Wine - Red},
+    halign = j,
+    valign = m,
+]{
+    width = \linewidth,
+    colspec = llr,
+}
+"""
+)
+
+    return table
+
+def legacy_format_beer_cider_row(row):
+    """
+    Generate LaTeX row for Beer & Cider table.
+    Maps `Winery`, `Region`, and `Name` to the LaTeX format.
+    """
+    winery = escape_latex(row["Winery"]) if pd.notna(row["Winery"]) else ""
+    region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
+    name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else ""
+    glass_price = f"{int(row['Glass'])}" if row["Glass"].is_integer() else f"{row['Glass']:.1f}" if pd.notna(row["Glass"]) else ""
+
+    
+    return rf"""
+\SetCell[c=3]{{\linewidth}} & & \\
+{glass_price} & {{{winery} \\ {region}}} & {{{name}}} \\
+"""
+
+def legacy_generate_beer_cider_table(data):
+    table = r"""
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{Beer \& Cider},
+    halign = j,
+    valign = m,
+]{
+    width = \textwidth,
+    colspec = cll,
+    % hlines,
+    % vlines,
+}
+\hline\hline
+"""
+    # Generate rows
+    for _, row in data.iterrows():
+        table += legacy_format_beer_cider_row(row)
+
+    # Close the table
+    table += r"""
+\end{longtblr}
+"""
+    return table
+
+def legacy_format_cocktail_row(row):
+    """
+    Generate LaTeX row for Cocktails table.
+    Maps `Glass`, `Name`, and `Description` to the LaTeX format.
+    """
+    glass_price = int(row["Glass"]) if pd.notna(row["Glass"]) else ""
+    name = row["Name"] if pd.notna(row["Name"]) else ""
+    name = escape_latex(name)
+    description = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else ""
+
+    return rf"""
+    {glass_price} & {name} & {description} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
+
+def legacy_generate_cocktail_table(data):
+    table = r"""
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{Cocktails},
+    halign = j,
+    valign = m,
+]{
+    width = \linewidth,
+    colspec = cll,
+    % hlines,
+    % vlines,
+}
+\hline\hline
+    \SetCell[c=3]{\linewidth} & & \\
+"""
+    # Generate rows
+    for _, row in data.iterrows():
+        table += legacy_format_cocktail_row(row)
+
+    # Close the table
+    table += r"""
+\end{longtblr}
+"""
+    return table
+
+def legacy_format_spirit_row(row, spirit_name, displayed_names=set()):
+    """
+    Generate LaTeX row for spirits table.
+    Escapes special characters in `Name` and `Grape Variety`.
+    """
+    glass_price = f"{int(row['Glass'])}" if row["Glass"].is_integer() else f"{row['Glass']:.1f}" if pd.notna(row["Glass"]) else ""
+    name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else ""
+    grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else ""
+    region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
+
+    combined_name_location = f"{name} \\\\ {region}" if region else name
+    if combined_name_location in displayed_names:
+        combined_name_location = ""  # Replace with an empty string if repeated
+    else:
+        displayed_names.add(combined_name_location)  # Mark as displayed
+
+    if spirit_name == "Vodka":
+         return (rf"""
+    {glass_price} & {{{combined_name_location}}} & \quad \quad \quad \quad \quad {{{grape_variety}}} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+""", displayed_names)
+    elif spirit_name == "Liqueur":
+         return (rf"""
+    {glass_price} & {{{combined_name_location}}} & \quad \quad \quad \quad \quad \quad {{{grape_variety}}} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+""", displayed_names)        
+    else:
+        return (rf"""
+    {glass_price} & {{{combined_name_location}}} & {{{grape_variety}}} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+""", displayed_names)
+
+def legacy_generate_spirit_table(data, spirit_name):
+    table = rf"""
+\needspace{{10\baselineskip}}
+\begin{{longtblr}}[
+    theme = TASMenu,
+    caption = \LARGE{{Spirits - {spirit_name}}},
+    halign = j,
+    valign = m,
+]{{
+    width = \linewidth,
+    colspec = cll,
+    % hlines,
+    % vlines,
+}}
+\hline\hline
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
+    disp_names = set()  # Track displayed names to avoid repetition
+    # Generate rows
+    for _, row in data.iterrows():
+        res = legacy_format_spirit_row(row, spirit_name, displayed_names=disp_names)
+        table += res[0]
+        disp_names = res[1]
+
+    # Close the table
+    table += r"""
+\end{longtblr}
+"""
+    return table
+
+def legacy_format_more_spirit_row(row):
+    """
+    Generate LaTeX row for spirits table.
+    Escapes special characters in `Name` and `Grape Variety`.
+    """
+    glass_price = f"{int(row['Glass'])}" if row["Glass"].is_integer() else f"{row['Glass']:.1f}" if pd.notna(row["Glass"]) else ""
+    name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else ""
+    grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else ""
+    region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
+
+    combined_name_location = f"{name} \\\\ {region}" if region else name
+
+    return rf"""
+    {glass_price} & {{{combined_name_location}}} & {{{grape_variety}}} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
+
+def legacy_generate_more_spirits_table(data):
+    """
+    Generate LaTeX table for Pisco, Soju, Amaro, Vermouth, or PX under the title 'More Spirits from NSW'.
+    """
+    table = r"""
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{More Spirits from NSW},
+    halign = j,
+    valign = m,
+]{
+    width = \linewidth,
+    colspec = cll,
+    % hlines,
+    % vlines,
+}
+\hline\hline
+    \SetCell[c=3]{\linewidth} & & \\
+
+"""
+    # Initialize a set to track displayed names
+    displayed_names = set()
+
+    # Generate rows
+    for _, row in data.iterrows():
+        table += legacy_format_more_spirit_row(row)
+
+    # Close the table
+    table += r"""
+\end{longtblr}
+"""
+    return table
+
+def legacy_generate_non_alcoholic_table(data):
+    """
+    Generate LaTeX table for Non-alcoholic items.
+    """
+    table = r"""
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{Non-alcoholic},
+    halign = j,
+    valign = m,
+]{
+    width = \linewidth,
+    colspec = cll,
+    % hlines,
+    % vlines,
+}
+\hline\hline\\
+"""
+    # Generate rows
+    for _, row in data.iterrows():
+        glass_price = (
+            f"{int(row['Glass'])}" if pd.notna(row["Glass"]) and row["Glass"].is_integer()
+            else f"{row['Glass']:.1f}" if pd.notna(row["Glass"])
+            else "~"
+        )
+        name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else "~"
+        region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
+        grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else "~"
+    
+        # Combine name and location, deduplicate if repeated
+        combined_name_location = f"{name} \\\\ {region}" if region else name
+
+        # Add rows to the table
+        table += rf"""
+    {glass_price} & {{{combined_name_location}}} & {grape_variety} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
+        
+    table += r"""
+    4.5 & Sparkling water & Unlimited  \\
+    \SetCell[c=3]{\linewidth} & & \\
+    \vspace{-10pt}
+    -   & {tap\textsuperscript{\texttrademark} by Sydney Water \\ Wollondilly Shire } & ~ \\
+    \SetCell[c=3]{\linewidth, halign=l} Bearing no notes or hints of anything, this special blend suits all tastes. Officially known as ``tap\textsuperscript{\texttrademark} A Sydney Water Product'', locals refer to it as the ``Warragamba Slammer'' & ~ & ~ \\
+    """
+
+    table += r"""
+\end{longtblr}
+"""
+    return table
+
+def legacy_generate_food_table(data):
+    """
+    Generate LaTeX table for food items.
+    """
+    table = r"""
+\begin{longtblr}[
+    theme = TASMenu,
+    caption = \LARGE{Food},
+    halign = j,
+    valign = m,
+]{
+    width = \linewidth,
+    colspec = cll,
+    % hlines,
+    % vlines,
+}
+\hline\hline
+\\
+"""
+    # Generate rows
+    for _, row in data.iterrows():
+        glass_price = (
+            f"{int(row['Glass'])}" if pd.notna(row["Glass"]) and row["Glass"].is_integer()
+            else f"{row['Glass']:.1f}" if pd.notna(row["Glass"])
+            else "~"
+        )
+        name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else "~"
+        description = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else "~"
+
+        # Add row to the table
+        table += rf"""
+    {glass_price} & {name} & {{{description}}} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
+    table += r"""
+\end{longtblr}
+"""
+    return table
+
+
+### Benchmark
+
+def sections(df):
+    """
+    Split `df` into the frames menu.py passes to each section generator.
+    """
+    heading = df["Heading"]
+    yield "wine", df[heading.str.contains(r'\bWine - ', na=False)]
+    yield "beer_cider", df[heading.str.contains(r'\bBeer & Cider\b', na=False)]
+    yield "cocktails", df[heading.str.contains(r'\b(?:Cocktails|Mocktail)\b', na=False)]
+    for spirit, pattern in menu.SECTION_SPECS["spirits"]["groups"]:
+        yield f"spirits_{spirit}", df[heading.str.contains(pattern, na=False)]
+    yield "more_spirits", df[heading.str.contains(menu.SECTION_SPECS["more_spirits"]["route"], na=False)]
+    yield "non_alcoholic", df[heading.str.contains(r'\bNon-alcoholic\b', na=False, case=False)].iloc[1:-1]
+    yield "food", df[heading.str.contains(r'\bFood\b', na=False, case=False)]
+
+def generators(section):
+    """
+    Return the (legacy, column) generator pair for `section`.
+    """
+    if section.startswith("spirits_"):
+        spirit = section.split("_", 1)[1]
+        return (
+            lambda data: legacy_generate_spirit_table(data, spirit),
+            lambda data: menu.render_spec_table(menu.SECTION_SPECS["spirits"], data, spirit),
+        )
+    legacy = {
+        "wine": legacy_generate_wine_menu,
+        "beer_cider": legacy_generate_beer_cider_table,
+        "cocktails": legacy_generate_cocktail_table,
+        "more_spirits": legacy_generate_more_spirits_table,
+        "non_alcoholic": legacy_generate_non_alcoholic_table,
+        "food": legacy_generate_food_table,
+    }[section]
+    return legacy, lambda data: menu.render_section(section, data)
+
+def timed(function, data):
+    start = time.perf_counter()
+    output = function(data)
+    return output, time.perf_counter() - start
+
+def without_needspace(latex):
+    return re.sub(r"^\\needspace\{.*\}\n", "", latex, flags=re.M)
+
+def tile(df, rows):
+    """
+    Repeat the rows of `df` (keeping headings grouped) until there are at least `rows` rows.
+    """
+    copies = max(1, math.ceil(rows / len(df)))
+    return pd.concat([df] * copies).sort_values("Heading", kind="stable", na_position="last")
+
+def legacy_escape_latex(text):
+    """
+    The escaper menu.py used to have: one str.replace pass per special character.
+    """
+    if not isinstance(text, str):
+        return text
+
+    for char, escape in [('&', r'\&'), ('%', r'\%'), ('$', r'\$'), ('#', r'\#'), ('_', r'\_'), ('{', r'\{'), ('}', r'\}'), ('~', r'\textasciitilde{}'), ('^', r'\textasciicircum{}')]:
+        text = text.replace(char, escape)
+    return text
+
+def bench_escape(df, sizes):
+    """
+    Time escaping every text cell with the old per-character passes against the
+    single-pass escaper, cell by cell and a whole column at a time.
+    """
+    print(f"{'rows':>8} {'replace (s)':>12} {'regex (s)':>10} {'column (s)':>11} {'speedup':>8}")
+    for rows in sizes:
+        data = tile(df, rows)
+        columns = [data[c] for c in ("Winery", "Name", "Grape Variety", "Winemaker and/or Owner", "Region", "Description")]
+        cells = [value for col in columns for value in col.dropna()]
+        expected, legacy_time = timed(lambda cells: [legacy_escape_latex(v) for v in cells], cells)
+        actual, regex_time = timed(lambda cells: [escape_latex(v) for v in cells], cells)
+        _, column_time = timed(lambda columns: [menu.escaped_column(col) for col in columns], columns)
+        if actual != expected:
+            sys.exit(f"escaped text differs from the old escaper at {rows} rows")
+        print(f"{len(data):>8} {legacy_time:>12.4f} {regex_time:>10.4f} {column_time:>11.4f} {legacy_time / regex_time:>7.1f}x")
+
+def bench_loops(df, sizes):
+    """
+    Time the row loops against the column renderers, section by section.
+    """
+    print(f"{'rows':>8} {'section':<16} {'loops (s)':>10} {'columns (s)':>12} {'speedup':>8}")
+    for rows in sizes:
+        data = tile(df, rows)
+        total_legacy = total_column = 0.0
+        for section, section_df in sections(data):
+            legacy, column = generators(section)
+            expected, legacy_time = timed(legacy, section_df)
+            actual, column_time = timed(column, section_df)
+            # The wine list is paginated by estimated height now rather than
+            # every four rows, so only its timing is compared, and the spirit
+            # tables size their \needspace from their rows
+            if section != "wine" and without_needspace(actual) != without_needspace(expected):
+                sys.exit(f"{section}: column renderer output differs from the loops at {rows} rows")
+            total_legacy += legacy_time
+            total_column += column_time
+            print(f"{len(data):>8} {section:<16} {legacy_time:>10.4f} {column_time:>12.4f} {legacy_time / column_time:>7.1f}x")
+        print(f"{len(data):>8} {'total':<16} {total_legacy:>10.4f} {total_column:>12.4f} {total_legacy / total_column:>7.1f}x")
+
+def bench_parallel(df, sizes, jobs):
+    """
+    Time rendering every section one after another against a pool of `jobs`
+    processes, which is used at every size here whatever menu.POOL_ROWS says.
+    """
+    menu.POOL_ROWS = 0
+    print(f"{'rows':>8} {'serial (s)':>11} {f'{jobs} jobs (s)':>12} {'speedup':>8}")
+    for rows in sizes:
+        data = tile(df, rows)
+        tasks = [(name, section_df) for name, section_df, _ in menu.select_sections(data)]
+        expected, serial_time = timed(lambda tasks: menu.render_sections(tasks, 1), tasks)
+        actual, parallel_time = timed(lambda tasks: menu.render_sections(tasks, jobs), tasks)
+        if actual != expected:
+            sys.exit(f"parallel output differs from the serial output at {rows} rows")
+        print(f"{len(data):>8} {serial_time:>11.4f} {parallel_time:>12.4f} {serial_time / parallel_time:>7.1f}x")
+
+# Files menu.tex needs next to it to compile
+MENU_ASSETS = ["menu.tex", "Art Syndicate_LOGO_v2_FINAL.png", "Wine Map.png"]
+
+def compile_menu(data, backend, images=False, chunked=False):
+    """
+    Write the tables for `data` with `backend` into a scratch copy of menu.tex,
+    with the preamble the backend needs and the chunk theme if `chunked`, and
+    compile it, with print-resolution copies of the images if `images`.
+    The size of the PDF is added to what `compile_pdf` returns.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        for asset in MENU_ASSETS:
+            shutil.copy(asset, directory)
+        menu.add_to_preamble(os.path.join(directory, "menu.tex"), menu.TABLE_BACKENDS[backend]["preamble"])
+        if chunked:
+            menu.add_to_preamble(os.path.join(directory, "menu.tex"), menu.WINE_CHUNK_PREAMBLE)
+        for name, section_df, _ in menu.select_sections(data):
+            menu.write_section(os.path.join(directory, menu.SECTION_FILES[name]), menu.render_section(name, section_df, backend))
+        if images:
+            menu.use_menu_images(os.path.join(directory, "menu.tex"))
+            if menu.optimize_images(os.path.join(directory, "menu.tex")) is None:
+                sys.exit("Pillow is needed to make print-resolution images")
+        compiled = menu.compile_pdf(os.path.join(directory, "menu.tex"))
+        compiled["size"] = os.path.getsize(compiled["pdf"]) if os.path.exists(compiled["pdf"]) else None
+        return compiled
+
+def bench_backends(df, sizes):
+    """
+    Compile the menu with every table backend, on the real sheet and tiled up to each size.
+    """
+    if shutil.which(menu.LATEX) is None:
+        sys.exit(f"{menu.LATEX} is needed to compare the table backends")
+    print(f"{'rows':>8} {'backend':<10} {'compile (s)':>12} {'passes':>7} {'pages':>6}")
+    for data in [df] + [tile(df, rows) for rows in sizes]:
+        for backend in menu.TABLE_BACKENDS:
+            compiled = compile_menu(data, backend)
+            print(f"{len(data):>8} {backend:<10} {compiled['seconds']:>12.2f} {compiled['passes']:>7} {compiled['pages']!s:>6}")
+
+def memory_used(compiled, name):
+    memory = (compiled["memory"] or {}).get(name)
+    return "-" if memory is None else f"{memory[0]:,}"
+
+# Entries in each chunk --chunks compiles when it is not given a number
+CHUNK_ROWS = 100
+
+def bench_chunks(sizes, chunk_rows):
+    """
+    Compile synthetic workbooks of each size with the wine list in one table
+    per heading and split into chunks of `chunk_rows` entries, and print the
+    compile time and the memory TeX logged in menu.log for each.
+    """
+    if shutil.which(menu.LATEX) is None:
+        sys.exit(f"{menu.LATEX} is needed to compare the chunk sizes")
+    sources = menu.read_section_specs()
+    wine = [source["name"] for source in sources if source.get("layout") == "wine"]
+    print(f"{'rows':>8} {'wines':>6} {'chunk':>6} {'compile (s)':>12} {'pages':>6} {'main memory':>12} {'save stack':>11}")
+    try:
+        for rows in sizes:
+            data = synthetic_sheet(rows)
+            wines = sum(len(section_df) for name, section_df, _ in menu.select_sections(data) if name in wine)
+            for chunk in (0, chunk_rows):
+                menu.use_section_specs([dict(source, chunk_rows=chunk) if source["name"] in wine else source
+                                        for source in sources])
+                compiled = compile_menu(data, "longtblr", chunked=bool(chunk))
+                print(f"{rows:>8} {wines:>6} {chunk or '-':>6} {compiled['seconds']:>12.2f} {compiled['pages']!s:>6} "
+                      f"{memory_used(compiled, 'main'):>12} {memory_used(compiled, 'save'):>11}")
+    finally:
+        menu.use_section_specs(sources)
+
+### Synthetic workbooks
+
+# Every heading family of the real sheet, in its order, with the share of the
+# rows each one gets. Agave matches no section, like in data.xlsx.
+SYNTHETIC_HEADINGS = [
+    ("Wine - Sparkling", 3), ("Wine - White", 7), ("Wine - Amber", 1), ("Wine - Rosé", 2), ("Wine - Red", 7),
+    ("Wine - Sweet", 1), ("Wine - Non-alcoholic", 1), ("Beer & Cider", 8), ("Cocktails", 9), ("Mocktail", 3),
+    ("Gin", 5), ("Vodka", 4), ("Whisky", 8), ("Rum", 2), ("Pisco", 1), ("Soju", 1), ("Agave", 2), ("Amaro", 1),
+    ("Vermouth", 3), ("Liqueur", 3), ("PX", 1), ("Non-alcoholic", 11), ("Food", 4),
+]
+
+# Words for the text cells, with the characters escape_latex has to handle
+SYNTHETIC_WORDS = (
+    "Hunter Orange Mudgee Hilltops Riverina Tumbarumba Shiraz Chardonnay Riesling Nebbiolo Sangiovese "
+    "Semillon Fiano Prosecco Rosé Brut Estate Vineyard Block \"Legacy\" single-malt barrel-aged 100% "
+    "Smith_&_Sons #3 $12 ~ ^ {house} Pét-Nat Cuvée Müller oak cherry plum spice citrus long finish"
+).split()
+
+def synthetic_words(rng, count):
+    return " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(count))
+
+def synthetic_price(rng, low, high):
+    return rng.randint(low * 2, high * 2) / 2
+
+def glass_range(heading, low=4, high=30):
+    """
+    The glass prices of a row under `heading`: `low` to `high`, narrowed to
+    the range the spec of its section allows (see menu_sections.json).
+    """
+    routes = menu.match_routes(heading)
+    if routes:
+        lowest, highest = menu.SECTION_SPECS[routes[0]]["prices"].get("Glass", (low, high))
+        low, high = max(low, math.ceil(lowest)), min(high, math.floor(highest))
+    return low, high
+
+def synthetic_row(rng, heading):
+    """
+    One row of 'The Data' under `heading`, filled the way the real sheet fills its family.
+    """
+    row = dict.fromkeys(menu.USED_COLUMNS, None)
+    row["Heading"] = heading
+    row["Name"] = synthetic_words(rng, rng.randint(1, 3))
+    if heading.startswith("Wine - "):
+        row["Glass"] = float(rng.randint(11, 19))
+        if heading not in menu.NO_CARAFE_HEADINGS:
+            row["Carafe"] = float(rng.randint(40, 70))
+        row["Bottle"] = float(rng.randint(60, 120))
+        row["Vintage"] = "NV" if rng.random() < 0.05 else rng.randint(2015, 2024)
+        row["Winery"] = synthetic_words(rng, rng.randint(1, 4))
+        row["Grape Variety"] = ", ".join(synthetic_words(rng, 1) for _ in range(rng.randint(1, 4)))
+        row["Winemaker and/or Owner"] = synthetic_words(rng, rng.randint(2, 5))
+        row["Region"] = synthetic_words(rng, rng.randint(1, 3))
+        row["Description"] = synthetic_words(rng, rng.randint(20, 70))
+    else:
+        row["Glass"] = synthetic_price(rng, *glass_range(heading))
+        row["Grape Variety"] = synthetic_words(rng, rng.randint(2, 8)) if rng.random() < 0.7 else None
+        row["Region"] = synthetic_words(rng, 2) if rng.random() < 0.6 else None
+        row["Winery"] = synthetic_words(rng, 2)
+    return row
+
+def synthetic_sheet(rows, seed=0):
+    """
+    A 'The Data' sheet of about `rows` rows shaped like data.xlsx: every heading
+    family in the same order and proportions, blank rows between some of them,
+    and text full of LaTeX special characters. The same `rows` and `seed` always
+    give the same sheet, so its output can be compared between runs.
+    """
+    import random
+
+    rng = random.Random(seed)
+    total = sum(share for _, share in SYNTHETIC_HEADINGS)
+    records = []
+    for heading, share in SYNTHETIC_HEADINGS:
+        records += [synthetic_row(rng, heading) for _ in range(max(1, rows * share // total))]
+        if heading == "Beer & Cider":
+            records.append(dict.fromkeys(menu.USED_COLUMNS, None))
+    return pd.DataFrame.from_records(records, columns=menu.USED_COLUMNS)
+
+
+### Stages
+
+# The stages of menu.build_menu, in order, and compiling menu.pdf after it
+STAGES = ["load", "route", "validate", "render", "write", "compile"]
+
+# Recorded with `python3 bench.py --stages --save-baseline` on the default sizes
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# The cheap stages are run this many times and the fastest run is kept
+STAGE_REPEATS = 3
+
+# A stage is flagged when it gets this much slower than its baseline...
+REGRESSION_TOLERANCE = 0.5
+# ...unless it still takes less than this, where timer noise dominates
+REGRESSION_FLOOR = 0.01
+
+def best_of(function, data, repeats=STAGE_REPEATS):
+    runs = [timed(function, data) for _ in range(repeats)]
+    return runs[0][0], min(seconds for _, seconds in runs)
+
+def time_stages(workbook, directory, compile_pdf=False):
+    """
+    Build the menu from `workbook` into `directory` one stage of
+    menu.build_menu at a time, with the same calls. Loading and compiling are
+    timed once, the other stages are the best of STAGE_REPEATS runs. Returns the seconds each stage took and the files
+    written (see `written_outputs`).
+    """
+    seconds = {}
+    df, seconds["load"] = timed(lambda path: menu.load_sheet(path, "The Data", cache_dir=None), workbook)
+    routing, seconds["route"] = best_of(menu.route_sheet, df)
+    selected = menu.select_sections(df, routing)
+    _, seconds["validate"] = best_of(lambda selected: menu.validate_sheet(df, selected), selected)
+    tasks = [(name, data) for name, data, _ in selected]
+    contents, seconds["render"] = best_of(menu.render_sections, tasks)
+    outputs = {menu.SECTION_FILES[name]: content for (name, _), content in zip(tasks, contents)}
+
+    def write(outputs):
+        for file_name, content in outputs.items():
+            menu.write_section(os.path.join(directory, file_name), content)
+    _, seconds["write"] = timed(write, outputs)
+    outputs = written_outputs(directory)
+
+    if compile_pdf:
+        for asset in MENU_ASSETS:
+            shutil.copy(asset, directory)
+        _, seconds["compile"] = timed(menu.compile_pdf, os.path.join(directory, "menu.tex"))
+    return seconds, outputs
+
+def written_outputs(directory):
+    """
+    The .tex files written to `directory`, the chunk files of a section included.
+    """
+    outputs = {}
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".tex"):
+            with open(os.path.join(directory, file_name)) as file:
+                outputs[file_name] = file.read()
+    return outputs
+
+def streamed_outputs(workbook, directory):
+    """
+    The files the streaming path writes for `workbook`.
+    """
+    menu.stream_menu(workbook, "The Data", out_dir=directory)
+    return written_outputs(directory)
+
+def output_hashes(outputs):
+    return {file_name: hashlib.sha256(content.encode()).hexdigest() for file_name, content in sorted(outputs.items())}
+
+def load_baseline(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def compare_baseline(rows, seconds, hashes, baseline):
+    """
+    Problems with one size against its baseline: stages that got slower than
+    REGRESSION_TOLERANCE allows and section files whose output changed.
+    """
+    problems = []
+    if not baseline:
+        return problems
+    for stage, time_taken in seconds.items():
+        before = baseline["seconds"].get(stage)
+        if before is not None and time_taken > REGRESSION_FLOOR and time_taken > before * (1 + REGRESSION_TOLERANCE):
+            problems.append(f"{rows} rows: {stage} took {time_taken:.4f}s against {before:.4f}s in the baseline")
+    for file_name, digest in hashes.items():
+        if baseline["outputs"].get(file_name, digest) != digest:
+            problems.append(f"{rows} rows: {file_name} differs from the baseline output")
+    return problems
+
+def bench_stages(sizes, compile_pdf=False, baseline_path=BASELINE, save=False):
+    """
+    Time every stage of a build on synthetic workbooks of each size, check that
+    the streaming path writes the same .tex as the pandas path, and compare the
+    times and the output against the baseline at `baseline_path`, or replace
+    the baseline with this run if `save` is set.
+    Returns the problems found.
+    """
+    if compile_pdf and shutil.which(menu.LATEX) is None:
+        sys.exit(f"{menu.LATEX} is needed to time the compile stage")
+    stages = STAGES if compile_pdf else STAGES[:-1]
+    baseline = {} if save else load_baseline(baseline_path)
+    results, problems = {}, []
+    print(f"{'rows':>8} " + " ".join(f"{stage + ' (s)':>13}" for stage in stages))
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            workbook = os.path.join(directory, "data.xlsx")
+            synthetic_sheet(rows).to_excel(workbook, sheet_name="The Data", index=False)
+            os.makedirs(os.path.join(directory, "pandas"))
+            os.makedirs(os.path.join(directory, "stream"))
+            seconds, outputs = time_stages(workbook, os.path.join(directory, "pandas"), compile_pdf)
+            if streamed_outputs(workbook, os.path.join(directory, "stream")) != outputs:
+                problems.append(f"{rows} rows: the streaming path writes different .tex than the pandas path")
+        hashes = output_hashes(outputs)
+        problems += compare_baseline(rows, seconds, hashes, baseline.get(str(rows)))
+        results[str(rows)] = {"seconds": seconds, "outputs": hashes}
+        print(f"{rows:>8} " + " ".join(f"{seconds[stage]:>13.4f}" for stage in stages))
+
+    if save:
+        with open(baseline_path, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Saved the baseline to {baseline_path}")
+    elif not baseline:
+        print(f"No baseline in {baseline_path}, run with --save-baseline to record one")
+    return problems
+
+def bench_targets(sizes):
+    """
+    Time rendering the LaTeX tables and writing each target of MENU_TARGETS,
+    then all of them together, on synthetic workbooks of each size. Every
+    target is timed with the items it is sent, which it makes from the rows.
+    """
+    targets = list(menu.MENU_TARGETS)
+    columns = ["latex", *targets, "all"]
+    print(f"{'rows':>8} " + " ".join(f"{column + ' (s)':>11}" for column in columns) + "  added by the targets")
+    for rows in sizes:
+        selected = menu.select_sections(synthetic_sheet(rows))
+        tasks = [(name, data) for name, data, _ in selected]
+        with tempfile.TemporaryDirectory() as directory:
+            seconds = {"latex": best_of(menu.render_sections, tasks)[1]}
+            for target in targets:
+                seconds[target] = best_of(lambda selected: menu.write_targets(selected, [target], directory), selected)[1]
+            seconds["all"] = best_of(lambda selected: menu.write_targets(selected, targets, directory), selected)[1]
+        added = ", ".join(f"{target} +{seconds[target] / seconds['latex']:.0%}" for target in [*targets, "all"])
+        print(f"{rows:>8} " + " ".join(f"{seconds[column]:>11.4f}" for column in columns) + f"  {added}")
+
+# Requests sent to the server at the same time, and rounds of every endpoint once the caches are warm
+SERVE_CONCURRENCY = 8
+SERVE_ROUNDS = 20
+
+def serve_paths(pdf=False):
+    paths = [f"/sections/{name}.tex" for name in menu.SECTION_FILES]
+    paths += [f"/sections/{name}.tex?backend=longtable" for name in menu.SECTION_FILES]
+    paths += [f"/sections/{name}.json" for name in menu.SECTION_FILES]
+    paths += ["/menu.json", "/menu.html"] + (["/menu.pdf"] if pdf else [])
+    return paths
+
+async def request_all(port, paths, concurrency=SERVE_CONCURRENCY):
+    """
+    Request every path from the server on `port`, `concurrency` at a time.
+    Returns the seconds each request took by endpoint, and the failed requests.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    seconds, failures = {}, []
+
+    async def request(path):
+        async with slots:
+            start = time.perf_counter()
+            status, body = await menu.fetch(menu.SERVE_HOST, port, path)
+            seconds.setdefault(menu.endpoint_name(path.split("?")[0]), []).append(time.perf_counter() - start)
+            if status != 200:
+                failures.append(f"{path}: {status} {body[:200].decode(errors='replace').strip()}")
+
+    await asyncio.gather(*(request(path) for path in paths))
+    return seconds, failures
+
+def print_latency(label, seconds):
+    for endpoint, times in sorted(seconds.items()):
+        ordered = sorted(times)
+        print(f"{label:<6} {endpoint:<18} {len(ordered):>8} {menu.percentile(ordered, 0.5) * 1000:>9.2f} "
+              f"{menu.percentile(ordered, 0.99) * 1000:>9.2f}")
+
+async def bench_serve(pdf=False):
+    """
+    Request every endpoint of a server started in this process, cold and then
+    SERVE_ROUNDS times warm, and print the latency and the cache hit rates.
+    """
+    if pdf and shutil.which(menu.LATEX) is None:
+        sys.exit(f"{menu.LATEX} is needed to request menu.pdf")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        server, state = await menu.start_server(cache_dir=cache_dir, port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            paths = serve_paths(pdf)
+            print(f"{'':<6} {'endpoint':<18} {'requests':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+            cold, failures = await request_all(port, paths)
+            print_latency("cold", cold)
+            warm, more_failures = await request_all(port, paths * SERVE_ROUNDS)
+            print_latency("warm", warm)
+            for failure in failures + more_failures:
+                print("Failed: " + failure)
+            caches = menu.serve_metrics(state)["caches"]
+            print(", ".join(f"{name} {cache['hit_rate']:.0%} of {cache['hits'] + cache['misses']}"
+                            for name, cache in caches.items() if cache["hit_rate"] is not None) + " hit the cache")
+        finally:
+            server.close()
+            await server.wait_closed()
+            state["pool"].shutdown()
+
+def bench_images(df):
+    """
+    Compile the menu with the original images and with their print-resolution
+    copies, and compare the compile time and the size of menu.pdf.
+    """
+    if shutil.which(menu.LATEX) is None:
+        sys.exit(f"{menu.LATEX} is needed to compare the images")
+    print(f"{'images':<10} {'compile (s)':>12} {'pdf (KB)':>9}")
+    for images in (False, True):
+        compiled = compile_menu(df, "longtblr", images)
+        size = "-" if compiled["size"] is None else f"{compiled['size'] / 1024:.0f}"
+        print(f"{'print' if images else 'original':<10} {compiled['seconds']:>12.2f} {size:>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[100, 1000, 10000], help="catalog sizes in rows")
+    parser.add_argument("--jobs", "-j", type=int, help="compare serial rendering with a pool of this many processes")
+    parser.add_argument("--escape", action="store_true", help="compare the old and new LaTeX escaping instead")
+    parser.add_argument("--backends", action="store_true", help="compile the menu with each table backend instead")
+    parser.add_argument("--images", action="store_true",
+                        help="compile the menu with the original and the print-resolution images instead")
+    parser.add_argument("--targets", action="store_true",
+                        help="time the LaTeX tables against the JSON and HTML targets on synthetic workbooks instead")
+    parser.add_argument("--serve", action="store_true",
+                        help="request every endpoint of the menu server from a local client instead")
+    parser.add_argument("--chunks", type=int, nargs="?", const=CHUNK_ROWS, metavar="ROWS",
+                        help="compile synthetic workbooks with the wine list whole and in chunks of ROWS entries "
+                             f"(default: {CHUNK_ROWS}) instead")
+    parser.add_argument("--stages", action="store_true",
+                        help="time each build stage on synthetic workbooks and compare with the baseline instead")
+    parser.add_argument("--pdf", action="store_true", help="with --stages or --serve, time compiling menu.pdf too")
+    parser.add_argument("--baseline", default=BASELINE,
+                        help=f"with --stages, baseline file to compare with (default: {os.path.basename(BASELINE)})")
+    parser.add_argument("--save-baseline", action="store_true", help="with --stages, record this run as the baseline")
+    args = parser.parse_args(argv)
+
+    if args.stages:
+        problems = bench_stages(args.sizes, args.pdf, args.baseline, args.save_baseline)
+        for problem in problems:
+            print("Regression: " + problem)
+        sys.exit(1 if problems else 0)
+    if args.targets:
+        bench_targets(args.sizes)
+        return
+    if args.serve:
+        asyncio.run(bench_serve(args.pdf))
+        return
+    if args.chunks is not None:
+        bench_chunks(args.sizes, args.chunks)
+        return
+
+    df = pd.read_excel("data.xlsx", sheet_name="The Data")
+    if args.escape:
+        bench_escape(df, args.sizes)
+    elif args.images:
+        bench_images(df)
+    elif args.backends:
+        bench_backends(df, args.sizes)
+    elif args.jobs:
+        bench_parallel(df, args.sizes, args.jobs)
+    else:
+        bench_loops(df, args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,127 +1,520 @@
-import pandas as pd
+# pandas and numpy are imported inside the functions that need them, so the
+# streaming mode can build the menu without loading them at all, and so are the
+# modules only the server uses
 import os
+import argparse
+import contextlib
+import filecmp
+import functools
+import hashlib
+import html
+import importlib.util
+import io
+import itertools
+import json
 import math
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
 
-# Load the data
-file_path = 'data.xlsx'
-df = pd.read_excel(file_path, sheet_name='The Data')
 
-filtered_df = df[df.iloc[:, 0].str.contains(r'\bWine - ', na=False)]
-# filtered_df = filtered_df.drop(12)
+### Profiling
+#
+# Off unless `start_profiling` is called (menu.py --profile). While it is on,
+# every `profiled` span records its wall time, CPU time, peak traced memory and
+# row count, and hands the record to each function in PROFILE_HOOKS as it ends.
 
-# Define LaTeX templates
-def format_region(region):
-    max_length = 20
-    """Format the region to include a line break if it contains a city and region."""
+# Functions called with each record as its span ends, e.g. by a dashboard
+PROFILE_HOOKS = []
+
+# The state of the current profile, or None when profiling is off
+profiling = None
+
+def start_profiling(cprofile_path=None):
+    """
+    Start recording spans. With `cprofile_path`, the render phase is also run
+    under cProfile and its statistics are dumped there.
+    """
+    global profiling
+    import tracemalloc
+
+    tracemalloc.start()
+    profiling = {"records": [], "stack": [], "cprofile": cprofile_path}
+
+def stop_profiling():
+    """
+    Stop recording. Returns the report: every record in the order the spans
+    ended, and the totals of the top-level spans.
+    """
+    global profiling
+    import tracemalloc
+
+    records = profiling["records"]
+    profiling = None
+    tracemalloc.stop()
+    stages = [record for record in records if record["section"] is None]
+    return {
+        "records": records,
+        "total": {
+            "wall": sum(record["wall"] for record in stages),
+            "cpu": sum(record["cpu"] for record in stages),
+            "peak_memory": max((record["peak_memory"] for record in stages), default=0),
+        },
+    }
+
+@contextlib.contextmanager
+def profiled(stage, section=None, rows=None):
+    """
+    Record the span of the with block as `stage`, or as `section` within it.
+    Yields the record, so the block can fill in "rows" once it knows them.
+    Nested spans are measured on their own; their peak memory also counts
+    towards the span around them.
+    """
+    record = {"stage": stage, "section": section, "rows": rows}
+    if profiling is None:
+        yield record
+        return
+
+    import tracemalloc
+
+    stack = profiling["stack"]
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    frame = {"peak": 0}
+    stack.append(frame)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall"] = time.perf_counter() - wall
+        record["cpu"] = time.process_time() - cpu
+        record["peak_memory"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+        stack.pop()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], record["peak_memory"])
+        tracemalloc.reset_peak()
+        profiling["records"].append(record)
+        for hook in PROFILE_HOOKS:
+            hook(record)
+
+@contextlib.contextmanager
+def cprofiled():
+    """
+    Run the with block under cProfile if the current profile asked for a dump.
+    """
+    if profiling is None or profiling["cprofile"] is None:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profiling["cprofile"])
+
+
+### Loading
+
+CACHE_DIR = ".menu_cache"
+# Bump when the cache layout changes so old files are never read back
+CACHE_VERSION = 1
+
+# Type tags for cells of mixed-type columns, e.g. a Vintage column holding 2022 and "NV"
+MIXED_NULL, MIXED_INT, MIXED_FLOAT, MIXED_TEXT = range(4)
+MIXED_TAG_SUFFIX = " (type)"
+
+def workbook_hash(file_path, sheet_name):
+    """
+    Hash the workbook contents together with the sheet name and cache version.
+    """
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{sheet_name}\0".encode())
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_path(file_path, sheet_name, key, cache_dir=CACHE_DIR):
+    """
+    Cache files are named after the workbook and sheet so stale copies can be found.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{sheet_name}-{key[:16]}.arrow")
+
+def encode_mixed_columns(df):
+    """
+    Arrow needs one type per column, so object columns holding several types are
+    stored as their text plus a type tag per cell. Returns None if a cell has a
+    type that cannot be restored exactly (dates, for example).
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        types = values.map(type)
+        if types[values.notna()].nunique() <= 1:
+            continue
+        tags = values.map(lambda value: (
+            MIXED_NULL if pd.isna(value)
+            else MIXED_TEXT if isinstance(value, str)
+            else MIXED_INT if isinstance(value, int) and not isinstance(value, bool)
+            else MIXED_FLOAT if isinstance(value, float)
+            else None
+        ))
+        if tags.isna().any():
+            return None
+        df[column] = values.map(repr).where(tags.isin([MIXED_INT, MIXED_FLOAT]), values)
+        df[column + MIXED_TAG_SUFFIX] = tags.astype("int8")
+    return df
+
+def decode_mixed_columns(df):
+    """
+    Restore the columns written by `encode_mixed_columns`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    for tag_column in [c for c in df.columns if c.endswith(MIXED_TAG_SUFFIX)]:
+        column = tag_column[:-len(MIXED_TAG_SUFFIX)]
+        tags = df.pop(tag_column)
+        text = df[column].to_numpy(dtype=object)
+        values = np.where(tags == MIXED_TEXT, text, np.nan).astype(object)
+        for tag, kind in ((MIXED_INT, int), (MIXED_FLOAT, float)):
+            mask = (tags == tag).to_numpy()
+            values[mask] = [kind(value) for value in text[mask]]
+        values = pd.Series(values, index=df.index, name=column, dtype=object)
+        df[column] = values
+    return df
+
+# Sheets already loaded by this process, so a batch or watch run parses each workbook once
+loaded_sheets = {}
+LOADED_SHEETS_LIMIT = 8
+
+def load_sheet(file_path, sheet_name, cache_dir=CACHE_DIR):
+    """
+    Read `sheet_name` from the workbook, reusing the parsed copy in `cache_dir`
+    when the workbook has not changed since it was cached.
+
+    The cache is an Arrow IPC file that is memory-mapped on load. Without
+    pyarrow installed the workbook is parsed once per process, and with
+    `cache_dir` set to None it is parsed every time. The returned frame may be
+    shared with other callers, so it must not be modified.
+    """
+    import pandas as pd
+
+    if cache_dir is None:
+        return pd.read_excel(file_path, sheet_name=sheet_name)
+
+    key = workbook_hash(file_path, sheet_name)
+    if key not in loaded_sheets:
+        if len(loaded_sheets) >= LOADED_SHEETS_LIMIT:
+            del loaded_sheets[next(iter(loaded_sheets))]
+        loaded_sheets[key] = read_cached_sheet(file_path, sheet_name, key, cache_dir)
+    return loaded_sheets[key]
+
+def read_cached_sheet(file_path, sheet_name, key, cache_dir=CACHE_DIR):
+    """
+    Read the sheet from its Arrow cache file, parsing the workbook and writing
+    the cache first if there is none for `key`.
+    """
+    import pandas as pd
+
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        return pd.read_excel(file_path, sheet_name=sheet_name)
+
+    path = cache_path(file_path, sheet_name, key, cache_dir)
+    if os.path.exists(path):
+        with pa.memory_map(path) as source:
+            return decode_mixed_columns(pa.ipc.open_file(source).read_all().to_pandas())
+
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    encoded = encode_mixed_columns(df)
+    if encoded is None:
+        return df
+
+    # Drop the copies cached for earlier versions of this workbook
+    os.makedirs(cache_dir, exist_ok=True)
+    stale_prefix = os.path.basename(path)[:-len(f"{key[:16]}.arrow")]
+    for name in os.listdir(cache_dir):
+        if name.startswith(stale_prefix) and name.endswith(".arrow"):
+            os.remove(os.path.join(cache_dir, name))
+
+    table = pa.Table.from_pandas(encoded, preserve_index=True)
+    temp_path = path + f".{os.getpid()}.tmp"
+    with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp_path, path)
+    return df
+
+
+### Line Wrapping
+
+# Advance widths in pt of the Latin Modern Roman glyphs menu.tex sets the
+# tables in (lmodern, T1). article ignores the fontsize=8pt class option, so
+# the body font is the 10pt design size. Anything not listed is measured as
+# DEFAULT_GLYPH_WIDTH, roughly the width of a digit.
+GLYPH_WIDTHS = {
+    " ": 3.33, "!": 2.78, '"': 5.0, "#": 8.33, "$": 5.0, "%": 8.33,
+    "&": 7.78, "'": 2.78, "(": 3.89, ")": 3.89, "*": 5.0, "+": 7.78,
+    ",": 2.78, "-": 3.33, ".": 2.78, "/": 5.0, ":": 2.78, ";": 2.78,
+    "=": 7.78, "?": 4.72, "@": 7.78, "[": 2.78, "]": 2.78, "_": 5.0,
+    "{": 5.0, "}": 5.0, "~": 5.0, "^": 5.0, "\\": 5.0, "’": 2.78,
+    "“": 5.0, "”": 5.0, "–": 5.0, "—": 10.0, "™": 9.72,
+    "a": 5.0, "b": 5.56, "c": 4.44, "d": 5.56, "e": 4.44, "f": 3.06,
+    "g": 5.0, "h": 5.56, "i": 2.78, "j": 3.06, "k": 5.28, "l": 2.78,
+    "m": 8.33, "n": 5.56, "o": 5.0, "p": 5.56, "q": 5.28, "r": 3.92,
+    "s": 3.94, "t": 3.89, "u": 5.56, "v": 5.28, "w": 7.22, "x": 5.28,
+    "y": 5.28, "z": 4.44,
+    "A": 7.5, "B": 7.08, "C": 7.22, "D": 7.64, "E": 6.81, "F": 6.53,
+    "G": 7.85, "H": 7.5, "I": 3.61, "J": 5.14, "K": 7.78, "L": 6.25,
+    "M": 9.17, "N": 7.5, "O": 7.78, "P": 6.81, "Q": 7.78, "R": 7.36,
+    "S": 5.56, "T": 7.22, "U": 7.5, "V": 7.5, "W": 10.28, "X": 7.5,
+    "Y": 7.5, "Z": 6.11,
+}
+GLYPH_WIDTHS.update(dict.fromkeys("0123456789", 5.0))
+DEFAULT_GLYPH_WIDTH = 5.0
+
+# Escaped text is measured as the character it prints
+ESCAPED_GLYPH = re.compile(r"\\text(backslash|asciitilde|asciicircum)\{\}|\\([&%$#_{}])")
+ESCAPED_GLYPHS = {"backslash": "\\", "asciitilde": "~", "asciicircum": "^"}
+
+# Text width of menu.tex (width=120mm) and the share of it the wine tables
+# (colspec llr) leave for the grape list in the middle column and for the
+# region on the right, after the prices and the column separation.
+LINE_WIDTH = 341.43
+GRAPE_VARIETY_WIDTH = 0.5 * LINE_WIDTH
+REGION_WIDTH = 0.3 * LINE_WIDTH
+
+# Regions and blends repeat down the list, so their wrapped forms are kept
+WRAP_CACHE_SIZE = 1024
+
+
+def text_width(text):
+    """Estimate the printed width of text in pt from the glyph table."""
+    text = ESCAPED_GLYPH.sub(lambda m: ESCAPED_GLYPHS.get(m.group(1)) or m.group(2), text)
+    return sum(GLYPH_WIDTHS.get(char, DEFAULT_GLYPH_WIDTH) for char in text)
+
+
+def wrap_words(words, max_width, separator=" "):
+    """Greedily fill lines with words, starting a new one when the next word would overflow."""
+    gap = text_width(separator)
+    lines = []
+    current_line = []
+    current_width = 0.0
+
+    for word in words:
+        width = text_width(word)
+        if current_line and current_width + gap + width > max_width:
+            lines.append(separator.join(current_line))
+            current_line, current_width = [word], width
+        else:
+            current_width += (gap if current_line else 0.0) + width
+            current_line.append(word)
+
+    lines.append(separator.join(current_line))  # Add the last line
+    return lines
+
+
+@functools.lru_cache(maxsize=WRAP_CACHE_SIZE)
+def format_region(region, max_width=REGION_WIDTH):
+    """Format the region to include a line break if it contains a city and region,
+    otherwise wrap it to the width of the region column."""
     if "," in region:
         parts = region.split(",", 1)
         return f"{parts[0]}, \\\\{parts[1].strip()}"
-    else:
-        words = region.split()
-        lines = []
-        current_line = []
+    return " \\\\ ".join(wrap_words(region.split(), max_width))
 
-        for word in words:
-            if sum(len(w) for w in current_line) + len(word) + len(current_line) <= max_length:
-                current_line.append(word)
-            else:
-                lines.append(" ".join(current_line))
-                current_line = [word]
 
-        lines.append(" ".join(current_line))  # Add the last line
-        return " \\\\ ".join(lines)
-    
-def format_grape_variety(grape_variety, max_length=40):
+@functools.lru_cache(maxsize=WRAP_CACHE_SIZE)
+def format_grape_variety(grape_variety, max_width=GRAPE_VARIETY_WIDTH):
     """
-    Format grape variety list: If the string exceeds max_length,
+    Format grape variety list: If the string is wider than max_width,
     split at a comma and push the remaining text to a new line.
     Trailing commas are preserved.
 
     Args:
         grape_variety (str): Input string with grape varieties.
-        max_length (int): Maximum allowed length per line.
+        max_width (float): Maximum allowed width per line in pt.
 
     Returns:
         str: Formatted string with '\\\\' added for new lines.
     """
-    parts = grape_variety.split(",")  # Split at commas
-    current_line = ""
-    formatted_lines = []
-
-    for i, part in enumerate(parts):
-        part = part.strip()  # Remove extra spaces
-        # part = part.strip('/n')
-        # print("HERE")
-        # print(part)
-        addition = (part + ",") if i < len(parts) - 1 else part  # Add comma if not last part
-        
-        # Check if adding this part exceeds the max_length
-        if len(current_line) + len(addition) + 1 <= max_length:  # +1 for the space
-            current_line += (" " if current_line else "") + addition
-        else:
-            formatted_lines.append(current_line.strip())  # Add current line to output
-            current_line = addition  # Start a new line with the current part
+    parts = [part.strip() for part in grape_variety.split(",")]  # Split at commas
+    parts = [part + "," for part in parts[:-1]] + parts[-1:]  # Add comma if not last part
+    return " \\\\\n".join(line.strip() for line in wrap_words(parts, max_width))
+
+
+# LaTeX special characters and their escaped versions. A double backslash is
+# kept as it is, since that is how a line break is typed into the sheet.
+LATEX_ESCAPES = {
+    '\\\\': '\\\\',
+    '\\': r'\textbackslash{}',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+}
 
-    if current_line:
-        formatted_lines.append(current_line.strip())  # Add any remaining part
+# Matches any of the above in one pass, trying the double backslash first
+LATEX_SPECIAL = re.compile("|".join(map(re.escape, LATEX_ESCAPES)))
 
-    return " \\\\\n".join(formatted_lines)  # Join lines with LaTeX newline
+# Important for some names
+def escape_latex(text):
+    """
+    Escapes special LaTeX characters in the text.
+    """
+    if not isinstance(text, str):
+        return text  # If not a string, return as-is
+
+    return LATEX_SPECIAL.sub(lambda match: LATEX_ESCAPES[match.group()], text)
 
-def generate_wine_entry(glass_price, carafe_price, bottle_price, vintage, winery, wine_name, grape_variety, winemaker, region, description, current_heading):
+
+### Page Layout
+
+# Vertical sizes in pt: the usable height of an a5paper page with top=12mm
+# and bottom=16mm, the baseline skip of the 10pt body font, the tabularray
+# rowsep above and below a row of text, an empty row, and a \LARGE table
+# caption with the double rule under it and the gap left after its table.
+# Empty rows and captions are measured from menu.pdf: a wine entry takes
+# 12pt a line plus 32pt, a row of any other table 12pt a line plus 16pt, and
+# a caption and the spacer row under it 38.9pt to the first entry, with 4.7pt
+# between one table and the caption of the next. With these the 13 wines that
+# compiled into that menu.pdf come to the same 15 pages it has.
+TEXT_HEIGHT = (210 - 12 - 16) * 72.27 / 25.4
+BASELINE_SKIP = 12.0
+ROW_SEP = 4.0
+EMPTY_ROW_HEIGHT = 12.0
+CAPTION_HEIGHT = 28.0
+
+# A caption followed by the spacer row most tables open with
+TABLE_HEAD_HEIGHT = CAPTION_HEIGHT + EMPTY_ROW_HEIGHT + ROW_SEP
+
+def cell_lines(text):
+    """Count the lines of a cell broken with \\\\."""
+    return text.count("\\\\") + 1
+
+def row_height(*cells):
+    """Estimate the height in pt of a table row and the spacer row that goes with it."""
+    return max(map(cell_lines, cells)) * BASELINE_SKIP + ROW_SEP + EMPTY_ROW_HEIGHT
+
+def needspace(height):
+    """Ask for `height` pt to be left on the page, or start the next one."""
+    return f"\\needspace{{{math.ceil(height)}pt}}\n"
+
+def count_pages(blocks, used=0.0, page_height=TEXT_HEIGHT):
     """
-    Generate LaTeX code for a wine entry.
-    
-    Arguments:
-    glass_price    - Price for a glass of wine
-    carafe_price   - Price for a carafe of wine
-    bottle_price   - Price for a bottle of wine
-    vintage        - Wine vintage (year)
-    winery         - Winery name
-    wine_name      - Name of the wine
-    grape_variety  - Grape variety used
-    winemaker      - Winemaker(s) name(s)
-    region         - Wine region
-    description    - Description of the wine
-    
-    Returns:
-    LaTeX formatted string
+    Fill pages with blocks of the given heights that cannot be split, starting
+    `used` pt down the current page. Returns the number of new pages begun and
+    the height used on the last one.
+    """
+    pages = 0
+    for height in blocks:
+        if used and used + height > page_height:
+            pages += 1
+            used = 0.0
+        used += height
+    return pages, used
+
+
+### Column Processing
+#
+# Every section is rendered a whole column at a time: NaNs are filled and prices
+# are formatted for the full column, then each row template is filled in and the
+# rows are joined in a single pass.
+
+def numeric_column(col):
     """
-    if type(carafe_price) == str:
-        carafe_price = 0
-    if current_heading in ["Wine - Sweet", "Wine - Sparkling"]:
+    Return `col` as floats. Text cells become NaN, they are never parsed as numbers.
+    """
+    import pandas as pd
 
-        return f"""    
-    {{\\\\{glass_price}/{bottle_price}}} & {{{vintage} {winery} {wine_name} \\\\ {format_grape_variety(grape_variety)} \\\\ {winemaker}}} & {{{format_region(region)}}} \\\\
-    \\\\
-    \\SetCell[c=3]{{\\linewidth}}{{{description}}} \\\\
-    \\SetCell[c=3]{{\\linewidth}} & & \\\\
+    if col.dtype == object or pd.api.types.is_string_dtype(col):
+        col = col.where(~col.map(lambda value: isinstance(value, str)))
+    return pd.to_numeric(col, errors="coerce")
+
+def text_column(col, missing=""):
+    """
+    Return `col` as strings with NaNs replaced by `missing`.
+    """
+    return col.astype(object).where(col.notna(), missing).astype(str)
+
+def price_column(col, missing="", fraction="{}"):
+    """
+    Format a price column. Whole numbers drop their decimals, other numbers
+    use the `fraction` format, NaNs become `missing` and text is kept as is.
+    """
+    values = numeric_column(col)
+    whole = values.notna() & (values % 1 == 0)
+    fractional = values.notna() & ~whole
+
+    prices = text_column(col, missing).astype(object)
+    prices[whole] = values[whole].astype("int64").astype(str)
+    prices[fractional] = values[fractional].map(fraction.format)
+    return prices
+
+def escaped_column(col, missing=""):
+    """
+    Return `col` as strings with LaTeX special characters escaped.
+    Each distinct value is only escaped once.
+    """
+    text = text_column(col)
+    values = text.unique()
+    return text.map(dict(zip(values, map(escape_latex, values)))).where(col.notna(), missing)
+
+def format_rows(template, **columns):
+    """
+    Fill `template` once per row from the given columns.
+    """
+    names = list(columns)
+    return [
+        template.format_map(dict(zip(names, values)))
+        for values in zip(*columns.values())
+    ]
+
+def render_rows(template, **columns):
+    """
+    Fill `template` once per row from the given columns and join the rows in one pass.
+    """
+    return "".join(format_rows(template, **columns))
+
+
+# Closes every table except the wine tables
+TABLE_END = r"""
+\end{longtblr}
 """
-    else:
-        return f"""    
-    {{\\\\{glass_price}/{math.ceil(carafe_price)}/{bottle_price}}} & {{{vintage} {winery} {wine_name} \\\\ {format_grape_variety(grape_variety)} \\\\ {winemaker}}} & {{{format_region(region)}}} \\\\
+
+
+### Wine Processing
+
+WINE_ENTRY = """    
+    {{\\\\{prices}}} & {{{title} \\\\ {grape_variety} \\\\ {winemaker}}} & {{{region}}} \\\\
     \\\\
     \\SetCell[c=3]{{\\linewidth}}{{{description}}} \\\\
     \\SetCell[c=3]{{\\linewidth}} & & \\\\
 """
 
-def generate_wine_menu(data):
-    current_heading = None
-    table = ""
-    count = 0
-
-    for index, row in data.iterrows():
-        # Check for new heading
-        if row["Heading"] != current_heading:
-            # Close previous longtblr environment if necessary
-            if current_heading is not None:
-                table += "\\end{longtblr}\n\n\\vspace{-15pt} \n"
-            # Start new longtblr environment
-            current_heading = row["Heading"]
-            count += 1
-            table += f"""
+WINE_TABLE_START = """
 \\begin{{longtblr}}[
     theme = TASMenu,
-    caption = \\LARGE{{{current_heading}}},
+    caption = \\LARGE{{{heading}}},
     halign = j,
     valign = m,
 ]{{
@@ -132,132 +525,199 @@ def generate_wine_menu(data):
 \\hline\\hline
     \\SetCell[c=3]{{\\linewidth}} & & \\\\
             """
-            # count = 0  # Reset the count for the new heading
-
-        # Prepare the row data
-        glass_price = row["Glass"] if pd.notna(row["Glass"]) else ""
-        glass_price = int(glass_price) if isinstance(glass_price, (float, int)) and glass_price == int(glass_price) else glass_price
-        carafe_price = row["Carafe"] if pd.notna(row["Carafe"]) else ""
-        carafe_price = int(carafe_price) if isinstance(carafe_price, (float, int)) and carafe_price == int(carafe_price) else carafe_price
-        bottle_price = row["Bottle"] if pd.notna(row["Bottle"]) else ""
-        bottle_price = int(bottle_price) if isinstance(bottle_price, (float, int)) and bottle_price == int(bottle_price) else bottle_price
-        vintage = row["Vintage"] if pd.notna(row["Vintage"]) else ""
-        winery = row["Winery"] if pd.notna(row["Winery"]) else ""
-        wine_name = row["Name"] if pd.notna(row["Name"]) else ""
-        grape_variety = row["Grape Variety"] if pd.notna(row["Grape Variety"]) else ""
-        winemaker = row["Winemaker and/or Owner"] if pd.notna(row["Winemaker and/or Owner"]) else ""
-        region = row["Region"] if pd.notna(row["Region"]) else ""
-        description = row["Description"] if pd.notna(row["Description"]) else ""
-
-        # Add the wine entry
-        table += generate_wine_entry(glass_price, carafe_price, bottle_price, vintage, winery, wine_name, grape_variety, winemaker, region, description, current_heading)
-        count += 1
-
-        # Add a pagebreak if needed
-        if count >= 4:
-            table += """    \\pagebreak
-    \\\\"""
-            count = 0
-
-    # Close the last longtblr environment
-    if current_heading is not None:
-        table += "\\end{longtblr}\n\n\\vspace{-15pt} \n"
-    
-    table = table.replace(
-        """    \\pagebreak
-    \\\\\\end{longtblr}
-
-\\vspace{-15pt} 
-""",
-"""    
-    \\end{longtblr}
-
-\\vspace{-15pt} 
-\\pagebreak"""
-    )
 
-    table = table.replace(
-        """"Hill of Dreams" \\\\ Sauvignon Blanc, \\\\""",""""Hill of Dreams" \\\\ Sauvignon Blanc, """)
-    
-    table = table.replace("""Wines "Block 5""", """Wines \\\\ "Block 5""")
-
-    table = table.replace(
-    r"""    \SetCell[c=3]{\linewidth} & & \\
-    \pagebreak
-    \\    
-    {\\17/64/85} & {2022 Nashdale Lane "Legacy Rosé" \\ Shiraz \\ 	Tanya and Nick Segger} & {Nashdale, \\Orange} \\
-    \\
-    \SetCell[c=3]{\linewidth}{The Legacy series is all about a patient winemaking approach. Using the heavier grape pressings and aged in seasoned oak for 10 months, this richer style is for everyone enjoying a chilled red. This wine shows aromas of wild strawberries, raspberries and exotic spices leading to a smooth textured finish.} \\
-    \SetCell[c=3]{\linewidth} & & \\
-\end{longtblr}
+WINE_TABLE_END = "\\end{longtblr}\n\n\\vspace{-15pt} \n"
 
-\vspace{-15pt} 
+WINE_PAGEBREAK = """    \\pagebreak
+    \\\\"""
 
-\begin{longtblr}[
-    theme = TASMenu,
-    caption = \LARGE{Wine - Red},
+# A wine table longer than its section's "chunk_rows" carries on in tables of
+# that many entries each, written to files of their own (see `write_section`)
+# so TeX never holds more than one chunk of a long list at a time. Each chunk
+# goes on without a gap under the last, and the TASMenuContinued theme of
+# WINE_CHUNK_PREAMBLE leaves out the caption where the chunk starts but keeps
+# it, like any table, on the pages the chunk carries on to.
+#
+# No chunked menu has been proofed yet, so tables are only chunked when a
+# spec asks for it, and menu.tex does not define the theme: a document that
+# inputs chunks needs WINE_CHUNK_PREAMBLE added (see `add_to_preamble`), as
+# the copies bench.py --chunks compiles have.
+WINE_CHUNK_END = "\\end{longtblr}\n\\vspace{-.5\\bigskipamount}\n"
+
+WINE_TABLE_CONTINUE = """\\begin{{longtblr}}[
+    theme = TASMenuContinued,
+    caption = \\LARGE{{{heading}}},
+    presep = 0pt,
     halign = j,
     valign = m,
-]{
-    width = \linewidth,
+]{{
+    width = \\linewidth,
     colspec = llr,
-}
-""",
-    r"""    \\    
-    {\\17/64/85} & {2022 Nashdale Lane "Legacy Rosé" \\ Shiraz \\ 	Tanya and Nick Segger} & {Nashdale, \\Orange} \\
-    \\
-    \SetCell[c=3]{\linewidth}{The Legacy series is all about a patient winemaking approach. Using the heavier grape pressings and aged in seasoned oak for 10 months, this richer style is for everyone enjoying a chilled red. This wine shows aromas of wild strawberries, raspberries and exotic spices leading to a smooth textured finish.} \\
-    \SetCell[c=3]{\linewidth} & & \\
-\end{longtblr}
+}}
+"""
 
-\vspace{-15pt} 
-\pagebreak
-\begin{longtblr}[
-    theme = TASMenu,
-    caption = \LARGE{Wine - Red},
-    halign = j,
-    valign = m,
-]{
-    width = \linewidth,
-    colspec = llr,
+WINE_CHUNK_PREAMBLE = r"""
+\NewTblrTheme{TASMenuContinued}{   % Chunks of a long wine table (see WINE_TABLE_CONTINUE in menu.py)
+    \DefTblrTemplate{caption-tag}{default}{}
+    \DefTblrTemplate{caption-sep}{default}{}
+    \DefTblrTemplate{firsthead}{default}{}   % No caption where the chunk carries on, only on later pages
 }
 """
-)
 
-    return table
+# Written between the chunks of a section, where `write_section` splits it into files
+CHUNK_BREAK = "%% chunk\n"
 
+# Entries in each chunk of a wine table when the spec does not say: none
+CHUNK_ROWS = 0
 
-# Save the LaTeX output to a file or print
-with open("wine_tables.tex", "w") as file:
-    file.write(generate_wine_menu(filtered_df))
+# The columns of the sheet the wine list prints
+WINE_COLUMNS = [
+    "Glass", "Carafe", "Bottle", "Vintage", "Winery", "Name",
+    "Grape Variety", "Winemaker and/or Owner", "Region", "Description",
+]
 
-file.close()
+# Headings that are only sold by the glass or bottle, never by the carafe,
+# filled in from the section specs (see `no_carafe_headings`)
+NO_CARAFE_HEADINGS = []
 
-# print(latex_output) 
+# The vintage, winery and name share their row with the prices and the region,
+# so a longer title puts the name on a line of its own
+WINE_TITLE_WIDTH = 0.7 * LINE_WIDTH
 
-### Beer Processing
+# The description spans the three columns, less the outer column padding
+DESCRIPTION_WIDTH = LINE_WIDTH - 12.0
+
+def wine_title(vintage, winery, wine_name):
+    title = f"{vintage} {winery} {wine_name}"
+    if text_width(title) > WINE_TITLE_WIDTH:
+        return f"{vintage} {winery} \\\\ {wine_name}"
+    return title
+
+def wine_entry_height(details, region, description):
+    """
+    Estimate the height in pt of a wine entry: the details row, the blank row,
+    the description and the spacer row. The description is justified, and the
+    spaces shrink enough that it takes about its width over the measure in lines.
+    """
+    lines = max(cell_lines(details), cell_lines(region))
+    lines += max(1, math.ceil(text_width(description) / DESCRIPTION_WIDTH))
+    return lines * BASELINE_SKIP + 2 * ROW_SEP + 2 * EMPTY_ROW_HEIGHT
 
-beer_cider_df = df[df["Heading"].str.contains(r'\bBeer & Cider\b', na=False)]
+def render_wine_entries(data, backend="longtblr"):
+    """
+    Render the LaTeX entry of every wine in `data`, one string per row, along
+    with the estimated height of each entry.
+    """
+    import numpy as np
+
+    glass_price = price_column(data["Glass"])
+    bottle_price = price_column(data["Bottle"])
+    # A missing or text carafe price is printed as 0
+    carafe_price = np.ceil(numeric_column(data["Carafe"]).fillna(0)).astype("int64").astype(str)
+
+    no_carafe = data["Heading"].isin(NO_CARAFE_HEADINGS)
+    prices = (glass_price + "/" + carafe_price + "/" + bottle_price).where(
+        ~no_carafe, glass_price + "/" + bottle_price
+    )
+
+    title = [
+        wine_title(vintage, winery, wine_name)
+        for vintage, winery, wine_name in zip(
+            escaped_column(data["Vintage"]), escaped_column(data["Winery"]), escaped_column(data["Name"])
+        )
+    ]
+    grape_variety = escaped_column(data["Grape Variety"]).map(format_grape_variety)
+    winemaker = escaped_column(data["Winemaker and/or Owner"])
+    region = escaped_column(data["Region"]).map(format_region)
+    description = escaped_column(data["Description"])
+
+    entries = format_rows(
+        TABLE_BACKENDS[backend]["wine_entry"],
+        prices=prices,
+        title=title,
+        grape_variety=grape_variety,
+        winemaker=winemaker,
+        region=region,
+        description=description,
+    )
+    heights = [
+        wine_entry_height(f"{t} \\\\ {g} \\\\ {w}", r, d)
+        for t, g, w, r, d in zip(title, grape_variety, winemaker, region, description)
+    ]
+    return entries, heights
 
-def format_beer_cider_row(row):
+def wine_layout(page_height=TEXT_HEIGHT, backend="longtblr", chunk_rows=CHUNK_ROWS):
     """
-    Generate LaTeX row for Beer & Cider table.
-    Maps `Winery`, `Region`, and `Name` to the LaTeX format.
+    Coroutine that lays the wine entries out into one longtblr per heading.
+    Send it (heading, entry, height) for each wine in menu order and it returns
+    the LaTeX to write for that entry, with any table boundary or page break
+    that has to come first; send None at the end to close the last table.
+
+    A page is broken before an entry that would not fit on it. Each table asks
+    with \\needspace for room for its caption and first entry, so an entry is
+    never split across pages and a caption never ends a page. After
+    `chunk_rows` entries (none if 0) a table is continued in a new chunk, if
+    the backend has a wine_table_continue template.
     """
-    winery = row["Winery"] if pd.notna(row["Winery"]) else ""
-    region = row["Region"] if pd.notna(row["Region"]) else ""
-    name = row["Name"] if pd.notna(row["Name"]) else ""
-    glass_price = f"{int(row['Glass'])}" if row["Glass"].is_integer() else f"{row['Glass']:.1f}" if pd.notna(row["Glass"]) else ""
+    markup = TABLE_BACKENDS[backend]
+    chunked = bool(chunk_rows and markup["wine_table_continue"])
+    current_heading = None
+    used = 0.0
+    rows = 0
+    latex = None
+
+    while True:
+        item = yield latex
+        parts = []
+        if item is None:
+            if current_heading is not None:
+                parts.append(markup["wine_table_end"])
+            current_heading = None
+        else:
+            heading, entry, height = item
+            if heading != current_heading:
+                if current_heading is not None:
+                    parts.append(markup["wine_table_end"])
+                if used + TABLE_HEAD_HEIGHT + height > page_height:
+                    used = 0.0
+                current_heading = heading
+                parts.append(needspace(TABLE_HEAD_HEIGHT + height))
+                parts.append(markup["wine_table_start"].format(heading=escape_latex(heading)))
+                used += TABLE_HEAD_HEIGHT
+                rows = 0
+            elif chunked and rows == chunk_rows:
+                # A chunk starts on the next page by its \needspace rather
+                # than a page break, which would end the last one on an empty row
+                if used + height > page_height:
+                    used = 0.0
+                parts.append(markup["wine_chunk_end"] + CHUNK_BREAK + needspace(height))
+                parts.append(markup["wine_table_continue"].format(heading=escape_latex(heading)))
+                rows = 0
+            elif used + height > page_height:
+                parts.append(markup["wine_pagebreak"])
+                used = 0.0
+            parts.append(entry)
+            used += height
+            rows += 1
+        latex = "".join(parts)
+
+def generate_wine_menu(data, backend="longtblr", chunk_rows=CHUNK_ROWS):
+    layout = wine_layout(backend=backend, chunk_rows=chunk_rows)
+    next(layout)
+    entries, heights = render_wine_entries(data, backend)
+    parts = [layout.send(item) for item in zip(data["Heading"], entries, heights)]
+    parts.append(layout.send(None))
+    return "".join(parts)
+
 
-    
-    return rf"""
+### Beer Processing
+
+BEER_CIDER_ROW = r"""
 \SetCell[c=3]{{\linewidth}} & & \\
-{glass_price} & {{{winery} \\ {region}}} & {name} \\
+{glass_price} & {{{winery} \\ {region}}} & {{{name}}} \\
 """
 
-# Function to generate the LaTeX table
-def generate_beer_cider_table(data):
-    table = r"""
+BEER_CIDER_TABLE_START = r"""
 \begin{longtblr}[
     theme = TASMenu,
     caption = \LARGE{Beer \& Cider},
@@ -271,81 +731,16 @@ def generate_beer_cider_table(data):
 }
 \hline\hline
 """
-    # Generate rows
-    for _, row in data.iterrows():
-        table += format_beer_cider_row(row)
-
-    # Close the table
-    table += r"""
-\end{longtblr}
-"""
-    return table
-
-
-# Generate the LaTeX table
-latex_table = generate_beer_cider_table(beer_cider_df)
 
-latex_table = latex_table.replace("""Ask about our latest tap beers, \\\\ or just look at our tap.""", """{Ask about our latest tap beers, \\\\ or just look at our tap.}""")
-
-# Save the LaTeX output to a file
-with open("beer_cider_table.tex", "w") as file:
-    file.write(latex_table)
-
-file.close()
-
-# print(latex_table)
 
 ### Cocktail Processing
 
-cocktails_df = df[df["Heading"].str.contains(r'\b(Cocktails|Mocktail)\b', na=False)]
-
-
-# Important for some names
-def escape_latex(text):
-    """
-    Escapes special LaTeX characters in the text.
-    """
-    if not isinstance(text, str):
-        return text  # If not a string, return as-is
-
-    # Dictionary of LaTeX special characters and their escaped versions
-    latex_special_chars = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',
-        '#': r'\#',
-        '_': r'\_',
-        '{': r'\{',
-        '}': r'\}',
-        '~': r'\textasciitilde{}',
-        '^': r'\textasciicircum{}',
-    }
-    
-    # Replace each special character with its escaped version
-    for char, escape in latex_special_chars.items():
-        text = text.replace(char, escape)
-    
-    return text
-
-# Function to format LaTeX rows for cocktails
-def format_cocktail_row(row):
-    """
-    Generate LaTeX row for Cocktails table.
-    Maps `Glass`, `Name`, and `Description` to the LaTeX format.
-    """
-    glass_price = int(row["Glass"]) if pd.notna(row["Glass"]) else ""
-    name = row["Name"] if pd.notna(row["Name"]) else ""
-    name = escape_latex(name)
-    description = row["Grape Variety"] if pd.notna(row["Grape Variety"]) else ""
-
-    return rf"""
+COCKTAIL_ROW = r"""
     {glass_price} & {name} & {description} \\
     \SetCell[c=3]{{\linewidth}} & & \\
 """
 
-# Function to generate the LaTeX table
-def generate_cocktail_table(data):
-    table = r"""
+COCKTAIL_TABLE_START = r"""
 \begin{longtblr}[
     theme = TASMenu,
     caption = \LARGE{Cocktails},
@@ -360,72 +755,19 @@ def generate_cocktail_table(data):
 \hline\hline
     \SetCell[c=3]{\linewidth} & & \\
 """
-    # Generate rows
-    for _, row in data.iterrows():
-        table += format_cocktail_row(row)
-
-    # Close the table
-    table += r"""
-\end{longtblr}
-"""
-    return table
-
-
-latex_table = generate_cocktail_table(cocktails_df)
-
-# Save the LaTeX output to a file
-with open("cocktails_table.tex", "w") as file:
-    file.write(latex_table)
-
-# print(latex_table)
-
 
 
 ### Spirits Processing
 
-spirits_categories = ["Gin", "Vodka", "Whisky", "Rum", "Liqueur"]
-
-# Function to format LaTeX rows for spirits
-def format_spirit_row(row, spirit_name, displayed_names=set()):
-    """
-    Generate LaTeX row for spirits table.
-    Escapes special characters in `Name` and `Grape Variety`.
-    """
-    glass_price = f"{int(row['Glass'])}" if row["Glass"].is_integer() else f"{row['Glass']:.1f}" if pd.notna(row["Glass"]) else ""
-    name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else ""
-    grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else ""
-    region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
-
-    combined_name_location = f"{name} \\\\ {region}" if region else name
-    if combined_name_location in displayed_names:
-        combined_name_location = ""  # Replace with an empty string if repeated
-    else:
-        displayed_names.add(combined_name_location)  # Mark as displayed
-
-    if spirit_name == "Vodka":
-         return (rf"""
-    {glass_price} & {{{combined_name_location}}} & \quad \quad \quad \quad \quad {{{grape_variety}}} \\
-    \SetCell[c=3]{{\linewidth}} & & \\
-""", displayed_names)
-    elif spirit_name == "Liqueur":
-         return (rf"""
-    {glass_price} & {{{combined_name_location}}} & \quad \quad \quad \quad \quad \quad {{{grape_variety}}} \\
-    \SetCell[c=3]{{\linewidth}} & & \\
-""", displayed_names)        
-    else:
-        return (rf"""
-    {glass_price} & {{{combined_name_location}}} & {{{grape_variety}}} \\
+SPIRIT_ROW = r"""
+    {glass_price} & {{{combined_name_location}}} & {indent}{{{grape_variety}}} \\
     \SetCell[c=3]{{\linewidth}} & & \\
-""", displayed_names)
-
+"""
 
-# Function to generate the LaTeX table for each spirit
-def generate_spirit_table(data, spirit_name):
-    table = rf"""
-\needspace{{10\baselineskip}}
-\begin{{longtblr}}[
+SPIRIT_TABLE_START = r"""
+{needspace}\begin{{longtblr}}[
     theme = TASMenu,
-    caption = \LARGE{{Spirits - {spirit_name}}},
+    caption = \LARGE{{Spirits - {group}}},
     halign = j,
     valign = m,
 ]{{
@@ -437,59 +779,16 @@ def generate_spirit_table(data, spirit_name):
 \hline\hline
     \SetCell[c=3]{{\linewidth}} & & \\
 """
-    disp_names = set()  # Track displayed names to avoid repetition
-    # Generate rows
-    for _, row in data.iterrows():
-        res = format_spirit_row(row, spirit_name, displayed_names=disp_names)
-        table += res[0]
-        disp_names = res[1]
-
-    # Close the table
-    table += r"""
-\end{longtblr}
-"""
-    return table
-
-
-latex_output = ""
-for spirit in spirits_categories:
-    spirit_df = df[df["Heading"].str.contains(fr'\b{spirit}\b', na=False)]  # Filter rows for the current spirit
-    if not spirit_df.empty:
-        latex_output += generate_spirit_table(spirit_df, spirit) + "\n"
-
-        
-with open("spirits_tables.tex", "w") as file:
-    file.write(latex_output)
-
-# print(latex_output)
-
 
 
 ### More Spirits Processing
 
-# Function to format LaTeX rows for spirits
-def format_more_spirit_row(row):
-    """
-    Generate LaTeX row for spirits table.
-    Escapes special characters in `Name` and `Grape Variety`.
-    """
-    glass_price = f"{int(row['Glass'])}" if row["Glass"].is_integer() else f"{row['Glass']:.1f}" if pd.notna(row["Glass"]) else ""
-    name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else ""
-    grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else ""
-    region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
-
-    combined_name_location = f"{name} \\\\ {region}" if region else name
-
-    return rf"""
+MORE_SPIRIT_ROW = r"""
     {glass_price} & {{{combined_name_location}}} & {{{grape_variety}}} \\
     \SetCell[c=3]{{\linewidth}} & & \\
 """
 
-def generate_more_spirits_table(data):
-    """
-    Generate LaTeX table for Pisco, Soju, Amaro, Vermouth, or PX under the title 'More Spirits from NSW'.
-    """
-    table = r"""
+MORE_SPIRITS_TABLE_START = r"""
 \begin{longtblr}[
     theme = TASMenu,
     caption = \LARGE{More Spirits from NSW},
@@ -505,41 +804,16 @@ def generate_more_spirits_table(data):
     \SetCell[c=3]{\linewidth} & & \\
 
 """
-    # Initialize a set to track displayed names
-    displayed_names = set()
-
-    # Generate rows
-    for _, row in data.iterrows():
-        table += format_more_spirit_row(row)
-
-    # Close the table
-    table += r"""
-\end{longtblr}
-"""
-    return table
-
-more_spirits_keywords = ["Pisco", "Soju", "Amaro", "Vermouth", "PX"]
-pattern = "|".join(more_spirits_keywords)  # Create regex pattern for these keywords
-more_spirits_df = df[df["Heading"].str.contains(pattern, na=False, case=False)]
-
-# Generate LaTeX table for More Spirits from NSW
-more_spirits_latex = generate_more_spirits_table(more_spirits_df)
-
-# Save the LaTeX output to a file
-with open("more_spirits_table.tex", "w") as file:
-    file.write(more_spirits_latex)
-
-# print(more_spirits_latex)
 
 
 ### Non-Alcoholic Processing
 
+NON_ALCOHOLIC_ROW = r"""
+    {glass_price} & {{{combined_name_location}}} & {grape_variety} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
 
-def generate_non_alcoholic_table(data):
-    """
-    Generate LaTeX table for Non-alcoholic items.
-    """
-    table = r"""
+NON_ALCOHOLIC_TABLE_START = r"""
 \begin{longtblr}[
     theme = TASMenu,
     caption = \LARGE{Non-alcoholic},
@@ -553,27 +827,9 @@ def generate_non_alcoholic_table(data):
 }
 \hline\hline\\
 """
-    # Generate rows
-    for _, row in data.iterrows():
-        glass_price = (
-            f"{int(row['Glass'])}" if pd.notna(row["Glass"]) and row["Glass"].is_integer()
-            else f"{row['Glass']:.1f}" if pd.notna(row["Glass"])
-            else "~"
-        )
-        name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else "~"
-        region = escape_latex(row["Region"]) if pd.notna(row["Region"]) else ""
-        grape_variety = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else "~"
-    
-        # Combine name and location, deduplicate if repeated
-        combined_name_location = f"{name} \\\\ {region}" if region else name
-
-        # Add rows to the table
-        table += rf"""
-    {glass_price} & {{{combined_name_location}}} & {grape_variety} \\
-    \SetCell[c=3]{{\linewidth}} & & \\
-"""
-        
-    table += r"""
+
+# Rows that are always on the menu, whatever the sheet says
+NON_ALCOHOLIC_EXTRA_ROWS = r"""
     4.5 & Sparkling water & Unlimited  \\
     \SetCell[c=3]{\linewidth} & & \\
     \vspace{-10pt}
@@ -581,32 +837,15 @@ def generate_non_alcoholic_table(data):
     \SetCell[c=3]{\linewidth, halign=l} Bearing no notes or hints of anything, this special blend suits all tastes. Officially known as ``tap\textsuperscript{\texttrademark} A Sydney Water Product'', locals refer to it as the ``Warragamba Slammer'' & ~ & ~ \\
     """
 
-    table += r"""
-\end{longtblr}
-"""
-    return table
-
-# Filter rows for 'Non-alcoholic'
-non_alcoholic_df = df[df["Heading"].str.contains(r'\bNon-alcoholic\b', na=False, case=False)]
-non_alcoholic_df = non_alcoholic_df.iloc[1:-1]
-
-# Generate LaTeX table for Non-alcoholic items
-non_alcoholic_latex = generate_non_alcoholic_table(non_alcoholic_df)
-
-# Save the LaTeX output to a file
-with open("non_alcoholic_table.tex", "w") as file:
-    file.write(non_alcoholic_latex)
-
-# print(non_alcoholic_latex)
-
 
 ### Food Processing
 
-def generate_food_table(data):
-    """
-    Generate LaTeX table for food items.
-    """
-    table = r"""
+FOOD_ROW = r"""
+    {glass_price} & {name} & {{{description}}} \\
+    \SetCell[c=3]{{\linewidth}} & & \\
+"""
+
+FOOD_TABLE_START = r"""
 \begin{longtblr}[
     theme = TASMenu,
     caption = \LARGE{Food},
@@ -621,34 +860,2911 @@ def generate_food_table(data):
 \hline\hline
 \\
 """
-    # Generate rows
-    for _, row in data.iterrows():
-        glass_price = (
-            f"{int(row['Glass'])}" if pd.notna(row["Glass"]) and row["Glass"].is_integer()
-            else f"{row['Glass']:.1f}" if pd.notna(row["Glass"])
-            else "~"
-        )
-        name = escape_latex(row["Name"]) if pd.notna(row["Name"]) else "~"
-        description = escape_latex(row["Grape Variety"]) if pd.notna(row["Grape Variety"]) else "~"
 
-        # Add row to the table
-        table += rf"""
-    {glass_price} & {name} & {{{description}}} \\
-    \SetCell[c=3]{{\linewidth}} & & \\
+
+### Longtable Backend
+
+# The same tables in plain longtable markup, which is much lighter to typeset
+# than tabularray. The TASMenu look comes from LONGTABLE_PREAMBLE setting
+# \LTleft and \LTright to 0pt, so the columns spread over the full width, and
+# \LTpost to the theme's postsep. Cells with line breaks go in a \makecell.
+# (xltabular would only add X columns on top of this, which no table uses.)
+# longtable already sets its rows \LTchunksize at a time, so its wine tables
+# are never split into chunks.
+#
+# menu.tex does not load longtable: these tables have not been proofed in a
+# compiled menu yet, so only the copies bench.py --backends and the server
+# compile get LONGTABLE_PREAMBLE (see `add_to_preamble`).
+
+LONGTABLE_PREAMBLE = r"""
+% longtable: used instead of longtblr by python3 menu.py --backend longtable
+\usepackage{longtable}
+\setlength{\LTleft}{0pt}               % full width, like width=\linewidth
+\setlength{\LTright}{0pt}
+\setlength{\LTpost}{.5\bigskipamount}  % like postsep in menu.tex
 """
-    table += r"""
-\end{longtblr}
+
+LONGTABLE_WINE_ENTRY = r"""
+    \makecell[l]{{\\{prices}}} & \makecell[l]{{{title} \\ {grape_variety} \\ {winemaker}}} & \makecell[r]{{{region}}} \\
+    \\
+    \multicolumn{{3}}{{p{{\dimexpr\linewidth-2\tabcolsep}}}}{{{description}}} \\
+    \\
 """
-    return table
 
-# Filter rows for food
-food_df = df[df["Heading"].str.contains(r'\bFood\b', na=False, case=False)]
+# Wine tables put the region on the right
+LONGTABLE_WINE_TABLE_START = r"""
+\begin{{longtable}}{{@{{\extracolsep{{\fill}}}}llr}}
+\caption*{{\LARGE{{{heading}}}}} \\
+\hline\hline
+\endfirsthead
+\endhead
+    \\
+"""
+
+LONGTABLE_WINE_TABLE_END = "\\end{longtable}\n\n\\vspace{-15pt} \n"
+
+# longtable breaks the page between rows with a \pagebreak after the \\
+LONGTABLE_WINE_PAGEBREAK = "    \\pagebreak\n"
 
-# Generate LaTeX table for food items
-food_latex = generate_food_table(food_df)
+LONGTABLE_START = r"""
+\begin{{longtable}}{{@{{\extracolsep{{\fill}}}}cll}}
+\caption*{{\LARGE{{{caption}}}}} \\
+\hline\hline
+\endfirsthead
+\endhead
+"""
 
-# Save the LaTeX output to a file
-with open("food_table.tex", "w") as file:
-    file.write(food_latex)
+# An empty row, like the spacer under the caption of most tables
+LONGTABLE_SPACER = "    \\\\\n"
+
+LONGTABLE_SPIRIT_TABLE_START = r"""
+{needspace}\begin{{longtable}}{{@{{\extracolsep{{\fill}}}}cll}}
+\caption*{{\LARGE{{Spirits - {group}}}}} \\
+\hline\hline
+\endfirsthead
+\endhead
+    \\
+"""
 
-print(food_latex)
\ No newline at end of file
+LONGTABLE_BEER_CIDER_ROW = r"""
+    \\
+{glass_price} & \makecell[l]{{{winery} \\ {region}}} & \makecell[l]{{{name}}} \\
+"""
+
+LONGTABLE_COCKTAIL_ROW = r"""
+    {glass_price} & {name} & {description} \\
+    \\
+"""
+
+LONGTABLE_SPIRIT_ROW = r"""
+    {glass_price} & \makecell[l]{{{combined_name_location}}} & {indent}{{{grape_variety}}} \\
+    \\
+"""
+
+LONGTABLE_MORE_SPIRIT_ROW = r"""
+    {glass_price} & \makecell[l]{{{combined_name_location}}} & {{{grape_variety}}} \\
+    \\
+"""
+
+LONGTABLE_NON_ALCOHOLIC_ROW = r"""
+    {glass_price} & \makecell[l]{{{combined_name_location}}} & {grape_variety} \\
+    \\
+"""
+
+LONGTABLE_NON_ALCOHOLIC_EXTRA_ROWS = r"""
+    4.5 & Sparkling water & Unlimited  \\
+    \\
+    \noalign{\vspace{-10pt}}
+    -   & \makecell[l]{tap\textsuperscript{\texttrademark} by Sydney Water \\ Wollondilly Shire } & ~ \\
+    \multicolumn{3}{p{\dimexpr\linewidth-2\tabcolsep}}{Bearing no notes or hints of anything, this special blend suits all tastes. Officially known as ``tap\textsuperscript{\texttrademark} A Sydney Water Product'', locals refer to it as the ``Warragamba Slammer''} \\
+    """
+
+LONGTABLE_FOOD_ROW = r"""
+    {glass_price} & {name} & \makecell[l]{{{description}}} \\
+    \\
+"""
+
+LONGTABLE_END = r"""
+\end{longtable}
+"""
+
+# The markup each table backend emits, by the name of the longtblr template it
+# replaces, and the "preamble" a document needs on top of menu.tex to compile it
+TABLE_BACKENDS = {
+    "longtblr": {
+        "preamble": "",
+        "wine_entry": WINE_ENTRY,
+        "wine_table_start": WINE_TABLE_START,
+        "wine_table_end": WINE_TABLE_END,
+        "wine_pagebreak": WINE_PAGEBREAK,
+        "wine_table_continue": WINE_TABLE_CONTINUE,
+        "wine_chunk_end": WINE_CHUNK_END,
+        "beer_cider_row": BEER_CIDER_ROW,
+        "beer_cider_table_start": BEER_CIDER_TABLE_START,
+        "cocktail_row": COCKTAIL_ROW,
+        "cocktail_table_start": COCKTAIL_TABLE_START,
+        "spirit_row": SPIRIT_ROW,
+        "spirit_table_start": SPIRIT_TABLE_START,
+        "more_spirit_row": MORE_SPIRIT_ROW,
+        "more_spirits_table_start": MORE_SPIRITS_TABLE_START,
+        "non_alcoholic_row": NON_ALCOHOLIC_ROW,
+        "non_alcoholic_table_start": NON_ALCOHOLIC_TABLE_START,
+        "non_alcoholic_extra_rows": NON_ALCOHOLIC_EXTRA_ROWS,
+        "food_row": FOOD_ROW,
+        "food_table_start": FOOD_TABLE_START,
+        "table_end": TABLE_END,
+    },
+    "longtable": {
+        "preamble": LONGTABLE_PREAMBLE,
+        "wine_entry": LONGTABLE_WINE_ENTRY,
+        "wine_table_start": LONGTABLE_WINE_TABLE_START,
+        "wine_table_end": LONGTABLE_WINE_TABLE_END,
+        "wine_pagebreak": LONGTABLE_WINE_PAGEBREAK,
+        "wine_table_continue": None,
+        "wine_chunk_end": None,
+        "beer_cider_row": LONGTABLE_BEER_CIDER_ROW,
+        "beer_cider_table_start": LONGTABLE_START.format(caption="Beer \\& Cider"),
+        "cocktail_row": LONGTABLE_COCKTAIL_ROW,
+        "cocktail_table_start": LONGTABLE_START.format(caption="Cocktails") + LONGTABLE_SPACER,
+        "spirit_row": LONGTABLE_SPIRIT_ROW,
+        "spirit_table_start": LONGTABLE_SPIRIT_TABLE_START,
+        "more_spirit_row": LONGTABLE_MORE_SPIRIT_ROW,
+        "more_spirits_table_start": LONGTABLE_START.format(caption="More Spirits from NSW") + LONGTABLE_SPACER,
+        "non_alcoholic_row": LONGTABLE_NON_ALCOHOLIC_ROW,
+        "non_alcoholic_table_start": LONGTABLE_START.format(caption="Non-alcoholic") + LONGTABLE_SPACER,
+        "non_alcoholic_extra_rows": LONGTABLE_NON_ALCOHOLIC_EXTRA_ROWS,
+        "food_row": LONGTABLE_FOOD_ROW,
+        "food_table_start": LONGTABLE_START.format(caption="Food") + LONGTABLE_SPACER,
+        "table_end": LONGTABLE_END,
+    },
+}
+
+
+### Section Specs
+#
+# Every section but the wine list is described by a spec in menu_sections.json
+# rather than by code: where its rows come from, which templates it is made of
+# and what goes into each placeholder of its row template. Each spec is checked
+# and compiled once into a pair of formatters per cell, one filling a whole
+# column for the pandas path and one filling a single cell for the streaming
+# path, which one engine runs for every section.
+#
+# A spec holds
+# name         - the section's name, e.g. for --sections
+# title        - its title on the website (see Targets), the name by default
+# file         - the .tex file menu.tex \inputs
+# route        - the pattern its headings match ("ignore_case": true to ignore case)
+# groups       - instead of a route, [name, pattern] pairs: one table per
+#                group in this order, its start formatted with {group} and a
+#                {needspace} for the caption and first "keep_rows" rows
+# layout       - "wine" for the paginated wine list, otherwise "table"
+# start, row   - the table opening and row template, each a key of
+#                TABLE_BACKENDS, a template, or a dict of them by backend
+# extra_rows   - rows printed after the sheet's, in the same forms
+# cells        - for each placeholder of the row template, one of
+#                {"text": column}         - escaped text
+#                {"price": column}        - a price, with "fraction" as format
+#                {"whole_price": column}  - a price in whole dollars
+#                {"name_location": true}  - the name, over the region if any
+#                {"group": {group: text}} - fixed text per group
+#                with an optional "missing" for empty cells, and "unique": true
+#                to only show each value the first time in a table
+# drop_last    - leave out the section's last row
+# height_cells - templates of the cells whose lines decide a row's height
+# head_height, extra_height, after_height - the height of the table head (the
+#                default is TABLE_HEAD_HEIGHT), of the extra rows and of what
+#                menu.tex prints after the table, in pt or a key of SPEC_HEIGHTS
+# run_on       - the section carries on down the page the one before it ends on
+# chunk_rows   - with the wine layout, the entries in each chunk of a long
+#                table (see WINE_CHUNK_END), 0 (the default) for none
+# required     - the columns every row must fill in
+# prices       - {column: [lowest, highest]}: the price columns checked to be
+#                numbers in that range when filled in
+# headings     - {heading: {column: [lowest, highest] or null}}: other ranges
+#                for the rows of a heading, null when it does not use the column
+
+SECTIONS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu_sections.json")
+
+SPEC_LAYOUTS = ["table", "wine"]
+
+# The columns of the sheet menu.py reads whatever the specs say
+SHEET_COLUMNS = [
+    "Heading", "Glass", "Carafe", "Bottle", "Vintage", "Winery", "Name",
+    "Grape Variety", "Winemaker and/or Owner", "Region", "Description",
+]
+# The only columns menu.py reads from the sheet: SHEET_COLUMNS and the ones
+# the specs print, require or check (see `used_columns`)
+USED_COLUMNS = []
+
+def cell_formatters(cell):
+    """
+    Compile the spec of one cell into (column, single): `column(data, group)`
+    fills the cell for every row of `data`, `single(row, group)` for one row.
+    """
+    missing = cell.get("missing", "")
+    if "text" in cell:
+        source = cell["text"]
+        return (lambda data, group: escaped_column(data[source], missing),
+                lambda row, group: cell_escaped(row[source], missing))
+    if "price" in cell:
+        source, fraction = cell["price"], cell.get("fraction", "{}")
+        return (lambda data, group: price_column(data[source], missing, fraction),
+                lambda row, group: cell_price(row[source], missing, fraction))
+    if "whole_price" in cell:
+        source = cell["whole_price"]
+
+        def whole_prices(data, group):
+            prices = numeric_column(data[source])
+            return text_column(prices.dropna().astype("int64")).reindex(prices.index, fill_value=missing)
+        return (whole_prices,
+                lambda row, group: str(int(row[source])) if is_number(row[source]) else missing)
+    if "name_location" in cell:
+        def name_locations(data, group):
+            name = escaped_column(data["Name"], missing)
+            region = escaped_column(data["Region"])
+            return (name + " \\\\ " + region).where(region != "", name)
+        return name_locations, lambda row, group: cell_name_location(row, missing)
+    if "group" in cell:
+        texts = cell["group"]
+
+        def group_texts(data, group):
+            import pandas as pd
+
+            return pd.Series(texts.get(group, missing), index=data.index, dtype=object)
+        return group_texts, lambda row, group: texts.get(group, missing)
+    raise ValueError(f"Unknown cell {json.dumps(cell)}: it needs one of text, price, whole_price, name_location or group")
+
+def cell_columns(cell):
+    """
+    The columns of the sheet a cell prints.
+    """
+    if "name_location" in cell:
+        return ["Name", "Region"]
+    return [cell[key] for key in ("text", "price", "whole_price") if key in cell]
+
+def compile_spec(source):
+    """
+    Check one spec from menu_sections.json and compile it for the engine.
+    """
+    for key in ("name", "file"):
+        if key not in source:
+            raise ValueError(f"A section spec needs a {key}: {json.dumps(source)}")
+    spec = {
+        "source": source,
+        "name": source["name"],
+        "title": source.get("title", source["name"]),
+        "file": source["file"],
+        "layout": source.get("layout", "table"),
+        "groups": None,
+        "start": source.get("start"),
+        "row": source.get("row"),
+        "extra_rows": source.get("extra_rows", ""),
+        "cells": {},
+        "columns": list(WINE_COLUMNS) if source.get("layout") == "wine" else [],
+        "drop_last": source.get("drop_last", False),
+        "keep_rows": source.get("keep_rows", 1),
+        "height_cells": source.get("height_cells", []),
+        "head_height": source.get("head_height", "table_head"),
+        "extra_height": source.get("extra_height", 0),
+        "after_height": source.get("after_height", 0),
+        "run_on": source.get("run_on", False),
+        "chunk_rows": source.get("chunk_rows", CHUNK_ROWS),
+        "required": source.get("required", []),
+        "prices": {},
+        "headings": {},
+    }
+    if spec["layout"] not in SPEC_LAYOUTS:
+        raise ValueError(f"Section {spec['name']}: unknown layout {spec['layout']} (choose from {', '.join(SPEC_LAYOUTS)})")
+    if not isinstance(spec["chunk_rows"], int) or isinstance(spec["chunk_rows"], bool) or spec["chunk_rows"] < 0:
+        raise ValueError(f"Section {spec['name']}: chunk_rows must be a whole number of entries, not {json.dumps(spec['chunk_rows'])}")
+    flags = re.IGNORECASE if source.get("ignore_case") else 0
+    if "groups" in source:
+        spec["groups"] = [(group, re.compile(pattern, flags)) for group, pattern in source["groups"]]
+        spec["route"] = re.compile("|".join(pattern for _, pattern in source["groups"]), flags)
+    elif "route" in source:
+        spec["route"] = re.compile(source["route"], flags)
+    else:
+        raise ValueError(f"Section {spec['name']} needs a route or groups")
+    for column, bounds in source.get("prices", {}).items():
+        spec["prices"][column] = price_range(spec, column, bounds)
+    for heading, ranges in source.get("headings", {}).items():
+        spec["headings"][heading] = {
+            column: None if bounds is None else price_range(spec, column, bounds)
+            for column, bounds in ranges.items()
+        }
+    if spec["layout"] == "table":
+        if spec["start"] is None or spec["row"] is None:
+            raise ValueError(f"Section {spec['name']} needs a start and a row template")
+        for name, cell in source.get("cells", {}).items():
+            column, single = cell_formatters(cell)
+            spec["cells"][name] = {"column": column, "single": single, "unique": cell.get("unique", False)}
+            spec["columns"] += [source for source in cell_columns(cell) if source not in spec["columns"]]
+    return spec
+
+def price_range(spec, column, bounds):
+    numbers = isinstance(bounds, list) and all(isinstance(bound, (int, float)) and not isinstance(bound, bool) for bound in bounds)
+    if not numbers or len(bounds) != 2:
+        raise ValueError(f"Section {spec['name']}: the range of {column} must be [lowest, highest], not {json.dumps(bounds)}")
+    return tuple(bounds)
+
+def read_section_specs(path=SECTIONS_CONFIG):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+def compile_specs(sources):
+    """
+    Compile the specs of every section, in menu order, by name.
+    """
+    specs = {}
+    for source in sources:
+        spec = compile_spec(source)
+        if spec["name"] in specs:
+            raise ValueError(f"Section {spec['name']} is defined twice")
+        specs[spec["name"]] = spec
+    return specs
+
+def no_carafe_headings(specs):
+    """
+    The headings a wine spec gives no Carafe price ("Carafe": null under "headings").
+    """
+    return [
+        heading
+        for spec in specs.values() if spec["layout"] == "wine"
+        for heading, ranges in spec["headings"].items() if "Carafe" in ranges and ranges["Carafe"] is None
+    ]
+
+def used_columns(specs):
+    """
+    SHEET_COLUMNS followed by the other columns the sections of `specs` print,
+    require or check the prices of.
+    """
+    columns = list(SHEET_COLUMNS)
+    for spec in specs.values():
+        checked = [column for ranges in spec["headings"].values() for column in ranges]
+        for column in spec["columns"] + spec["required"] + list(spec["prices"]) + checked:
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+SECTION_SPECS = compile_specs(read_section_specs())
+NO_CARAFE_HEADINGS[:] = no_carafe_headings(SECTION_SPECS)
+USED_COLUMNS[:] = used_columns(SECTION_SPECS)
+
+def spec_template(spec, key, backend="longtblr"):
+    """
+    The template `spec` gives for `key`, for `backend`.
+    """
+    markup = TABLE_BACKENDS[backend]
+    template = spec[key]
+    if isinstance(template, dict):
+        template = template[backend]
+    return markup.get(template, template)
+
+def spec_columns(spec, data, group=None):
+    """
+    Fill every cell of `spec` for all the rows of `data` at once.
+    """
+    columns = {}
+    for name, cell in spec["cells"].items():
+        column = cell["column"](data, group)
+        if cell["unique"]:
+            column = column.where(~column.duplicated(), "")
+        columns[name] = column
+    return columns
+
+def spec_row_height(spec, values):
+    return row_height(*(template.format_map(values) for template in spec["height_cells"]))
+
+def spec_heights(spec, columns, rows=None):
+    """
+    The estimated height of each row of filled `columns`, or of the first `rows`.
+    """
+    names = list(columns)
+    values = itertools.islice(zip(*columns.values()), rows)
+    return [spec_row_height(spec, dict(zip(names, row))) for row in values]
+
+def spec_table_start(spec, group, heights, backend="longtblr"):
+    """
+    The opening of a table of `spec`. The tables of a grouped section are
+    captioned with their group and keep their caption on a page with the first
+    rows, whose estimated `heights` are given.
+    """
+    start = spec_template(spec, "start", backend)
+    if spec["groups"] is None:
+        return start
+    space = spec_height(spec["head_height"]) + sum(heights[:spec["keep_rows"]])
+    return start.format(group=group, needspace=needspace(space))
+
+def render_spec_table(spec, data, group=None, backend="longtblr"):
+    """
+    Render one table of `spec` from the rows of `data`, a whole column at a time.
+    """
+    columns = spec_columns(spec, data, group)
+    heights = spec_heights(spec, columns, spec["keep_rows"]) if spec["groups"] else []
+    table = spec_table_start(spec, group, heights, backend)
+    table += render_rows(spec_template(spec, "row", backend), **columns)
+    table += spec_template(spec, "extra_rows", backend)
+    table += TABLE_BACKENDS[backend]["table_end"]
+    return table
+
+def spec_groups(spec, data):
+    """
+    Split the rows of `data` into the groups of `spec`, in its order.
+    Returns (group, rows) for every group with rows, or (None, data) if `spec`
+    has no groups.
+    """
+    if spec["groups"] is None:
+        return [(None, data)]
+    routing = route_sheet(data, spec["groups"])
+    return [
+        (group, data.iloc[routing["sections"][group]])
+        for group, _ in spec["groups"]
+        if len(routing["sections"][group])
+    ]
+
+def render_spec(spec, data, backend="longtblr"):
+    """
+    Render the section described by `spec` from its rows in `data`.
+    """
+    if spec["layout"] == "wine":
+        return generate_wine_menu(data, backend, spec["chunk_rows"])
+    if spec["groups"] is None:
+        return render_spec_table(spec, data, backend=backend)
+    return "".join(render_spec_table(spec, rows, group, backend) + "\n" for group, rows in spec_groups(spec, data))
+
+
+### Routing
+#
+# Every row goes to exactly one section: the first route in the routing table
+# whose pattern matches its Heading. Each distinct heading is only matched once.
+
+# Routing table in order of precedence, so "Wine - Non-alcoholic" is a wine
+SECTION_ROUTES = [(name, spec["route"]) for name, spec in SECTION_SPECS.items()]
+
+def match_routes(heading, routes=SECTION_ROUTES):
+    """
+    Return the name of every route matching `heading`, in order of precedence.
+    """
+    if not isinstance(heading, str):
+        return []
+    return [name for name, pattern in routes if pattern.search(heading)]
+
+def route_sheet(df, routes=SECTION_ROUTES):
+    """
+    Classify every row of `df` into a route in a single pass.
+
+    Returns a dict of
+    sections  - route name -> row positions, in sheet order
+    headings  - heading -> row positions
+    unmatched - heading -> number of rows that matched no route
+    ambiguous - heading -> every route it matched (its rows went to the first)
+    Rows without a heading are blank and are left out silently.
+    """
+    import numpy as np
+
+    headings = df.groupby("Heading", sort=False).indices
+    positions = {name: [] for name, _ in routes}
+    unmatched, ambiguous = {}, {}
+
+    for heading, rows in headings.items():
+        matches = match_routes(heading, routes)
+        if not matches:
+            unmatched[heading] = len(rows)
+            continue
+        if len(matches) > 1:
+            ambiguous[heading] = matches
+        positions[matches[0]].append(rows)
+
+    return {
+        "sections": {
+            name: np.sort(np.concatenate(rows)) if rows else np.array([], dtype=int)
+            for name, rows in positions.items()
+        },
+        "headings": headings,
+        "unmatched": unmatched,
+        "ambiguous": ambiguous,
+    }
+
+def routing_report(routing):
+    """
+    Warnings for the rows that were left out or could have gone to several sections.
+    """
+    lines = []
+    for heading, count in routing["unmatched"].items():
+        lines.append(f"Warning: {count} row(s) with heading '{heading}' match no section and were left out")
+    for heading, names in routing["ambiguous"].items():
+        lines.append(f"Warning: heading '{heading}' matches {', '.join(names)}; its rows went to {names[0]} only")
+    return lines
+
+
+### Output
+
+SECTIONS_MANIFEST = os.path.join(CACHE_DIR, "sections.json")
+
+# The file menu.tex \\inputs for each section
+SECTION_FILES = {name: spec["file"] for name, spec in SECTION_SPECS.items()}
+
+def use_section_specs(sources):
+    """
+    Describe the menu's sections with the specs in `sources` (see Section
+    Specs) instead of menu_sections.json, e.g. for a venue of its own.
+    """
+    specs = compile_specs(sources)
+    SECTION_SPECS.clear()
+    SECTION_SPECS.update(specs)
+    SECTION_ROUTES[:] = [(name, spec["route"]) for name, spec in specs.items()]
+    SECTION_FILES.clear()
+    SECTION_FILES.update((name, spec["file"]) for name, spec in specs.items())
+    NO_CARAFE_HEADINGS[:] = no_carafe_headings(specs)
+    USED_COLUMNS[:] = used_columns(specs)
+
+def select_sections(df, routing=None, sections=None):
+    """
+    Split the sheet into the rows of each section.
+    Returns (section, rows, spec) for every section of the menu, or only for
+    the names in `sections`.
+    """
+    if routing is None:
+        routing = route_sheet(df)
+
+    selected = []
+    for name, positions in routing["sections"].items():
+        if sections is not None and name not in sections:
+            continue
+        data = df.iloc[positions]
+        if SECTION_SPECS[name]["drop_last"]:
+            # e.g. the last non-alcoholic row is sparkling water, which its extra rows already print
+            data = data.iloc[:-1]
+        selected.append((name, data, SECTION_SPECS[name]))
+    return selected
+
+def source_hash():
+    """
+    Hash of this script and the section specs, so edits to the templates or
+    the specs invalidate every section.
+    """
+    digest = hashlib.sha256()
+    with open(__file__, "rb") as file:
+        digest.update(file.read())
+    digest.update(json.dumps([spec["source"] for spec in SECTION_SPECS.values()], sort_keys=True).encode())
+    return digest.hexdigest()
+
+def section_fingerprint(data, salt=""):
+    """
+    Fingerprint the rows feeding a section: their positions, columns and values.
+    """
+    import pandas as pd
+
+    digest = hashlib.sha256(salt.encode())
+    digest.update("\0".join(map(str, data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data.astype(object), index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def file_hash(path):
+    """
+    SHA-256 of the file at `path` as written by `write_if_changed`, or None if it does not exist.
+    """
+    try:
+        with open(path) as file:
+            return hashlib.sha256(file.read().encode()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def write_if_changed(path, content):
+    """
+    Atomically replace `path` with `content` unless it already holds exactly that.
+    Returns True if the file was written.
+    """
+    if os.path.exists(path):
+        with open(path) as file:
+            if file.read() == content:
+                return False
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+    return True
+
+# How a section split into chunks \inputs them
+CHUNK_INPUT = re.compile(r"^\\input\{([^{}]+)\}$", re.MULTILINE)
+
+def chunk_path(path, number):
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{number}{extension}"
+
+def remove_stale_chunks(path, keep=0):
+    """
+    Remove the chunk files of `path` after the first `keep`, left over from a longer version.
+    """
+    number = keep + 1
+    while os.path.exists(chunk_path(path, number)):
+        os.remove(chunk_path(path, number))
+        number += 1
+
+def write_section(path, content):
+    """
+    Write the LaTeX of a section to `path`. If it was split into chunks (see
+    CHUNK_BREAK), each chunk goes to a file of its own beside it, numbered from
+    1, and `path` only \\inputs them in order.
+    Returns True if any file was written.
+    """
+    chunks = content.split(CHUNK_BREAK)
+    written = False
+    if len(chunks) > 1:
+        for number, chunk in enumerate(chunks, 1):
+            written = write_if_changed(chunk_path(path, number), chunk) or written
+        content = "".join(f"\\input{{{os.path.basename(chunk_path(path, number))}}}\n" for number in range(1, len(chunks) + 1))
+    remove_stale_chunks(path, len(chunks) if len(chunks) > 1 else 0)
+    return write_if_changed(path, content) or written
+
+def section_hash(path):
+    """
+    `file_hash` of a section's file, taking in the chunk files it \\inputs.
+    """
+    digest = file_hash(path)
+    if digest is None:
+        return None
+    with open(path) as file:
+        names = CHUNK_INPUT.findall(file.read())
+    if not names:
+        return digest
+    combined = hashlib.sha256(digest.encode())
+    for name in names:
+        combined.update(f"\0{name}\0{file_hash(os.path.join(os.path.dirname(path), name))}".encode())
+    return combined.hexdigest()
+
+def load_manifest(path=SECTIONS_MANIFEST):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, path=SECTIONS_MANIFEST):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_if_changed(path, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+def render_section(name, data, backend="longtblr"):
+    with profiled("render", name, len(data)):
+        return render_spec(SECTION_SPECS[name], data, backend)
+
+# Rows below which the sections are rendered one after another even with
+# --jobs. Starting the pool and sending it the rows costs about 0.1s, and the
+# wine list, about half of the rendering, is one task, so on two or more CPUs
+# the pool only pays off once rendering takes well over 0.2s. On one CPU it
+# never does (bench.py --jobs: 0.8x at 10k rows, 0.9x at 100k).
+POOL_ROWS = 20000
+
+def render_sections(tasks, jobs=1, backend="longtblr"):
+    """
+    Render the (section, rows) tasks and return their LaTeX in task order.
+    With `jobs` > 1 and at least POOL_ROWS rows, the sections are rendered at
+    the same time in a pool of processes. Each worker is only sent its own
+    section's rows, trimmed to the columns the generators read, never the
+    whole sheet; sections rendered in the pool are not profiled one by one.
+    """
+    if jobs <= 1 or len(tasks) <= 1 or sum(len(data) for _, data in tasks) < POOL_ROWS:
+        return [render_section(name, data, backend) for name, data in tasks]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    names = [name for name, _ in tasks]
+    frames = [data[[c for c in USED_COLUMNS if c in data.columns]] for _, data in tasks]
+    sources = [spec["source"] for spec in SECTION_SPECS.values()]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), initializer=use_section_specs, initargs=(sources,)) as pool:
+        return list(pool.map(render_section, names, frames, [backend] * len(tasks)))
+
+def write_sections(df, routing=None, sections=None, out_dir=".", force=False, jobs=1, backend="longtblr"):
+    """
+    Regenerate the .tex file of every section whose input rows changed since the last run.
+    Files are only rewritten when their content changes, so latexmk does not see
+    untouched sections as dirty. Returns (regenerated, skipped) output files.
+    """
+    manifest = {} if force else load_manifest()
+    salt = f"{source_hash()}:{backend}"
+    regenerated, skipped = [], []
+
+    dirty = []
+    for name, data, _ in select_sections(df, routing, sections):
+        path = os.path.normpath(os.path.join(out_dir, SECTION_FILES[name]))
+        fingerprint = section_fingerprint(data, salt)
+        # Skip only if the rows are unchanged and nobody edited the output by hand
+        if manifest.get(path, {}).get("rows") == fingerprint and section_hash(path) == manifest[path]["output"]:
+            skipped.append(path)
+        else:
+            dirty.append((name, data, path, fingerprint))
+
+    rows = sum(len(data) for _, data, _, _ in dirty)
+    with profiled("render", rows=rows), cprofiled():
+        contents = render_sections([(name, data) for name, data, _, _ in dirty], jobs, backend)
+    with profiled("write", rows=rows):
+        for (name, data, path, fingerprint), content in zip(dirty, contents):
+            if write_section(path, content):
+                regenerated.append(path)
+            else:
+                skipped.append(path)
+            manifest[path] = {"rows": fingerprint, "output": section_hash(path)}
+
+    save_manifest(manifest)
+    return regenerated, skipped
+
+
+### Validation
+#
+# Before any LaTeX is written, the rows each section will print are checked a
+# whole column at a time: the columns its spec requires are filled in, its
+# prices are numbers within their ranges (see "prices" and "headings" in the
+# section specs) and no cell holds a character pdflatex cannot typeset. Every
+# problem is reported with its row in the workbook and nothing is written.
+# The streaming path checks each row against the same rules as it reads it.
+
+# The workbook's first row holds the column names
+FIRST_ROW = 2
+
+# Characters the utf8 inputenc and T1 fontenc of menu.tex cannot typeset.
+# LaTeX's own special characters are escaped, so they are safe.
+LATEX_UNSAFE = re.compile("[^\t\n\r\x20-\x7e\xa0-\u017f\u2013\u2014\u2018\u2019\u201a\u201c\u201d\u201e"
+                          "\u2020\u2021\u2022\u2026\u2030\u2039\u203a\u20ac\u2122]")
+
+# Problems listed in a report before the rest are only counted
+VALIDATION_REPORT_LIMIT = 50
+
+def column_rules(df, selected):
+    """
+    What is checked in each column for every row of the selected sections
+    (see `select_sections`): a frame per column, indexed like `df`, of whether
+    the cell is "required", whether it is a "price", and the "lowest" and
+    "highest" price it may be.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rules = {}
+
+    def rule(column):
+        if column not in rules:
+            rules[column] = pd.DataFrame(
+                {"required": False, "price": False, "lowest": -np.inf, "highest": np.inf}, index=df.index
+            )
+        return rules[column]
+
+    def set_range(column, rows, bounds):
+        rule(column).loc[rows, "price"] = True
+        rule(column).loc[rows, "lowest"], rule(column).loc[rows, "highest"] = bounds
+
+    for _, data, spec in selected:
+        for column in spec["required"]:
+            rule(column).loc[data.index, "required"] = True
+        for column, bounds in spec["prices"].items():
+            set_range(column, data.index, bounds)
+        for heading, ranges in spec["headings"].items():
+            rows = data.index[data["Heading"] == heading]
+            for column, bounds in ranges.items():
+                if bounds is None:
+                    rule(column).loc[rows, ["required", "price"]] = False
+                else:
+                    set_range(column, rows, bounds)
+    return rules
+
+def validate_sheet(df, selected):
+    """
+    Check the rows of the selected sections (see `select_sections`) of `df`.
+    Returns the problems as (row in the workbook, heading, message), in sheet order.
+    """
+    import pandas as pd
+
+    problems = []
+
+    def report(mask, message):
+        for label in mask.index[mask]:
+            problems.append((label, message(label)))
+
+    for column, rule in column_rules(df, selected).items():
+        values = df[column] if column in df else pd.Series(None, index=df.index, dtype=object)
+        filled = values.notna()
+        numbers = numeric_column(values)
+        report(rule["required"] & ~filled, lambda label: f"{column} is empty")
+        report(rule["price"] & filled & numbers.isna(),
+               lambda label: f"{column} {values[label]!r} is not a number")
+        report(rule["price"] & ((numbers < rule["lowest"]) | (numbers > rule["highest"])),
+               lambda label: f"{column} {numbers[label]:g} is not between {rule.at[label, 'lowest']:g} "
+                             f"and {rule.at[label, 'highest']:g}")
+
+    printed = pd.Index([]).append([data.index for _, data, _ in selected])
+    for column in USED_COLUMNS:
+        if column not in df:
+            continue
+        values = df.loc[printed, column]
+        text = values[values.notna()].astype(str)
+        unsafe = text.str.extract(f"({LATEX_UNSAFE.pattern})", expand=False).dropna()
+        for label, character in unsafe.items():
+            problems.append((label, f"{column} has {character!r} (U+{ord(character):04X}), which pdflatex cannot typeset"))
+
+    problems.sort(key=lambda problem: problem[0])
+    return [(label + FIRST_ROW, df.at[label, "Heading"], message) for label, message in problems]
+
+def row_rules(spec, heading):
+    """
+    What `column_rules` checks in a row of `spec` under `heading`: the columns
+    that must be filled in and the (lowest, highest) of each price column.
+    """
+    required = list(spec["required"])
+    prices = dict(spec["prices"])
+    for column, bounds in spec["headings"].get(heading, {}).items():
+        if bounds is None:
+            required = [name for name in required if name != column]
+            prices.pop(column, None)
+        else:
+            prices[column] = bounds
+    return required, prices
+
+def validate_row(row, rules):
+    """
+    Single-row version of `validate_sheet` for the streaming path, with the
+    `row_rules` of its section and heading. Returns the messages.
+    """
+    required, prices = rules
+    problems = []
+    for column in required + [name for name in prices if name not in required]:
+        value = row.get(column)
+        if value is None or value != value:
+            if column in required:
+                problems.append(f"{column} is empty")
+        elif column in prices:
+            lowest, highest = prices[column]
+            if not is_number(value):
+                problems.append(f"{column} {value!r} is not a number")
+            elif not lowest <= value <= highest:
+                problems.append(f"{column} {value:g} is not between {lowest:g} and {highest:g}")
+    for column in USED_COLUMNS:
+        value = row.get(column)
+        if value is not None and value == value:
+            match = LATEX_UNSAFE.search(str(value))
+            if match:
+                character = match.group()
+                problems.append(f"{column} has {character!r} (U+{ord(character):04X}), which pdflatex cannot typeset")
+    return problems
+
+def validation_report(problems, workbook, sheet):
+    lines = [f"{len(problems)} problem(s) in sheet '{sheet}' of {workbook}, so nothing was written:"]
+    for row, heading, message in problems[:VALIDATION_REPORT_LIMIT]:
+        lines.append(f"    row {row} ({heading}): {message}")
+    if len(problems) > VALIDATION_REPORT_LIMIT:
+        lines.append(f"    and {len(problems) - VALIDATION_REPORT_LIMIT} more")
+    return "\n".join(lines)
+
+
+### Page Count
+
+# Pages of menu.tex around the sections: the logo, the house rules and the
+# wine map before them, and the art collection after
+FRONT_PAGES = 3
+BACK_PAGES = 1
+
+# Sparkling water, then tap water over two lines with its three line note,
+# pulled up by the \vspace{-10pt} between them
+NON_ALCOHOLIC_EXTRA_HEIGHT = row_height("") + row_height("", "\\\\") + 3 * BASELINE_SKIP + ROW_SEP - 10.0
+
+# The allergen note menu.tex prints under the food table
+FOOD_NOTE_HEIGHT = 2 * BASELINE_SKIP
+
+LOG_PAGES = re.compile(r"Output written on .*?\((\d+) pages?")
+
+def table_blocks(head_height, heights, keep=1):
+    """
+    Split a table into the blocks `count_pages` fills pages with: the head kept
+    with its first `keep` rows, then every other row on its own.
+    """
+    if not heights:
+        return []
+    return [head_height + sum(heights[:keep]), *heights[keep:]]
+
+def wine_blocks(data):
+    _, heights = render_wine_entries(data)
+    blocks = []
+    for _, group in itertools.groupby(zip(data["Heading"], heights), key=lambda item: item[0]):
+        blocks += table_blocks(TABLE_HEAD_HEIGHT, [height for _, height in group])
+    return blocks
+
+# Heights a section spec can name instead of giving them in pt
+SPEC_HEIGHTS = {
+    "caption": CAPTION_HEIGHT,
+    "table_head": TABLE_HEAD_HEIGHT,
+    "non_alcoholic_extra_rows": NON_ALCOHOLIC_EXTRA_HEIGHT,
+    "food_note": FOOD_NOTE_HEIGHT,
+}
+
+def spec_height(height):
+    return SPEC_HEIGHTS[height] if isinstance(height, str) else float(height)
+
+def section_blocks(spec, data):
+    """
+    The blocks of the section described by `spec`, estimated from its rows in `data`.
+    """
+    if spec["layout"] == "wine":
+        return wine_blocks(data)
+    blocks = []
+    for group, rows in spec_groups(spec, data):
+        heights = spec_heights(spec, spec_columns(spec, rows, group))
+        if spec["extra_height"]:
+            heights.append(spec_height(spec["extra_height"]))
+        blocks += table_blocks(spec_height(spec["head_height"]), heights, keep=spec["keep_rows"])
+    if spec["after_height"]:
+        blocks.append(spec_height(spec["after_height"]))
+    return blocks
+
+def predict_pages(df, routing=None):
+    """
+    Estimate the pages each section of the menu takes from the heights of its
+    rows. Returns {section: pages} in menu order; a section that runs on from
+    the one before only counts the pages it begins.
+    """
+    pages = {}
+    used = 0.0
+    for name, data, spec in select_sections(df, routing):
+        blocks = section_blocks(spec, data)
+        if not blocks:
+            pages[name] = 0
+            continue
+        # A section can carry on down the page the one before it ends on
+        run_on = spec["run_on"] and used > 0
+        new_pages, used = count_pages(blocks, used if run_on else 0.0)
+        pages[name] = new_pages + (not run_on)
+    return pages
+
+def logged_pages(log_path):
+    """
+    The page count pdflatex reported in its log, or None if there is no log or it has none.
+    """
+    try:
+        with open(log_path, encoding="latin-1") as file:
+            match = LOG_PAGES.search(file.read())
+    except FileNotFoundError:
+        return None
+    return int(match.group(1)) if match else None
+
+def page_report(df, log_path="menu.log"):
+    """
+    Compare the predicted length of the menu with the last compile of menu.tex.
+    """
+    sections = predict_pages(df)
+    return {
+        "sections": sections,
+        "predicted": FRONT_PAGES + sum(sections.values()) + BACK_PAGES,
+        "actual": logged_pages(log_path),
+    }
+
+
+### Streaming
+#
+# For very large sheets the menu can be built without pandas: the sheet is read
+# row by row in openpyxl's read-only mode, every row is routed to the sections it
+# belongs to, and each section writer appends it to its .tex file straight away,
+# so memory use does not grow with the sheet.
+
+def stream_sheet(file_path, sheet_name, columns=USED_COLUMNS):
+    """
+    Yield every row of the sheet as a dict holding only `columns`. Empty cells are None.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        positions = [(name, header.index(name) if name in header else None) for name in columns]
+        for values in rows:
+            yield {
+                name: values[i] if i is not None and i < len(values) else None
+                for name, i in positions
+            }
+    finally:
+        workbook.close()
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+def cell_text(value, missing=""):
+    return missing if value is None or value != value else str(value)
+
+def cell_price(value, missing="", fraction="{}"):
+    """
+    Single-cell version of `price_column`.
+    """
+    if not is_number(value):
+        return cell_text(value, missing)
+    return str(int(value)) if value % 1 == 0 else fraction.format(value)
+
+def cell_escaped(value, missing=""):
+    return missing if value is None or value != value else escape_latex(str(value))
+
+def cell_name_location(row, missing=""):
+    name = cell_escaped(row["Name"], missing)
+    region = cell_escaped(row["Region"])
+    return f"{name} \\\\ {region}" if region else name
+
+def render_wine_entry(row, backend="longtblr"):
+    glass_price = cell_price(row["Glass"])
+    bottle_price = cell_price(row["Bottle"])
+    # A missing or text carafe price is printed as 0
+    carafe_price = math.ceil(row["Carafe"]) if is_number(row["Carafe"]) else 0
+    if row["Heading"] in NO_CARAFE_HEADINGS:
+        prices = f"{glass_price}/{bottle_price}"
+    else:
+        prices = f"{glass_price}/{carafe_price}/{bottle_price}"
+
+    title = wine_title(cell_escaped(row["Vintage"]), cell_escaped(row["Winery"]), cell_escaped(row["Name"]))
+    grape_variety = format_grape_variety(cell_escaped(row["Grape Variety"]))
+    winemaker = cell_escaped(row["Winemaker and/or Owner"])
+    region = format_region(cell_escaped(row["Region"]))
+    description = cell_escaped(row["Description"])
+
+    entry = TABLE_BACKENDS[backend]["wine_entry"].format(
+        prices=prices,
+        title=title,
+        grape_variety=grape_variety,
+        winemaker=winemaker,
+        region=region,
+        description=description,
+    )
+    return entry, wine_entry_height(f"{title} \\\\ {grape_variety} \\\\ {winemaker}", region, description)
+
+def spec_row_renderer(spec, group=None, heights=None, backend="longtblr"):
+    """
+    Return a renderer of single rows for one table of `spec`, which only shows
+    the values of its unique cells once. The estimated heights of the first
+    rows it renders are appended to `heights`.
+    """
+    template = spec_template(spec, "row", backend)
+    cells = spec["cells"].items()
+    shown = {name: set() for name, cell in cells if cell["unique"]}
+
+    def render(row):
+        values = {name: cell["single"](row, group) for name, cell in cells}
+        for name, seen in shown.items():
+            if values[name] in seen:
+                values[name] = ""
+            else:
+                seen.add(values[name])
+        if heights is not None and len(heights) < spec["keep_rows"]:
+            heights.append(spec_row_height(spec, values))
+        return template.format_map(values)
+    return render
+
+def stream_table(file, start, render_row, end=TABLE_END):
+    """
+    Writer for one table: writes `start`, then `render_row(row)` for every row
+    sent to it, and `end` once it is closed.
+    """
+    file.write(start)
+    try:
+        while True:
+            row = yield
+            file.write(render_row(row))
+    except GeneratorExit:
+        file.write(end)
+
+def stream_wine(file, backend="longtblr", chunk_rows=CHUNK_ROWS):
+    """
+    Writer for wine_tables.tex, laid out by the same `wine_layout` as `generate_wine_menu`.
+    """
+    layout = wine_layout(backend=backend, chunk_rows=chunk_rows)
+    next(layout)
+    try:
+        while True:
+            row = yield
+            file.write(layout.send((row["Heading"], *render_wine_entry(row, backend))))
+    except GeneratorExit:
+        file.write(layout.send(None))
+
+def stream_groups(file, spec, backend="longtblr"):
+    """
+    Writer for a section of `spec` with groups. Rows arrive in sheet order, so
+    the rows of each group are spilled to a temporary file and the tables are
+    joined in group order, once the first rows are known for the \\needspace.
+    """
+    end = spec_template(spec, "extra_rows", backend) + TABLE_BACKENDS[backend]["table_end"]
+    tables = {}
+    group_of = {}
+    try:
+        while True:
+            row = yield
+            if row["Heading"] not in group_of:
+                group_of[row["Heading"]] = (match_routes(row["Heading"], spec["groups"]) or [None])[0]
+            group = group_of[row["Heading"]]
+            if group is not None:
+                if group not in tables:
+                    spill = tempfile.TemporaryFile("w+")
+                    heights = []
+                    writer = stream_table(spill, "", spec_row_renderer(spec, group, heights, backend), end)
+                    next(writer)
+                    tables[group] = (spill, writer, heights)
+                tables[group][1].send(row)
+    except GeneratorExit:
+        for group, _ in spec["groups"]:
+            if group in tables:
+                spill, writer, heights = tables[group]
+                writer.close()
+                file.write(spec_table_start(spec, group, heights, backend))
+                spill.seek(0)
+                shutil.copyfileobj(spill, file)
+                file.write("\n")
+                spill.close()
+
+def stream_section(file, spec, backend="longtblr"):
+    """
+    Writer for the .tex file of the section described by `spec`.
+    """
+    if spec["layout"] == "wine":
+        writer = stream_wine(file, backend, spec["chunk_rows"])
+    elif spec["groups"] is not None:
+        writer = stream_groups(file, spec, backend)
+    else:
+        end = spec_template(spec, "extra_rows", backend) + TABLE_BACKENDS[backend]["table_end"]
+        writer = stream_table(file, spec_template(spec, "start", backend), spec_row_renderer(spec, backend=backend), end)
+    next(writer)
+    if spec["drop_last"]:
+        writer = without_last(writer)
+        next(writer)
+    try:
+        while True:
+            writer.send((yield))
+    except GeneratorExit:
+        writer.close()
+
+def without_last(writer):
+    """
+    Writer passing every row on to `writer` but the last, by holding each row
+    back until the next one arrives.
+    """
+    pending = None
+    try:
+        while True:
+            row = yield
+            if pending is not None:
+                writer.send(pending)
+            pending = row
+    except GeneratorExit:
+        writer.close()
+
+def replace_if_changed(temp_path, path):
+    """
+    Move `temp_path` over `path` unless both hold the same bytes. Returns True if replaced.
+    """
+    if os.path.exists(path) and filecmp.cmp(temp_path, path, shallow=False):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, path)
+    return True
+
+def open_output(path, writer, *args):
+    """
+    Start `writer(file, *args)` on a temporary file beside `path`.
+    Returns the output for `close_output`.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    file = open(temp_path, "w", encoding="utf-8")
+    started = writer(file, *args)
+    next(started)
+    return path, temp_path, file, started
+
+def close_output(output):
+    """
+    Close the writer of an output and move its file into place if it changed.
+    Returns True if it did.
+    """
+    path, temp_path, file, writer = output
+    writer.close()
+    file.close()
+    return replace_if_changed(temp_path, path)
+
+def close_section(output):
+    """
+    `close_output` for the file of a section, which `write_section` splits
+    into its chunk files if it has any. Returns True if any file changed.
+    """
+    path, temp_path, file, writer = output
+    writer.close()
+    file.close()
+    with open(temp_path, encoding="utf-8") as file:
+        chunked = CHUNK_BREAK in file
+    if not chunked:
+        remove_stale_chunks(path)
+        return replace_if_changed(temp_path, path)
+    with open(temp_path, encoding="utf-8") as file:
+        content = file.read()
+    os.remove(temp_path)
+    return write_section(path, content)
+
+def discard_output(output):
+    path, temp_path, file, writer = output
+    writer.close()
+    file.close()
+    os.remove(temp_path)
+
+def stream_menu(file_path, sheet_name, sections=None, out_dir=".", backend="longtblr", targets=(), validate=True):
+    """
+    Build every section (or only those named in `sections`) from a single
+    streamed read of the sheet, without pandas, along with the files of the
+    other `targets` (see MENU_TARGETS). With `validate` every row is checked
+    as it is read (see `validate_row`) and if any has a problem nothing is
+    written and a ValueError lists them.
+    Returns (regenerated, skipped) output files and the routing warnings as
+    (unmatched, ambiguous), like `route_sheet` reports them.
+    """
+    outputs = {}
+    specs = [spec for name, spec in SECTION_SPECS.items() if sections is None or name in sections]
+    for spec in specs:
+        path = os.path.normpath(os.path.join(out_dir, SECTION_FILES[spec["name"]]))
+        outputs[spec["name"]] = open_output(path, stream_section, spec, backend)
+    target_outputs = [open_output(target_path(target, out_dir), MENU_TARGETS[target]["writer"], specs)
+                      for target in targets]
+    items = {}
+    if target_outputs:
+        items = {spec["name"]: stream_items(spec, [output[3] for output in target_outputs]) for spec in specs}
+
+    routes_of = {}
+    rules_of = {}
+    unmatched = {}
+    problems = []
+    for number, row in enumerate(stream_sheet(file_path, sheet_name), FIRST_ROW):
+        heading = row["Heading"]
+        if not isinstance(heading, str):
+            continue
+        if heading not in routes_of:
+            routes_of[heading] = match_routes(heading)
+        routes = routes_of[heading]
+        if not routes:
+            unmatched[heading] = unmatched.get(heading, 0) + 1
+        elif routes[0] in outputs:
+            if validate:
+                if heading not in rules_of:
+                    rules_of[heading] = row_rules(SECTION_SPECS[routes[0]], heading)
+                problems += [(number, heading, message) for message in validate_row(row, rules_of[heading])]
+            outputs[routes[0]][3].send(row)
+            if routes[0] in items:
+                items[routes[0]].send(row)
+
+    for writer in items.values():
+        writer.close()
+    if problems:
+        for output in [*outputs.values(), *target_outputs]:
+            discard_output(output)
+        raise ValueError(validation_report(problems, file_path, sheet_name))
+    regenerated, skipped = [], []
+    for output in outputs.values():
+        (regenerated if close_section(output) else skipped).append(output[0])
+    for output in target_outputs:
+        (regenerated if close_output(output) else skipped).append(output[0])
+
+    ambiguous = {heading: routes for heading, routes in routes_of.items() if len(routes) > 1}
+    return regenerated, skipped, {"unmatched": unmatched, "ambiguous": ambiguous}
+
+
+### Targets
+#
+# The same pass over the sheet can also write the menu for the website that
+# the QR code on the menu links to: a compact JSON catalog and a static HTML
+# page. Each target is a writer like the section writers above: it is started
+# with the specs of the sections being built, sent (section, item) for every
+# row the menu prints, in sheet order, and closed at the end. An item holds the
+# row's heading and the filled-in columns its section prints (the sources of
+# its cells), as plain text and numbers.
+
+# The key of each column in an item
+ITEM_KEYS = {
+    "Heading": "heading", "Glass": "glass", "Carafe": "carafe", "Bottle": "bottle",
+    "Vintage": "vintage", "Winery": "winery", "Name": "name", "Grape Variety": "grape_variety",
+    "Winemaker and/or Owner": "winemaker", "Region": "region", "Description": "description",
+}
+
+# Keys of the prices, shown as glass/carafe/bottle, and of the lines of an item on the HTML menu
+HTML_PRICES = ["glass", "carafe", "bottle"]
+HTML_TITLE_KEYS = ["vintage", "winery", "name"]
+HTML_DETAIL_KEYS = ["grape_variety", "winemaker", "region"]
+
+HTML_TITLE = "The Art Syndicate"
+
+HTML_START = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ font-family: Georgia, serif; max-width: 40em; margin: 0 auto; padding: 1em; }}
+ul {{ padding: 0; }}
+li {{ list-style: none; margin-bottom: 1em; }}
+.price {{ float: right; margin-left: 1em; }}
+.details {{ font-style: italic; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+
+HTML_END = """</body>
+</html>
+"""
+
+def item_value(value):
+    """
+    A cell as it goes into an item: None when empty, whole numbers as ints and
+    text trimmed, with the line breaks typed into the sheet as newlines.
+    """
+    if value is None or value != value:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        if "\\\\" in value:
+            value = "\n".join(line.strip() for line in value.split("\\\\"))
+        return value.strip() or None
+    return value
+
+def row_item(row, spec):
+    """
+    The item of one row of the section of `spec`.
+    """
+    item = {}
+    for column in ["Heading", *spec["columns"]]:
+        value = item_value(row.get(column))
+        if value is not None:
+            item[ITEM_KEYS.get(column, column)] = value
+    return item
+
+def section_items(data, spec):
+    """
+    The item of every row of `data`, the rows of the section of `spec`.
+    """
+    columns = [column for column in ["Heading", *spec["columns"]] if column in data]
+    return [row_item(row, spec) for row in data[columns].astype(object).to_dict("records")]
+
+def item_sender(spec, writers):
+    """
+    Writer sending the item of each row of the section of `spec` to every one of `writers`.
+    """
+    while True:
+        item = row_item((yield), spec)
+        for writer in writers:
+            writer.send((spec["name"], item))
+
+def stream_items(spec, writers):
+    """
+    Started writer sending the item of each streamed row of the section of
+    `spec` to the target `writers`, leaving out the rows `stream_section` does.
+    """
+    writer = item_sender(spec, writers)
+    next(writer)
+    if spec["drop_last"]:
+        writer = without_last(writer)
+        next(writer)
+    return writer
+
+def compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def json_target(file, specs):
+    """
+    Writer of the JSON catalog: the "sections" in menu order, with their name
+    and title, and every "item" with the name of its section, one per line.
+    """
+    sections = [{"name": spec["name"], "title": spec["title"]} for spec in specs]
+    file.write('{"sections":' + compact_json(sections) + ',"items":[')
+    separator = "\n"
+    try:
+        while True:
+            section, item = yield
+            file.write(separator + compact_json({"section": section, **item}))
+            separator = ",\n"
+    except GeneratorExit:
+        file.write("\n]}\n")
+
+def html_text(value):
+    return html.escape(str(value)).replace("\n", "<br>")
+
+def html_price(value):
+    return f"{value:g}" if is_number(value) else str(value)
+
+def html_item(item):
+    """
+    One item of the HTML menu: its prices, its title, a line for each detail and its description.
+    """
+    prices = "/".join(html_price(item[key]) for key in HTML_PRICES if key in item)
+    title = " ".join(str(item[key]) for key in HTML_TITLE_KEYS if key in item)
+    parts = [f'<li><span class="price">{html_text(prices)}</span><strong>{html_text(title)}</strong>']
+    parts += [f'<br><span class="details">{html_text(item[key])}</span>' for key in HTML_DETAIL_KEYS if key in item]
+    if "description" in item:
+        parts.append(f"<p>{html_text(item['description'])}</p>")
+    return "".join(parts) + "</li>\n"
+
+def html_target(file, specs):
+    """
+    Writer of the static HTML menu: each section in menu order, with a list of
+    items under every heading. Items arrive in sheet order, so each section is
+    spilled to a temporary file and the sections are joined at the end.
+    """
+    spills, headings = {}, {}
+    try:
+        while True:
+            section, item = yield
+            if section not in spills:
+                spills[section] = tempfile.TemporaryFile("w+", encoding="utf-8")
+            spill = spills[section]
+            heading = item.get("heading")
+            if section not in headings or heading != headings[section]:
+                if section in headings:
+                    spill.write("</ul>\n")
+                headings[section] = heading
+                spill.write(f"<h3>{html_text(heading)}</h3>\n<ul>\n")
+            spill.write(html_item(item))
+    except GeneratorExit:
+        file.write(HTML_START.format(title=html_text(HTML_TITLE)))
+        for spec in specs:
+            spill = spills.get(spec["name"])
+            if spill is None:
+                continue
+            file.write(f'<section id="{spec["name"]}">\n<h2>{html_text(spec["title"])}</h2>\n')
+            spill.write("</ul>\n")
+            spill.seek(0)
+            shutil.copyfileobj(spill, file)
+            spill.close()
+            file.write("</section>\n")
+        file.write(HTML_END)
+
+# Every target besides the LaTeX tables: the file it writes in the output
+# directory and its writer, started with a file and the specs being built
+MENU_TARGETS = {
+    "json": {"file": "menu.json", "writer": json_target},
+    "html": {"file": "menu.html", "writer": html_target},
+}
+
+def target_path(target, out_dir="."):
+    return os.path.normpath(os.path.join(out_dir, MENU_TARGETS[target]["file"]))
+
+def sheet_items(selected):
+    """
+    (section, item) for every row of the selected sections (see
+    `select_sections`), in sheet order as the streaming mode sends them.
+    """
+    labelled = [
+        (label, (spec["name"], item))
+        for _, data, spec in selected
+        for label, item in zip(data.index, section_items(data, spec))
+    ]
+    return [item for _, item in sorted(labelled, key=lambda pair: pair[0])]
+
+def render_target(selected, target):
+    """
+    The content of `target` for the selected sections, as a string.
+    """
+    file = io.StringIO()
+    writer = MENU_TARGETS[target]["writer"](file, [spec for _, _, spec in selected])
+    next(writer)
+    for item in sheet_items(selected):
+        writer.send(item)
+    writer.close()
+    return file.getvalue()
+
+def write_targets(selected, targets, out_dir="."):
+    """
+    Write the file of each of `targets` from the selected sections (see
+    `select_sections`). The items are made once and sent to one target at a
+    time, so each is profiled on its own.
+    Returns (regenerated, skipped) output files.
+    """
+    specs = [spec for _, _, spec in selected]
+    items = sheet_items(selected)
+    regenerated, skipped = [], []
+    for target in targets:
+        with profiled("targets", target, len(items)):
+            output = open_output(target_path(target, out_dir), MENU_TARGETS[target]["writer"], specs)
+            for item in items:
+                output[3].send(item)
+            (regenerated if close_output(output) else skipped).append(output[0])
+    return regenerated, skipped
+
+
+### Building
+
+def build_menu(workbook="data.xlsx", sheet="The Data", sections=None, out_dir=".", stream=False, force=False, cache_dir=CACHE_DIR, jobs=1,
+               backend="longtblr", validate=True, targets=()):
+    """
+    Generate the .tex tables menu.tex \\inputs from `sheet` in `workbook`.
+
+    Arguments:
+    workbook  - Path to the Excel workbook
+    sheet     - Name of the sheet holding the menu
+    sections  - Names of the sections to build (see SECTION_FILES), or None for all
+    out_dir   - Directory the .tex files are written to
+    stream    - Read the sheet row by row without pandas, for very large sheets
+    force     - Regenerate every section even if its rows did not change
+    cache_dir - Where the parsed workbook is cached, or None to always parse it
+    jobs      - Number of processes rendering sections at the same time, once
+                there are POOL_ROWS rows to render
+    backend   - Table markup to emit, a key of TABLE_BACKENDS
+    validate  - Check the rows first and raise a ValueError listing the
+                problems instead of writing anything (see `validate_sheet`)
+    targets   - Names of the other files to write from the same pass, keys of MENU_TARGETS
+
+    Returns a dict with the "regenerated" and "skipped" output files and the
+    "unmatched" and "ambiguous" headings found while routing.
+    """
+    if sections is not None:
+        unknown = set(sections) - set(SECTION_FILES)
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))} (choose from {', '.join(SECTION_FILES)})")
+    if backend not in TABLE_BACKENDS:
+        raise ValueError(f"Unknown table backend: {backend} (choose from {', '.join(TABLE_BACKENDS)})")
+    unknown = set(targets) - set(MENU_TARGETS)
+    if unknown:
+        raise ValueError(f"Unknown targets: {', '.join(sorted(unknown))} (choose from {', '.join(MENU_TARGETS)})")
+
+    os.makedirs(out_dir, exist_ok=True)
+    if stream:
+        with profiled("stream"):
+            regenerated, skipped, routing = stream_menu(workbook, sheet, sections, out_dir, backend, targets, validate)
+    else:
+        with profiled("load") as span:
+            df = load_sheet(workbook, sheet, cache_dir)
+            span["rows"] = len(df)
+        with profiled("route", rows=len(df)):
+            routing = route_sheet(df)
+        if validate:
+            with profiled("validate", rows=len(df)):
+                problems = validate_sheet(df, select_sections(df, routing, sections))
+            if problems:
+                raise ValueError(validation_report(problems, workbook, sheet))
+        regenerated, skipped = write_sections(df, routing, sections, out_dir, force, jobs, backend)
+        if targets:
+            with profiled("targets"):
+                written = write_targets(select_sections(df, routing, sections), targets, out_dir)
+            regenerated += written[0]
+            skipped += written[1]
+
+    return {
+        "regenerated": regenerated,
+        "skipped": skipped,
+        "unmatched": routing["unmatched"],
+        "ambiguous": routing["ambiguous"],
+    }
+
+
+def read_batch_manifest(path):
+    """
+    Read a batch manifest: a JSON list with one entry per venue, e.g.
+
+        [{"name": "Art Syndicate", "workbook": "data.xlsx", "sheet": "The Data",
+          "out_dir": "venues/art-syndicate", "sections": ["wine", "food"]}]
+
+    "sheet" and "sections" are optional. Relative paths are taken from the
+    manifest's folder. If "template" names a .tex file (e.g. menu.tex) it is
+    copied into out_dir so the venue's menu can be compiled there.
+    """
+    with open(path) as file:
+        venues = json.load(file)
+    if not isinstance(venues, list):
+        raise ValueError(f"{path}: expected a list of venues")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for number, venue in enumerate(venues, 1):
+        missing = [key for key in ("workbook", "out_dir") if key not in venue]
+        if missing:
+            raise ValueError(f"{path}: venue {number} is missing {', '.join(missing)}")
+        venue.setdefault("name", venue["out_dir"])
+        venue.setdefault("sheet", "The Data")
+        venue.setdefault("sections", None)
+        for key in ("workbook", "out_dir", "template"):
+            if venue.get(key):
+                venue[key] = os.path.join(base_dir, venue[key])
+    return venues
+
+def copy_template(template, out_dir):
+    with open(template) as file:
+        write_if_changed(os.path.join(out_dir, os.path.basename(template)), file.read())
+
+def build_batch(manifest_path, jobs=1, force=False, stream=False, cache_dir=CACHE_DIR, backend="longtblr", validate=True,
+                targets=()):
+    """
+    Build the menu of every venue in a batch manifest in this process, so
+    pandas, the templates and every parsed workbook are loaded once.
+    Returns (venue, build_menu result, seconds) for each venue.
+    """
+    results = []
+    for venue in read_batch_manifest(manifest_path):
+        start = time.perf_counter()
+        result = build_menu(
+            venue["workbook"], venue["sheet"],
+            sections=venue["sections"],
+            out_dir=venue["out_dir"],
+            stream=stream,
+            force=force,
+            cache_dir=cache_dir,
+            jobs=jobs,
+            backend=backend,
+            validate=validate,
+            targets=targets,
+        )
+        if venue.get("template"):
+            copy_template(venue["template"], venue["out_dir"])
+        results.append((venue, result, time.perf_counter() - start))
+    return results
+
+
+### Diffing
+#
+# Two versions of the sheet are compared item by item. An item is keyed on its
+# heading, winery, name and vintage; each version is indexed by that key in one
+# pass over its rows, so the comparison takes time linear in the rows. Spirits
+# and soft drinks keep the product in Grape Variety, so several rows of a
+# distillery share a key: those are told apart by their Grape Variety as well.
+
+DIFF_KEY = ["Heading", "Winery", "Name", "Vintage"]
+DIFF_TIEBREAK = "Grape Variety"
+PRICE_COLUMNS = ["Glass", "Carafe", "Bottle"]
+
+def key_value(value):
+    """
+    A cell as it goes into an item key: text without surrounding spaces, whole
+    numbers as ints (so a vintage read as 2022.0 matches 2022), blanks as None.
+    """
+    if value is None or value != value:
+        return None
+    if isinstance(value, str):
+        return value.strip() or None
+    if is_number(value) and value % 1 == 0:
+        return int(value)
+    return value
+
+def item_index(df):
+    """
+    Index the items of a sheet by their key.
+    Returns {key: [(grape variety, prices), ...]} with the rows sharing each key
+    in sheet order, the prices as a dict by price column. Rows without a
+    heading are blank and are left out.
+    """
+    def column(name):
+        return df[name].tolist() if name in df.columns else [None] * len(df)
+
+    keys = zip(*(column(name) for name in DIFF_KEY))
+    prices = zip(*(column(name) for name in PRICE_COLUMNS))
+    index = {}
+    for key, tiebreak, row_prices in zip(keys, column(DIFF_TIEBREAK), prices):
+        key = tuple(map(key_value, key))
+        if key[0] is not None:
+            index.setdefault(key, []).append((key_value(tiebreak), dict(zip(PRICE_COLUMNS, map(key_value, row_prices)))))
+    return index
+
+def printed_prices(heading):
+    """
+    The price columns the menu prints for a row under `heading`: those its
+    section's spec prints, less any its "headings" entry sets to null. All of
+    them for a heading that is on no section.
+    """
+    routes = match_routes(heading)
+    if not routes:
+        return list(PRICE_COLUMNS)
+    spec = SECTION_SPECS[routes[0]]
+    overrides = spec["headings"].get(heading, {})
+    return [column for column in PRICE_COLUMNS
+            if column in spec["columns"] and not (column in overrides and overrides[column] is None)]
+
+def tiebroken(key, rows, duplicates):
+    """
+    The rows sharing `key` by (key, grape variety). A row whose grape variety
+    is taken as well is counted in `duplicates` and left out.
+    """
+    items = {}
+    for tiebreak, prices in rows:
+        item = (*key, tiebreak)
+        if item in items:
+            duplicates[item] = duplicates.get(item, 1) + 1
+        else:
+            items[item] = prices
+    return items
+
+def diff_sheets(old, new):
+    """
+    Compare two versions of the sheet.
+
+    Returns a dict of
+    added      - keys of the items only in `new`, in its order
+    removed    - keys of the items only in `old`, in its order
+    repriced   - (key, {column: (old price, new price)}) for the items whose prices changed
+    duplicates - {"old": ..., "new": ...}: the keys rows of that version share
+                 even with their Grape Variety, with their row counts; only
+                 the first of those rows is compared
+    A key is (heading, winery, name, vintage), with the grape variety added
+    for rows that share it in either version. Only the prices the menu prints
+    for the heading are compared (see `printed_prices`).
+    """
+    old_index, new_index = item_index(old), item_index(new)
+    printed = {}
+    duplicates = {"old": {}, "new": {}}
+    added, removed, repriced = [], [], []
+    for key in itertools.chain(new_index, (key for key in old_index if key not in new_index)):
+        old_rows, new_rows = old_index.get(key, []), new_index.get(key, [])
+        if len(old_rows) <= 1 and len(new_rows) <= 1:
+            old_items = {key: old_rows[0][1]} if old_rows else {}
+            new_items = {key: new_rows[0][1]} if new_rows else {}
+        else:
+            old_items = tiebroken(key, old_rows, duplicates["old"])
+            new_items = tiebroken(key, new_rows, duplicates["new"])
+        for item, prices in new_items.items():
+            before = old_items.get(item)
+            if before is None:
+                added.append(item)
+                continue
+            if item[0] not in printed:
+                printed[item[0]] = printed_prices(item[0])
+            changes = {column: (before[column], prices[column])
+                       for column in printed[item[0]] if before[column] != prices[column]}
+            if changes:
+                repriced.append((item, changes))
+        removed += [item for item in old_items if item not in new_items]
+    return {"added": added, "removed": removed, "repriced": repriced, "duplicates": duplicates}
+
+def item_name(key):
+    heading, winery, name, vintage, *tiebreak = key
+    parts = [str(part) for part in (vintage, winery, name) if part is not None]
+    if tiebreak and tiebreak[0] is not None:
+        parts.append(f"({tiebreak[0]})")
+    return f"{heading}: " + " ".join(parts)
+
+def diff_report(changes):
+    """
+    One line per change, for printing.
+    """
+    lines = [f"+ {item_name(key)}" for key in changes["added"]]
+    lines += [f"- {item_name(key)}" for key in changes["removed"]]
+    for key, prices in changes["repriced"]:
+        moves = ", ".join(f"{column} {cell_price(old, '-')} -> {cell_price(new, '-')}" for column, (old, new) in prices.items())
+        lines.append(f"~ {item_name(key)}: {moves}")
+    for version, duplicates in changes["duplicates"].items():
+        for key, count in duplicates.items():
+            lines.append(f"Warning: {count} rows of the {version} sheet are {item_name(key)}; only the first was compared")
+    return lines
+
+def diff_json(changes):
+    """
+    The change set as plain JSON-ready data, each key as a dict by column.
+    """
+    def item(key):
+        return dict(zip([*DIFF_KEY, DIFF_TIEBREAK], key))
+    return {
+        "added": [item(key) for key in changes["added"]],
+        "removed": [item(key) for key in changes["removed"]],
+        "repriced": [
+            {**item(key), "prices": {column: {"old": old, "new": new} for column, (old, new) in prices.items()}}
+            for key, prices in changes["repriced"]
+        ],
+        "duplicates": {
+            version: [{**item(key), "rows": count} for key, count in duplicates.items()]
+            for version, duplicates in changes["duplicates"].items()
+        },
+    }
+
+
+### Images
+#
+# menu.tex places the logo and the wine map at the full text width, but the
+# PNGs are several times larger than print needs, and pdflatex reads and embeds
+# them whole on every compile. Before compiling, each image a document
+# includes through \menuimage is scaled down to IMAGE_DPI at its placed width
+# and recompressed into the cache, named after a hash of the original, and
+# images.tex tells \menuimage to use the copies.
+#
+# menu.tex itself still includes the originals: no menu with the copies has
+# been proofed yet, so only the copy bench.py --images compiles is switched
+# over to them (see `use_menu_images`).
+
+IMAGE_DPI = 300
+IMAGES_DIR = "images"
+IMAGES_TEX = "images.tex"
+
+MENU_IMAGE_PREAMBLE = r"""
+% \menuimage{name}: the print-resolution copy of an image that optimize_images
+% in menu.py lists in images.tex, or the image itself when there is none
+\newcommand*\menuimage[1]{\ifcsname menuimage@#1\endcsname\csname menuimage@#1\endcsname\else#1\fi}
+\InputIfFileExists{images.tex}{}{}
+"""
+
+# The images a document includes: the options and the name, which may be
+# wrapped in \menuimage{}. Commented lines have to be skipped beforehand.
+INCLUDED_IMAGE = re.compile(r"\\includegraphics\s*(?:\[([^\]]*)\])?\s*\{(?:\\menuimage\{)?([^{}]+)\}")
+
+# An image name that is not wrapped in \menuimage{} yet, after what comes before it
+IMAGE_NAME = re.compile(r"(\\includegraphics\s*(?:\[[^\]]*\])?\s*\{)([^{}]+)\}")
+
+IMAGE_WIDTH = re.compile(r"width\s*=\s*([\d.]*)\s*(?:\\(textwidth|linewidth)|(pt|mm|cm|in)\b)")
+
+# Points per unit of the lengths an image width can be given in
+POINTS = {"pt": 1.0, "mm": 72.27 / 25.4, "cm": 72.27 / 2.54, "in": 72.27}
+
+def uncommented(latex):
+    return "\n".join(line for line in latex.splitlines() if not line.lstrip().startswith("%"))
+
+def placed_width(options):
+    """
+    The width in pt an image is placed at, from its \\includegraphics options.
+    Images without a width are taken to fill the line.
+    """
+    match = IMAGE_WIDTH.search(options or "")
+    if match is None:
+        return LINE_WIDTH
+    factor, relative, unit = match.groups()
+    if relative:
+        return float(factor or 1) * LINE_WIDTH
+    return float(factor) * POINTS[unit]
+
+def included_images(tex_path):
+    """
+    The images the document at `tex_path` includes, with the widest width in
+    pt each is placed at.
+    """
+    with open(tex_path, encoding="utf-8") as file:
+        latex = uncommented(file.read())
+    widths = {}
+    for options, name in INCLUDED_IMAGE.findall(latex):
+        widths[name] = max(widths.get(name, 0.0), placed_width(options))
+    return widths
+
+def use_menu_images(tex_path):
+    """
+    Switch the document at `tex_path` over to the copies `optimize_images`
+    makes: define \\menuimage in its preamble and wrap the name of every image
+    it includes in it.
+    """
+    add_to_preamble(tex_path, MENU_IMAGE_PREAMBLE)
+    with open(tex_path, encoding="utf-8") as file:
+        latex = file.read()
+    write_if_changed(tex_path, IMAGE_NAME.sub(r"\1\\menuimage{\2}}", latex))
+
+def optimize_image(source, target, width):
+    """
+    Write `source` to `target` scaled down to `width` pixels, if it is wider,
+    and recompressed in the format its extension names, whatever its case.
+    """
+    from PIL import Image
+
+    image_format = Image.registered_extensions()[os.path.splitext(target)[1].lower()]
+    with Image.open(source) as image:
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        image.save(temp_path, format=image_format, optimize=True, dpi=(IMAGE_DPI, IMAGE_DPI))
+    os.replace(temp_path, target)
+
+def optimize_images(tex_path="menu.tex", cache_dir=CACHE_DIR, jobs=1):
+    """
+    Make print-resolution copies of the images the document at `tex_path`
+    includes, in a pool of `jobs` threads, and write images.tex next to it so
+    \\menuimage uses them. A copy is only made again when its original or its
+    placed width changes. Images that would not get smaller are left as they are.
+    Returns a dict with every image ("source", "optimized" or None, "before"
+    and "after" in bytes and whether it was "cached") and the seconds taken,
+    or None without Pillow, in which case the originals are used.
+    """
+    if importlib.util.find_spec("PIL") is None:
+        return None
+    from concurrent.futures import ThreadPoolExecutor
+
+    start = time.perf_counter()
+    directory = os.path.dirname(tex_path) or "."
+    # Relative to the document, with the slashes TeX expects
+    image_dir = f"{cache_dir or CACHE_DIR}/{IMAGES_DIR}"
+    os.makedirs(os.path.join(directory, image_dir), exist_ok=True)
+
+    images, pending = [], []
+    for name, width in included_images(tex_path).items():
+        source = os.path.join(directory, name)
+        digest = hash_file(source)
+        if digest is None:
+            continue
+        pixels = math.ceil(width / 72.27 * IMAGE_DPI)
+        stem, extension = os.path.splitext(os.path.basename(name))
+        optimized = f"{image_dir}/{stem}-{digest[:16]}-{pixels}{extension}"
+        target = os.path.join(directory, optimized)
+        image = {"source": name, "optimized": optimized, "before": os.path.getsize(source), "cached": os.path.exists(target)}
+        if not image["cached"]:
+            # Copies of an earlier version of the image are never used again
+            copy = re.compile(re.escape(stem) + r"-[0-9a-f]{16}-\d+" + re.escape(extension))
+            for entry in os.listdir(os.path.join(directory, image_dir)):
+                if copy.fullmatch(entry):
+                    os.remove(os.path.join(directory, image_dir, entry))
+            pending.append((source, target, pixels))
+        images.append(image)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(pending) or 1))) as pool:
+        list(pool.map(lambda task: optimize_image(*task), pending))
+
+    lines = []
+    for image in images:
+        image["after"] = os.path.getsize(os.path.join(directory, image["optimized"]))
+        if image["after"] >= image["before"]:
+            image["optimized"], image["after"] = None, image["before"]
+            continue
+        lines.append(f"\\expandafter\\def\\csname menuimage@{image['source']}\\endcsname{{{image['optimized']}}}\n")
+    write_if_changed(os.path.join(directory, IMAGES_TEX), "% Written by menu.py, see optimize_images\n" + "".join(lines))
+    return {"images": images, "seconds": time.perf_counter() - start}
+
+
+### Compiling
+
+LATEX = "pdflatex"
+
+# tabularray and hyperref settle within a couple of passes; stop here regardless
+MAX_PASSES = 4
+
+# Log messages asking for another pass
+LATEX_RERUN = re.compile(r"Rerun to get|Rerun LaTeX|Table widths have changed|Label\(s\) may have changed")
+
+# The statistics pdflatex ends its log with ("Here is how much of TeX's memory
+# you used"): main memory in words, the string pool in characters and the
+# save stack, each as used out of the limit of the TeX installation
+TEX_MEMORY = {
+    "main": re.compile(r"^ *(\d+) words of memory out of (\d+)", re.MULTILINE),
+    "pool": re.compile(r"^ *(\d+) string characters out of (\d+)", re.MULTILINE),
+    "save": re.compile(r"(\d+)s stack positions out of \S*?(\d+)s", re.MULTILINE),
+}
+
+def logged_memory(log):
+    """
+    The memory pdflatex reports using in `log`, as {name: (used, limit)} for
+    each of TEX_MEMORY it lists, or None if the log has no statistics.
+    """
+    if not log:
+        return None
+    memory = {}
+    for name, pattern in TEX_MEMORY.items():
+        match = pattern.search(log)
+        if match:
+            memory[name] = (int(match.group(1)), int(match.group(2)))
+    return memory or None
+
+def peak_memory(memories):
+    """
+    The most of each kind of memory any of `memories` used, or None if none was logged.
+    """
+    peak = {}
+    for memory in memories:
+        for name, (used, limit) in (memory or {}).items():
+            if name not in peak or used > peak[name][0]:
+                peak[name] = (used, limit)
+    return peak or None
+
+def add_to_preamble(tex_path, latex):
+    """
+    Add `latex` to the end of the preamble of the document at `tex_path`,
+    unless it is empty or there already.
+    """
+    with open(tex_path, encoding="utf-8") as file:
+        preamble, body = file.read().split("\\begin{document}", 1)
+    if latex and latex not in preamble:
+        write_if_changed(tex_path, f"{preamble.rstrip()}\n{latex}\n\\begin{{document}}{body}")
+
+def split_preamble(tex_path):
+    """
+    The preamble of the document at `tex_path`: everything before \\begin{document}.
+    """
+    with open(tex_path, encoding="utf-8") as file:
+        return file.read().split("\\begin{document}", 1)[0]
+
+# Files the preamble reads, which end up in the format as much as the preamble itself
+PREAMBLE_INPUTS = re.compile(r"\\(?:input|InputIfFileExists)\s*\{([^}]+)\}")
+
+def preamble_hash(preamble, directory):
+    """
+    Hash of `preamble` and of the files it inputs from `directory`.
+    """
+    digest = hashlib.sha256(preamble.encode())
+    for name in PREAMBLE_INPUTS.findall(uncommented(preamble)):
+        digest.update(f"\0{name}\0{hash_file(os.path.join(directory, name))}".encode())
+    return digest.hexdigest()
+
+def run_latex(arguments, cwd):
+    """
+    Run pdflatex without stopping for errors. Returns its exit status; the
+    details are in the log it writes.
+    """
+    command = [LATEX, "-interaction=nonstopmode", "-file-line-error", *arguments]
+    return subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+# Left next to a format that logged more errors than reading the preamble in full
+FORMAT_FAILED = ".failed"
+
+def preamble_format(tex_path, cache_dir=CACHE_DIR):
+    """
+    Dump the preamble of `tex_path` into a format file with mylatexformat, so
+    later compiles load it in one go instead of reading every package again.
+    The format is named after a hash of the preamble and the files it inputs,
+    and kept in `cache_dir` next to the document until they change.
+    Returns (format, built): the format to pass to -fmt, relative to the
+    document, or None if it could not be dumped or `compile_pdf` found the
+    document compiles worse with it, and whether it was built now.
+    """
+    directory = os.path.dirname(tex_path) or "."
+    stem = os.path.splitext(os.path.basename(tex_path))[0]
+    digest = preamble_hash(split_preamble(tex_path), directory)[:16]
+    name = f"{stem}-preamble-{digest}"
+    fmt = os.path.join(cache_dir, name)
+    if os.path.exists(os.path.join(directory, fmt + FORMAT_FAILED)):
+        return None, False
+    if os.path.exists(os.path.join(directory, fmt + ".fmt")):
+        return fmt, False
+
+    os.makedirs(os.path.join(directory, cache_dir), exist_ok=True)
+    # Formats of an earlier preamble are never loaded again
+    for entry in os.listdir(os.path.join(directory, cache_dir)):
+        if entry.startswith(f"{stem}-preamble-"):
+            os.remove(os.path.join(directory, cache_dir, entry))
+    run_latex(["-ini", f"-jobname={name}", f"-output-directory={cache_dir}",
+               "&" + LATEX, "mylatexformat.ltx", os.path.basename(tex_path)], directory)
+    if not os.path.exists(os.path.join(directory, fmt + ".fmt")):
+        return None, True
+    return fmt, True
+
+def run_passes(arguments, cwd, aux_path, log_path):
+    """
+    Run pdflatex with `arguments` until the .aux file settles and the log
+    stops asking for another pass, at most MAX_PASSES times.
+    Returns the number of passes and the last log.
+    """
+    for passes in range(1, MAX_PASSES + 1):
+        before = hash_file(aux_path)
+        run_latex(arguments, cwd)
+        with open(log_path, encoding="latin-1") as file:
+            log = file.read()
+        if hash_file(aux_path) == before and not LATEX_RERUN.search(log):
+            break
+    return passes, log
+
+def compile_pdf(tex_path="menu.tex", cache_dir=CACHE_DIR):
+    """
+    Compile `tex_path` with pdflatex, rerunning it until the .aux file settles
+    and the log stops asking for another pass, at most MAX_PASSES times. The
+    preamble is loaded from a cached format (see `preamble_format`) unless
+    `cache_dir` is None. A new format is only kept if the document compiles
+    with no more errors with it than without it.
+    Returns a dict with the pdf, the number of passes, the wall time of the
+    compile, how the format was used (None, "built", "reused" or "failed"), the time
+    spent dumping it, the number of errors logged, the page count and the
+    memory TeX used (see `logged_memory`).
+    """
+    directory = os.path.dirname(tex_path) or "."
+    stem = os.path.splitext(os.path.basename(tex_path))[0]
+    aux_path = os.path.join(directory, stem + ".aux")
+    log_path = os.path.join(directory, stem + ".log")
+    if not os.path.exists(tex_path):
+        raise FileNotFoundError(f"{tex_path} does not exist")
+
+    fmt, built, format_seconds = None, False, 0.0
+    if cache_dir is not None:
+        start = time.perf_counter()
+        fmt, built = preamble_format(tex_path, cache_dir)
+        format_seconds = time.perf_counter() - start
+
+    arguments = [f"-fmt={fmt}"] if fmt else []
+    start = time.perf_counter()
+    passes, log = run_passes([*arguments, os.path.basename(tex_path)], directory, aux_path, log_path)
+    usage = None if fmt is None else "built" if built else "reused"
+    if built and count_errors(log):
+        # mylatexformat cannot dump every preamble faithfully, so the first
+        # compile with a format that logs errors is done again without it,
+        # and the format is left unused if that logs fewer
+        errors = count_errors(log)
+        plain_passes, log = run_passes([os.path.basename(tex_path)], directory, aux_path, log_path)
+        passes += plain_passes
+        if count_errors(log) < errors:
+            open(os.path.join(directory, fmt + FORMAT_FAILED), "w").close()
+            usage = "failed"
+
+    return {
+        "pdf": os.path.join(directory, stem + ".pdf"),
+        "passes": passes,
+        "seconds": time.perf_counter() - start,
+        "format": usage,
+        "format_seconds": format_seconds,
+        "errors": count_errors(log),
+        "pages": logged_pages(log_path),
+        "memory": logged_memory(log),
+    }
+
+def count_errors(log):
+    return log.count("\n! ") + log.startswith("! ")
+
+def hash_file(path):
+    """
+    SHA-256 of the bytes of the file at `path`, or None if it does not exist.
+    """
+    try:
+        with open(path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+### Fragments
+
+FRAGMENT_DIR = "fragments"
+
+# A page break at the top level of the document body, where one fragment ends
+FRAGMENT_BREAK = re.compile(r"^\\newpage[ \t]*$", re.MULTILINE)
+
+# Files a fragment reads, whose contents belong in its cache key
+FRAGMENT_FILES = re.compile(r"\\(?:input|includegraphics)\s*(?:\[[^\]]*\])?\s*\{(?:\\menuimage\{)?([^{}]+)\}")
+
+def split_fragments(tex_path):
+    """
+    Split the body of the document at `tex_path` at every top-level \\newpage,
+    the same places the menu starts a new page, into fragments that can be
+    typeset on their own.
+    Returns the preamble and the list of fragment bodies.
+    """
+    with open(tex_path, encoding="utf-8") as file:
+        preamble, body = file.read().split("\\begin{document}", 1)
+    body = body.split("\\end{document}", 1)[0]
+    return preamble, FRAGMENT_BREAK.split(body)
+
+def fragment_key(preamble, fragment, first_page, directory):
+    """
+    Hash of everything that decides how `fragment` is typeset: the preamble
+    and the files it inputs, its source, the files it inputs (with the chunk
+    files of a section) or includes and the number of its first page, which
+    also decides which side of a twoside spread it starts on.
+    """
+    digest = hashlib.sha256(f"{first_page}\0{preamble_hash(preamble, directory)}\0{fragment}".encode())
+    for name in FRAGMENT_FILES.findall(uncommented(fragment)):
+        path = os.path.join(directory, name)
+        digest.update(f"\0{name}\0{section_hash(path) if name.endswith('.tex') else hash_file(path)}".encode())
+    return digest.hexdigest()[:16]
+
+def compile_fragment(preamble, fragment, first_page, name, fmt, directory, fragment_dir):
+    """
+    Typeset one fragment as a document of its own, numbered from `first_page`,
+    into `fragment_dir` under `name`. Runs in `directory` so \\input files
+    and images resolve as they do for the whole menu.
+    Returns the number of passes and the log.
+    """
+    source = os.path.join(fragment_dir, name + ".tex")
+    with open(os.path.join(directory, source), "w", encoding="utf-8") as file:
+        file.write(f"{preamble}\\begin{{document}}\n\\setcounter{{page}}{{{first_page}}}\n{fragment}\n\\end{{document}}\n")
+    arguments = [f"-fmt={fmt}"] if fmt else []
+    return run_passes([*arguments, f"-output-directory={fragment_dir}", f"-jobname={name}", source], directory,
+                      os.path.join(directory, fragment_dir, name + ".aux"), os.path.join(directory, fragment_dir, name + ".log"))
+
+def merge_fragments(pdfs, stem, directory, fragment_dir):
+    """
+    Join the fragment PDFs page for page into `stem`.pdf in `directory` with
+    pdfpages, which copies the pages without typesetting anything again.
+    Returns the log of the merge.
+    """
+    name = f"{stem}-merged"
+    pages = "".join(f"\\includepdf[pages=-]{{{pdf}}}\n" for pdf in pdfs)
+    with open(os.path.join(directory, fragment_dir, name + ".tex"), "w", encoding="utf-8") as file:
+        file.write(f"\\documentclass[a5paper]{{article}}\n\\usepackage{{pdfpages}}\n\\begin{{document}}\n{pages}\\end{{document}}\n")
+    run_latex([f"-output-directory={fragment_dir}", f"-jobname={name}", os.path.join(fragment_dir, name + ".tex")], directory)
+    log = read_log(os.path.join(directory, fragment_dir, name + ".log")) or ""
+    merged = os.path.join(directory, fragment_dir, name + ".pdf")
+    if os.path.exists(merged):
+        os.replace(merged, os.path.join(directory, stem + ".pdf"))
+    return log
+
+def fragment_compiled(stem):
+    """
+    Whether the fragment at `stem` has a PDF newer than its .tex.
+    """
+    try:
+        return os.path.getmtime(stem + ".pdf") >= os.path.getmtime(stem + ".tex")
+    except OSError:
+        return False
+
+def read_log(log_path):
+    """
+    The text of the log at `log_path`, or None if there is none.
+    """
+    try:
+        with open(log_path, encoding="latin-1") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+def compile_fragments(tex_path="menu.tex", cache_dir=CACHE_DIR):
+    """
+    Compile `tex_path` one fragment at a time (see `split_fragments`) and merge
+    the fragment PDFs into the menu. Each fragment PDF is cached in `cache_dir`
+    under a hash of its inputs and first page (see `fragment_key`), so editing
+    one section costs one fragment compile and the merge; later fragments are
+    only compiled again when the edit changes how many pages come before them.
+    The preamble format of `compile_pdf` is shared by every fragment. Links
+    between fragments are lost in the merge, which the printed menu has none of.
+    Returns the same dict as `compile_pdf`, with the number of fragments and
+    how many of them came from the cache; the memory is the most any fragment used.
+    """
+    directory = os.path.dirname(tex_path) or "."
+    stem = os.path.splitext(os.path.basename(tex_path))[0]
+    if not os.path.exists(tex_path):
+        raise FileNotFoundError(f"{tex_path} does not exist")
+    fragment_dir = os.path.join(cache_dir or CACHE_DIR, FRAGMENT_DIR)
+    os.makedirs(os.path.join(directory, fragment_dir), exist_ok=True)
+
+    fmt, built, format_seconds = None, False, 0.0
+    if cache_dir is not None:
+        start = time.perf_counter()
+        fmt, built = preamble_format(tex_path, cache_dir)
+        format_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preamble, fragments = split_fragments(tex_path)
+    pdfs, passes, cached, errors, first_page = [], 0, 0, 0, 1
+    memories = []
+    for index, fragment in enumerate(fragments):
+        prefix = f"{stem}-{index}-"
+        name = prefix + fragment_key(preamble, fragment, first_page, directory)
+        log_path = os.path.join(directory, fragment_dir, name + ".log")
+        log = read_log(log_path)
+        if log is not None and not count_errors(log) and fragment_compiled(os.path.join(directory, fragment_dir, name)):
+            cached += 1
+        else:
+            # Fragments compiled for older contents are never merged again
+            for entry in os.listdir(os.path.join(directory, fragment_dir)):
+                if entry.startswith(prefix):
+                    os.remove(os.path.join(directory, fragment_dir, entry))
+            fragment_passes, log = compile_fragment(preamble, fragment, first_page, name, fmt, directory, fragment_dir)
+            passes += fragment_passes
+            errors += count_errors(log)
+        memories.append(logged_memory(log))
+        pages = logged_pages(log_path) or 0
+        if pages:
+            pdfs.append(os.path.join(fragment_dir, name + ".pdf"))
+        first_page += pages
+
+    errors += count_errors(merge_fragments(pdfs, stem, directory, fragment_dir))
+    return {
+        "pdf": os.path.join(directory, stem + ".pdf"),
+        "passes": passes,
+        "seconds": time.perf_counter() - start,
+        "format": None if fmt is None else "built" if built else "reused",
+        "format_seconds": format_seconds,
+        "errors": errors,
+        "pages": first_page - 1,
+        "memory": peak_memory(memories),
+        "fragments": len(fragments),
+        "cached": cached,
+    }
+
+
+### Watching
+
+# How often the watched files are checked, and how long they have to stay
+# untouched before a rebuild starts, so a burst of saves builds only once
+WATCH_INTERVAL = 0.5
+WATCH_SETTLE = 1.0
+
+# What a half-written workbook can raise while it is read: a zip archive cut
+# off before its directory or in the middle of a member
+PARTIAL_SAVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError)
+
+def file_state(path):
+    """
+    The modification time and size of `path`, or None while it does not exist,
+    as happens when an editor saves by replacing the file.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def wait_for_change(states, interval=WATCH_INTERVAL, settle=WATCH_SETTLE):
+    """
+    Block until a file in `states` ({path: file_state}) changes and then stays
+    the same for `settle` seconds. Returns the changed paths that exist and the
+    new states. A file that is missing once things settle (deleted, or not
+    there at all) is left out of the changed paths and starts a build when it
+    comes back.
+    """
+    while True:
+        time.sleep(interval)
+        current = {path: file_state(path) for path in states}
+        if current == states:
+            continue
+        while True:
+            time.sleep(settle)
+            latest = {path: file_state(path) for path in states}
+            if latest == current:
+                break
+            current = latest
+        changed = [path for path in states if current[path] != states[path] and current[path] is not None]
+        states = current
+        if changed:
+            return changed, states
+
+def watch(workbook="data.xlsx", sheet="The Data", sections=None, out_dir=".", cache_dir=CACHE_DIR, fragments=False, **options):
+    """
+    Build the menu, then rebuild it whenever the workbook or menu.tex in
+    `out_dir` is saved, until interrupted. Only those two files are looked at, so the
+    lock files (~$data.xlsx, .~lock.data.xlsx#) and temporary copies
+    spreadsheet editors write beside them never start a build, and a save that
+    is still being written is retried after the next one. A problem in the
+    sheet, at the first build or after a save, is reported and waits for the
+    next save too; any other error stops watching. Sections whose rows did not
+    change are skipped, menu.pdf is recompiled when anything did, and the time
+    from the save to the finished PDF is printed. The parsed workbook, pandas
+    and the preamble format stay loaded between rebuilds. Each workbook save
+    also prints what changed on the menu since the last one (see
+    `diff_sheets`), unless the sheet is streamed. With `fragments`, only the
+    pages of the sections that changed are typeset again (see
+    `compile_fragments`).
+    """
+    compile_menu = compile_fragments if fragments else compile_pdf
+    tex_path = os.path.join(out_dir, "menu.tex")
+    states = {path: file_state(path) for path in (workbook, tex_path)}
+    diffing = not options.get("stream")
+    sheet_before = None
+    changed, saved = [workbook], time.time()
+    print(f"Watching {workbook} and {tex_path}, press Ctrl+C to stop")
+    try:
+        while True:
+            try:
+                rebuilt = tex_path in changed
+                if workbook in changed:
+                    result = build_menu(workbook, sheet, sections, out_dir, cache_dir=cache_dir, **options)
+                    print_result(result)
+                    if diffing:
+                        sheet_after = load_sheet(workbook, sheet, cache_dir)
+                        if sheet_before is not None:
+                            for line in diff_report(diff_sheets(sheet_before, sheet_after)):
+                                print(line)
+                        sheet_before = sheet_after
+                    rebuilt = rebuilt or bool(result["regenerated"])
+                if not rebuilt:
+                    print("Nothing changed")
+                elif os.path.exists(tex_path):
+                    print_compile(compile_menu(tex_path, cache_dir))
+                    print(f"Save to PDF in {time.time() - saved:.2f}s")
+            except PARTIAL_SAVE_ERRORS as error:
+                print(f"Could not rebuild ({error}), waiting for the next save")
+            except ValueError as error:
+                # A problem in the sheet, which the next save may fix
+                print(f"Error: {error}")
+            changed, states = wait_for_change(states)
+            saved = max(states[path][0] for path in changed) / 1e9
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+### Serving
+#
+# menu.py --serve keeps one process running for the POS and the tablets in the
+# venue: an asyncio HTTP server, on localhost by default, that answers with a
+# section's table or items, the JSON and HTML menus, or menu.pdf compiled with
+# the tables. Everything comes from the workbook given on the command line and
+# is cached under the hash of its contents, so a save is picked up by the next
+# request. The checked and routed sheet, every rendered section and target and
+# the last few PDFs are kept in LRU caches of bounded size. PDFs are compiled
+# by a small pool of LaTeX workers: a request for a PDF that is already being
+# built waits for that build, and once LATEX_QUEUE builds are waiting the
+# server answers 503 instead of queueing more.
+#
+# GET /sections/<name>.tex[?backend=...]  the section's table
+# GET /sections/<name>.json               the section's items (see Targets)
+# GET /menu.json, /menu.html              the targets
+# GET /menu.pdf[?backend=...]             the compiled menu
+# GET /metrics                            p50/p99 latency per endpoint and cache hit rates
+
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+
+# Entries each cache keeps before the least recently used one is dropped
+SERVED_SHEETS = 4
+SERVED_SECTIONS = 256
+SERVED_TARGETS = 16
+SERVED_PDFS = 4
+
+# PDFs compiled at the same time, and builds that may wait for a worker
+LATEX_WORKERS = 2
+LATEX_QUEUE = 8
+
+# Latencies kept per endpoint for its percentiles
+LATENCY_WINDOW = 1000
+
+# Seconds a client has to send each line of its request
+REQUEST_TIMEOUT = 10
+
+# Where the PDFs are built, one folder per table backend, inside the cache
+SERVE_DIR = "serve"
+
+SECTION_PATH = re.compile(r"/sections/([\w-]+)\.(tex|json)")
+
+# Endpoints besides the sections, with the content type of their answer
+SERVED_FILES = {
+    "/menu.json": "application/json",
+    "/menu.html": "text/html; charset=utf-8",
+    "/menu.pdf": "application/pdf",
+    "/metrics": "application/json",
+}
+
+HTTP_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+    422: "Unprocessable Content", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+# Only one PDF is built in each folder at a time
+build_locks = {}
+
+# Held while the sheet is looked up, so requests arriving together before it
+# is cached wait for one thread to parse it instead of each parsing it; made
+# by `serve_state`
+sheet_lock = None
+
+@functools.lru_cache(maxsize=SERVED_SHEETS)
+def served_sheet(workbook, sheet, key, cache_dir):
+    """
+    The rows and spec of every section of the sheet whose workbook hashes to
+    `key`, checked like a build does. Raises a ValueError listing the problems.
+    """
+    df = load_sheet(workbook, sheet, cache_dir)
+    selected = select_sections(df, route_sheet(df))
+    problems = validate_sheet(df, selected)
+    if problems:
+        raise ValueError(validation_report(problems, workbook, sheet))
+    return {name: (data, spec) for name, data, spec in selected}
+
+def served_sections(workbook, sheet, key, cache_dir):
+    with sheet_lock:
+        return served_sheet(workbook, sheet, key, cache_dir)
+
+@functools.lru_cache(maxsize=SERVED_SECTIONS)
+def served_section(workbook, sheet, key, cache_dir, name, backend):
+    data, _ = served_sections(workbook, sheet, key, cache_dir)[name]
+    return render_section(name, data, backend)
+
+@functools.lru_cache(maxsize=SERVED_SECTIONS)
+def served_items(workbook, sheet, key, cache_dir, name):
+    data, spec = served_sections(workbook, sheet, key, cache_dir)[name]
+    return compact_json({"name": name, "title": spec["title"], "items": section_items(data, spec)})
+
+@functools.lru_cache(maxsize=SERVED_TARGETS)
+def served_target(workbook, sheet, key, cache_dir, target):
+    sections = served_sections(workbook, sheet, key, cache_dir)
+    return render_target([(name, data, spec) for name, (data, spec) in sections.items()], target)
+
+# The cached renders, by the name /metrics reports them under
+SERVED_CACHES = {"sheets": served_sheet, "sections": served_section, "items": served_items, "targets": served_target}
+
+def copy_if_changed(source, target):
+    if hash_file(source) != hash_file(target):
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        shutil.copy2(source, target)
+
+def build_pdf(workbook, sheet, key, cache_dir, backend, template):
+    """
+    Compile a copy of `template` (menu.tex) and the images it includes with
+    the tables of `backend` and the preamble they need, in a folder of its
+    own, and return the PDF.
+    """
+    import threading
+
+    directory = os.path.join(cache_dir or CACHE_DIR, SERVE_DIR, backend)
+    tex_path = os.path.join(directory, os.path.basename(template))
+    with build_locks.setdefault(directory, threading.Lock()):
+        os.makedirs(directory, exist_ok=True)
+        copy_if_changed(template, tex_path)
+        add_to_preamble(tex_path, TABLE_BACKENDS[backend]["preamble"])
+        for name in included_images(tex_path):
+            copy_if_changed(os.path.join(os.path.dirname(template) or ".", name), os.path.join(directory, name))
+        for name in served_sections(workbook, sheet, key, cache_dir):
+            write_section(os.path.join(directory, SECTION_FILES[name]),
+                          served_section(workbook, sheet, key, cache_dir, name, backend))
+        compiled = compile_pdf(tex_path)
+        if not os.path.exists(compiled["pdf"]):
+            raise RuntimeError(f"{LATEX} did not write {compiled['pdf']}, see its .log file")
+        with open(compiled["pdf"], "rb") as file:
+            return file.read()
+
+def serve_state(workbook, sheet, template, cache_dir, backend, latex_workers):
+    """
+    What the server keeps between requests.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    global sheet_lock
+    if sheet_lock is None:
+        sheet_lock = threading.Lock()
+    return {
+        "workbook": workbook,
+        "sheet": sheet,
+        "template": template,
+        "cache_dir": cache_dir,
+        "backend": backend,
+        "pool": ThreadPoolExecutor(max_workers=latex_workers),
+        "workers": latex_workers,
+        # Builds running or waiting for a worker, by what they build, and how
+        # many jobs the pool has running or waiting
+        "builds": {},
+        "queued": 0,
+        # The last SERVED_PDFS PDFs, least recently used first
+        "pdfs": {},
+        "pdf_hits": 0,
+        "pdf_misses": 0,
+        "latency": {},
+        # The hash of the workbook and the size and modification time it was taken at
+        "workbook_hash": (None, None),
+    }
+
+async def served_key(state):
+    """
+    The hash of the workbook, taken again only when its size or modification time changes.
+    """
+    import asyncio
+
+    stat = os.stat(state["workbook"])
+    mark = (stat.st_size, stat.st_mtime_ns)
+    if state["workbook_hash"][0] != mark:
+        state["workbook_hash"] = (mark, await asyncio.to_thread(workbook_hash, state["workbook"], state["sheet"]))
+    return state["workbook_hash"][1]
+
+def store_pdf(state, build, future):
+    state["queued"] -= 1
+    state["builds"].pop(build, None)
+    if future.cancelled() or future.exception() is not None:
+        return
+    state["pdfs"][build] = future.result()
+    if len(state["pdfs"]) > SERVED_PDFS:
+        del state["pdfs"][next(iter(state["pdfs"]))]
+
+async def serve_pdf(state, build):
+    """
+    The PDF of `build`, from the cache, from the build of it that is already
+    under way, or from a new build in the LaTeX pool. Returns None when the
+    queue of builds is full.
+    """
+    import asyncio
+
+    if build in state["pdfs"]:
+        state["pdf_hits"] += 1
+        state["pdfs"][build] = state["pdfs"].pop(build)
+        return state["pdfs"][build]
+    state["pdf_misses"] += 1
+    if build not in state["builds"]:
+        if state["queued"] >= state["workers"] + LATEX_QUEUE:
+            return None
+        future = asyncio.get_running_loop().run_in_executor(state["pool"], build_pdf, *build, state["template"])
+        state["queued"] += 1
+        future.add_done_callback(functools.partial(store_pdf, state, build))
+        state["builds"][build] = future
+    return await asyncio.shield(state["builds"][build])
+
+def percentile(values, fraction):
+    """
+    The nearest-rank percentile of `values`, a sorted list.
+    """
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+def hit_rate(hits, misses):
+    return None if hits + misses == 0 else hits / (hits + misses)
+
+def serve_metrics(state):
+    """
+    The p50/p99 latency in ms of each endpoint over its last LATENCY_WINDOW
+    requests, the hits and size of each cache, and the PDF builds under way.
+    """
+    latency = {}
+    for endpoint, seconds in state["latency"].items():
+        ordered = sorted(seconds)
+        latency[endpoint] = {
+            "requests": len(ordered),
+            "p50_ms": percentile(ordered, 0.5) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+        }
+    caches = {}
+    for name, function in SERVED_CACHES.items():
+        info = function.cache_info()
+        caches[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "limit": info.maxsize,
+                        "hit_rate": hit_rate(info.hits, info.misses)}
+    caches["pdfs"] = {"hits": state["pdf_hits"], "misses": state["pdf_misses"], "size": len(state["pdfs"]),
+                      "limit": SERVED_PDFS, "hit_rate": hit_rate(state["pdf_hits"], state["pdf_misses"])}
+    return {"latency": latency, "caches": caches, "builds": {"running or waiting": state["queued"], "workers": state["workers"]}}
+
+def endpoint_name(path):
+    match = SECTION_PATH.fullmatch(path)
+    if match:
+        return f"/sections/*.{match.group(2)}"
+    return path if path in SERVED_FILES else "other"
+
+async def serve_request(state, method, path, query):
+    """
+    Answer one request. Returns (status, content type, body).
+    """
+    import asyncio
+
+    if method != "GET":
+        return 405, "text/plain; charset=utf-8", b"Only GET is supported\n"
+    if path == "/metrics":
+        return 200, SERVED_FILES[path], json.dumps(serve_metrics(state), indent=2).encode()
+    backend = query.get("backend", state["backend"])
+    if backend not in TABLE_BACKENDS:
+        return 400, "text/plain; charset=utf-8", f"Unknown backend {backend}\n".encode()
+
+    sheet = (state["workbook"], state["sheet"], await served_key(state), state["cache_dir"])
+    match = SECTION_PATH.fullmatch(path)
+    if match:
+        name, extension = match.groups()
+        if name not in SECTION_FILES:
+            return 404, "text/plain; charset=utf-8", f"No section {name}\n".encode()
+        if extension == "tex":
+            latex = await asyncio.to_thread(served_section, *sheet, name, backend)
+            return 200, "text/x-tex; charset=utf-8", latex.encode()
+        return 200, "application/json", (await asyncio.to_thread(served_items, *sheet, name)).encode()
+    if path in ("/menu.json", "/menu.html"):
+        target = path.rsplit(".", 1)[1]
+        return 200, SERVED_FILES[path], (await asyncio.to_thread(served_target, *sheet, target)).encode()
+    if path == "/menu.pdf":
+        pdf = await serve_pdf(state, (*sheet, backend))
+        if pdf is None:
+            return 503, "text/plain; charset=utf-8", b"Too many PDF builds are waiting, try again shortly\n"
+        return 200, SERVED_FILES[path], pdf
+    return 404, "text/plain; charset=utf-8", f"Nothing at {path}\n".encode()
+
+async def handle_connection(state, reader, writer):
+    """
+    Read one HTTP/1.1 request from the connection, answer it and close it.
+    A client that takes longer than REQUEST_TIMEOUT to send a line of it is
+    answered 408.
+    """
+    import asyncio
+    import collections
+    import urllib.parse
+
+    start = time.perf_counter()
+    try:
+        try:
+            request = (await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)).decode("latin-1").split()
+            while (await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)).strip():
+                pass  # Headers are not used
+        except asyncio.TimeoutError:
+            request = None
+        if request is None:
+            status, content_type, body, endpoint = 408, "text/plain; charset=utf-8", b"Request timed out\n", "other"
+        elif len(request) != 3:
+            status, content_type, body, endpoint = 400, "text/plain; charset=utf-8", b"Bad request\n", "other"
+        else:
+            url = urllib.parse.urlsplit(request[1])
+            endpoint = endpoint_name(url.path)
+            try:
+                status, content_type, body = await serve_request(state, request[0], url.path,
+                                                                 dict(urllib.parse.parse_qsl(url.query)))
+            except ValueError as error:
+                status, content_type, body = 422, "text/plain; charset=utf-8", f"{error}\n".encode()
+            except FileNotFoundError as error:
+                status, content_type, body = 503, "text/plain; charset=utf-8", f"{error}\n".encode()
+            except Exception as error:
+                status, content_type, body = 500, "text/plain; charset=utf-8", f"{error}\n".encode()
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+        state["latency"].setdefault(endpoint, collections.deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - start)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def start_server(workbook="data.xlsx", sheet="The Data", template="menu.tex", cache_dir=CACHE_DIR, backend="longtblr",
+                       host=SERVE_HOST, port=SERVE_PORT, latex_workers=LATEX_WORKERS):
+    """
+    Start serving the menu of `sheet` in `workbook` on `host`:`port` (0 picks
+    a free port). Returns the asyncio server and its state.
+    """
+    import asyncio
+
+    state = serve_state(workbook, sheet, template, cache_dir, backend, latex_workers)
+    server = await asyncio.start_server(functools.partial(handle_connection, state), host, port)
+    return server, state
+
+async def fetch(host, port, path):
+    """
+    Local client for the server: GET `path` and return (status, body).
+    """
+    import asyncio
+
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), body
+
+def serve(workbook="data.xlsx", sheet="The Data", template="menu.tex", cache_dir=CACHE_DIR, backend="longtblr",
+          host=SERVE_HOST, port=SERVE_PORT, latex_workers=LATEX_WORKERS):
+    """
+    Serve the menu until interrupted (see `start_server`).
+    """
+    import asyncio
+
+    async def run():
+        server, state = await start_server(workbook, sheet, template, cache_dir, backend, host, port, latex_workers)
+        port_used = server.sockets[0].getsockname()[1]
+        print(f"Serving {workbook} on http://{host}:{port_used}, press Ctrl+C to stop")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            state["pool"].shutdown(wait=False, cancel_futures=True)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Stopped serving")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the LaTeX tables for menu.tex from the workbook.")
+    parser.add_argument("workbook", nargs="?", default="data.xlsx", help="Excel workbook to read (default: data.xlsx)")
+    parser.add_argument("--batch", metavar="MANIFEST", help="build every venue listed in a JSON manifest instead")
+    parser.add_argument("--sheet", default="The Data", help="sheet holding the menu (default: 'The Data')")
+    parser.add_argument("--sections", type=lambda value: [name.strip() for name in value.split(",") if name.strip()],
+                        help=f"comma-separated sections to build, from: {', '.join(SECTION_FILES)} (default: all)")
+    parser.add_argument("--out-dir", default=".", help="directory for the generated .tex files (default: .)")
+    parser.add_argument("--stream", action="store_true", help="read the sheet row by row without pandas, for very large sheets")
+    parser.add_argument("--force", action="store_true", help="regenerate every section even if its rows did not change")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help=f"render sections in this many processes at once when there are {POOL_ROWS} rows or more, "
+                             "0 for one per CPU (default: 1); slower on one CPU")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="write the tables without first checking the prices, required fields and characters of every row")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbook instead of using the cached copy")
+    parser.add_argument("--sections-config", metavar="JSON",
+                        help="describe the sections with the specs in this file instead of menu_sections.json")
+    parser.add_argument("--targets", type=lambda value: [name.strip() for name in value.split(",") if name.strip()], default=[],
+                        help=f"comma-separated other files to write from the same pass, from: "
+                             f"{', '.join(name + ' (' + target['file'] + ')' for name, target in MENU_TARGETS.items())}")
+    parser.add_argument("--backend", default="longtblr",
+                        help=f"table markup to emit, one of: {', '.join(TABLE_BACKENDS)} (default: longtblr)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, rebuilding the tables and menu.pdf whenever the workbook or menu.tex is saved")
+    parser.add_argument("--pdf", action="store_true",
+                        help="compile menu.tex in the output directory afterwards, with its preamble precompiled")
+    parser.add_argument("--fragments", action="store_true",
+                        help="with --pdf or --watch, typeset each page break of menu.tex on its own and reuse the unchanged ones")
+    parser.add_argument("--serve", nargs="?", type=int, const=SERVE_PORT, metavar="PORT",
+                        help=f"instead of building, serve the tables, the targets and menu.pdf over HTTP (default port: {SERVE_PORT})")
+    parser.add_argument("--host", default=SERVE_HOST, help=f"with --serve, the address to listen on (default: {SERVE_HOST})")
+    parser.add_argument("--latex-jobs", type=int, default=LATEX_WORKERS,
+                        help=f"with --serve, PDFs compiled at the same time (default: {LATEX_WORKERS})")
+    parser.add_argument("--profile", nargs="?", const="menu-profile.json", metavar="REPORT",
+                        help="record the time, CPU, peak memory and rows of each stage and section (with --jobs 1) "
+                             "into a JSON report (default: menu-profile.json)")
+    parser.add_argument("--cprofile", metavar="FILE", help="with --profile, dump cProfile statistics of the render phase to FILE")
+    parser.add_argument("--diff", metavar="OLD_WORKBOOK",
+                        help="instead of building, print the items added, removed and repriced since OLD_WORKBOOK")
+    parser.add_argument("--diff-json", metavar="FILE", help="with --diff, also write the changes to FILE as JSON")
+    parser.add_argument("--pages", action="store_true",
+                        help="print the predicted pages of each section and of the menu against menu.log")
+    args = parser.parse_args(argv)
+    # These never finish a single build whose stages the report could hold
+    for option, value in (("--serve", args.serve is not None), ("--watch", args.watch), ("--diff", args.diff)):
+        if args.profile and value:
+            parser.error(f"--profile cannot be combined with {option}")
+    # menu.tex itself only loads what the longtblr tables need
+    if (args.pdf or args.watch) and TABLE_BACKENDS.get(args.backend, {}).get("preamble"):
+        parser.error(f"--backend {args.backend} cannot be compiled into menu.tex yet, compare it with bench.py --backends")
+    return args
+
+def print_result(result, prefix=""):
+    for line in routing_report(result):
+        print(prefix + line)
+    print(prefix + "Regenerated: " + (", ".join(result["regenerated"]) or "nothing"))
+    print(prefix + "Skipped (unchanged): " + (", ".join(result["skipped"]) or "nothing"))
+
+def print_page_report(report):
+    for name, pages in report["sections"].items():
+        print(f"    {name}: {pages} page(s)")
+    actual = "no compile in menu.log" if report["actual"] is None else f"{report['actual']} in menu.log"
+    print(f"Pages: {report['predicted']} predicted, {actual}")
+
+def print_compile(compiled):
+    if compiled["format"] == "built":
+        preamble = f", preamble format built in {compiled['format_seconds']:.2f}s"
+    elif compiled["format"] == "reused":
+        preamble = ", preamble format reused"
+    elif compiled["format"] == "failed":
+        preamble = ", preamble read in full (its format logged more errors)"
+    else:
+        preamble = ", preamble read in full"
+    if "fragments" in compiled:
+        preamble += f", {compiled['fragments'] - compiled['cached']} of {compiled['fragments']} fragment(s) compiled"
+    print(f"Compiled {compiled['pdf']}: {compiled['passes']} pass(es) in {compiled['seconds']:.2f}s{preamble}")
+    memory = compiled.get("memory") or {}
+    if "main" in memory:
+        used, limit = memory["main"]
+        print(f"TeX used {used:,} of {limit:,} words of main memory ({used / limit:.0%})")
+    if compiled["errors"]:
+        print(f"Warning: pdflatex logged {compiled['errors']} error(s), see the .log file")
+
+def print_profile(report, path):
+    for record in report["records"]:
+        name = record["stage"] if record["section"] is None else f"    {record['section']}"
+        rows = "" if record["rows"] is None else f", {record['rows']} rows"
+        print(f"{name}: {record['wall']:.3f}s wall, {record['cpu']:.3f}s CPU, "
+              f"{record['peak_memory'] / 2**20:.1f} MiB peak{rows}")
+    print(f"Profile written to {path}")
+
+def write_profile(report, path):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+        file.write("\n")
+    return report
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        start_profiling(args.cprofile)
+    options = dict(
+        stream=args.stream,
+        force=args.force,
+        cache_dir=None if args.no_cache else CACHE_DIR,
+        jobs=args.jobs or os.cpu_count(),
+        backend=args.backend,
+        validate=not args.no_validate,
+        targets=args.targets,
+    )
+    try:
+        if args.sections_config:
+            use_section_specs(read_section_specs(args.sections_config))
+        if args.batch:
+            start = time.perf_counter()
+            results = build_batch(args.batch, **options)
+            for venue, result, seconds in results:
+                print(f"{venue['name']}: {len(result['regenerated'])} regenerated, {len(result['skipped'])} skipped in {seconds:.2f}s")
+                print_result(result, prefix="    ")
+            print(f"Built {len(results)} venue(s) in {time.perf_counter() - start:.2f}s")
+            if args.profile:
+                print_profile(write_profile(stop_profiling(), args.profile), args.profile)
+            return
+
+        if args.serve is not None:
+            serve(args.workbook, args.sheet, os.path.join(args.out_dir, "menu.tex"), options["cache_dir"], args.backend,
+                  args.host, args.serve, max(1, args.latex_jobs))
+            return
+
+        if args.diff:
+            changes = diff_sheets(load_sheet(args.diff, args.sheet, options["cache_dir"]),
+                                  load_sheet(args.workbook, args.sheet, options["cache_dir"]))
+            for line in diff_report(changes) or ["No changes"]:
+                print(line)
+            if args.diff_json:
+                with open(args.diff_json, "w") as file:
+                    json.dump(diff_json(changes), file, indent=2, ensure_ascii=False)
+                    file.write("\n")
+            return
+
+        if args.watch:
+            watch(args.workbook, args.sheet, args.sections, args.out_dir, fragments=args.fragments, **options)
+            return
+
+        result = build_menu(args.workbook, args.sheet, sections=args.sections, out_dir=args.out_dir, **options)
+        if args.pdf:
+            compile_menu = compile_fragments if args.fragments else compile_pdf
+            with profiled("compile"):
+                compiled = compile_menu(os.path.join(args.out_dir, "menu.tex"), options["cache_dir"])
+        if args.pages:
+            df = load_sheet(args.workbook, args.sheet, options["cache_dir"])
+            report = page_report(df, os.path.join(args.out_dir, "menu.log"))
+    except (ValueError, FileNotFoundError) as error:
+        sys.exit(f"Error: {error}")
+
+    print_result(result)
+    if args.pdf:
+        print_compile(compiled)
+    if args.pages:
+        print_page_report(report)
+    if args.profile:
+        print_profile(write_profile(stop_profiling(), args.profile), args.profile)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bench  # noqa: E402
+import menu  # noqa: E402
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    """
+    Write a synthetic workbook into a scratch folder and build from there, so
+    the section manifest and caches never touch the repository.
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def write(rows=300, seed=0):
+        path = str(tmp_path / f"data-{rows}-{seed}.xlsx")
+        bench.synthetic_sheet(rows, seed).to_excel(path, sheet_name="The Data", index=False)
+        return path
+    return write
+
+
+@pytest.fixture
+def specs():
+    """
+    Restore the specs of menu_sections.json after a test that swaps in others.
+    """
+    sources = menu.read_section_specs()
+    yield sources
+    menu.use_section_specs(sources)
@@ -0,0 +1,27 @@
+import bench
+
+
+def test_stages_are_the_build_stages(workbook, tmp_path):
+    (tmp_path / "pandas").mkdir()
+    (tmp_path / "stream").mkdir()
+    seconds, outputs = bench.time_stages(workbook(200), str(tmp_path / "pandas"))
+    assert list(seconds) == bench.STAGES[:-1]
+    assert outputs == bench.streamed_outputs(workbook(200), str(tmp_path / "stream"))
+
+
+def test_the_baseline_covers_every_stage_and_size():
+    baseline = bench.load_baseline(bench.BASELINE)
+    assert sorted(baseline, key=int) == ["100", "1000", "10000"]
+    for result in baseline.values():
+        assert sorted(result["seconds"]) == sorted(bench.STAGES[:-1])
+
+
+def test_regressions_against_the_baseline():
+    baseline = {"seconds": {"render": 0.2, "route": 0.001}, "outputs": {"wine_tables.tex": "a"}}
+    seconds = {"render": 0.35, "route": 0.005}
+    problems = bench.compare_baseline(100, seconds, {"wine_tables.tex": "b"}, baseline)
+    assert problems == [
+        "100 rows: render took 0.3500s against 0.2000s in the baseline",
+        "100 rows: wine_tables.tex differs from the baseline output",
+    ]
+    assert bench.compare_baseline(100, {"render": 0.25}, {"wine_tables.tex": "a"}, baseline) == []
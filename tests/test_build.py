@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import bench
+import menu
+
+
+def written(directory):
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name)) as file:
+            files[name] = file.read()
+    return files
+
+
+@pytest.mark.parametrize("backend", list(menu.TABLE_BACKENDS))
+def test_stream_writes_the_same_files_as_pandas(workbook, backend):
+    path = workbook(400)
+    menu.build_menu(path, out_dir="pandas", backend=backend, force=True, cache_dir=None)
+    menu.build_menu(path, out_dir="stream", backend=backend, stream=True)
+    assert written("pandas") == written("stream")
+
+
+def test_stream_writes_the_same_chunks_as_pandas(workbook, specs):
+    menu.use_section_specs([dict(source, chunk_rows=5) if source["name"] == "wine" else source for source in specs])
+    path = workbook(400)
+    menu.build_menu(path, out_dir="pandas", force=True, cache_dir=None)
+    menu.build_menu(path, out_dir="stream", stream=True)
+    files = written("pandas")
+    assert "wine_tables-2.tex" in files
+    assert files == written("stream")
+
+
+def test_unchanged_sections_are_skipped(workbook):
+    path = workbook(200)
+    first = menu.build_menu(path, out_dir="out", cache_dir=None)
+    second = menu.build_menu(path, out_dir="out", cache_dir=None)
+    assert first["regenerated"] and not second["regenerated"]
+
+
+def test_a_spec_can_print_any_column(tmp_path, monkeypatch, specs):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(menu, "POOL_ROWS", 0)
+    df = bench.synthetic_sheet(300)
+    df["Notes"] = [f"Note {number}" for number in range(len(df))]
+    df.to_excel("notes.xlsx", sheet_name="The Data", index=False)
+    menu.use_section_specs([
+        dict(source, cells=dict(source["cells"], name={"text": "Notes"})) if source["name"] == "beer_cider" else source
+        for source in specs
+    ])
+    menu.build_menu("notes.xlsx", out_dir="serial", force=True, cache_dir=None)
+    menu.build_menu("notes.xlsx", out_dir="pool", force=True, cache_dir=None, jobs=2)
+    menu.build_menu("notes.xlsx", out_dir="stream", stream=True)
+    files = written("serial")
+    assert "{Note " in files["beer_cider_table.tex"]
+    assert files == written("pool") == written("stream")
+
+
+def test_small_sheets_are_rendered_without_a_pool(monkeypatch):
+    import concurrent.futures
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("started a process pool")
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", no_pool)
+    df = bench.synthetic_sheet(1000)
+    tasks = [(name, data) for name, data, _ in menu.select_sections(df)]
+    assert menu.render_sections(tasks, jobs=4) == menu.render_sections(tasks)
+
+
+@pytest.mark.parametrize("option", ["--pdf", "--watch"])
+def test_longtable_is_not_compiled_into_menu_tex(option, capsys):
+    with pytest.raises(SystemExit) as error:
+        menu.parse_args(["--backend", "longtable", option])
+    assert error.value.code == 2
+    assert "--backend longtable cannot be compiled" in capsys.readouterr().err
+
+
+def test_copies_get_the_preamble_of_their_backend(tmp_path):
+    document = tmp_path / "menu.tex"
+    document.write_text("\\documentclass{article}\n\\usepackage{makecell}\n\\begin{document}\nMenu\n\\end{document}\n")
+    for _ in range(2):
+        menu.add_to_preamble(str(document), menu.TABLE_BACKENDS["longtable"]["preamble"])
+    preamble, body = document.read_text().split("\\begin{document}")
+    assert preamble.count("\\usepackage{longtable}") == 1 and body == "\nMenu\n\\end{document}\n"
+    menu.add_to_preamble(str(document), menu.TABLE_BACKENDS["longtblr"]["preamble"])
+    assert document.read_text().split("\\begin{document}")[0] == preamble
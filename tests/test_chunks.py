@@ -0,0 +1,72 @@
+import pandas as pd
+
+import menu
+
+
+def wine_rows(count, heading="Wine - Red"):
+    return pd.DataFrame([
+        {"Heading": heading, "Glass": 14.0, "Carafe": 45.0, "Bottle": 70.0, "Vintage": 2022,
+         "Winery": f"Winery {number}", "Name": "Shiraz", "Grape Variety": "Shiraz",
+         "Winemaker and/or Owner": "Someone", "Region": "Hunter", "Description": "Dark fruit."}
+        for number in range(count)
+    ])
+
+
+def entries(latex):
+    return latex.count("\\SetCell[c=3]{\\linewidth}{")
+
+
+def test_a_short_list_is_one_table():
+    latex = menu.generate_wine_menu(wine_rows(10), chunk_rows=10)
+    assert menu.CHUNK_BREAK not in latex
+    assert latex.count("\\begin{longtblr}") == 1
+
+
+def test_chunks_hold_at_most_chunk_rows_entries():
+    chunks = menu.generate_wine_menu(wine_rows(23), chunk_rows=10).split(menu.CHUNK_BREAK)
+    assert [entries(chunk) for chunk in chunks] == [10, 10, 3]
+    assert all(chunk.count("\\begin{longtblr}") == chunk.count("\\end{longtblr}") == 1 for chunk in chunks)
+    for chunk in chunks[1:]:
+        assert chunk.startswith("\\needspace")
+        assert "theme = TASMenuContinued" in chunk
+        assert "caption = \\LARGE{Wine - Red}" in chunk
+
+
+def test_no_chunk_ends_on_a_page_break():
+    for chunk_rows in range(1, 12):
+        latex = menu.generate_wine_menu(wine_rows(40), chunk_rows=chunk_rows)
+        assert menu.WINE_PAGEBREAK + menu.WINE_CHUNK_END not in latex
+
+
+def test_a_new_heading_starts_a_new_count():
+    data = pd.concat([wine_rows(7), wine_rows(7, "Wine - White")], ignore_index=True)
+    chunks = menu.generate_wine_menu(data, chunk_rows=5).split(menu.CHUNK_BREAK)
+    assert [entries(chunk) for chunk in chunks] == [5, 7, 2]
+
+
+def test_longtable_is_never_chunked():
+    assert menu.CHUNK_BREAK not in menu.generate_wine_menu(wine_rows(23), "longtable", chunk_rows=10)
+
+
+def test_write_section_splits_and_removes_stale_chunks(tmp_path):
+    path = str(tmp_path / "wine_tables.tex")
+    assert menu.write_section(path, "one" + menu.CHUNK_BREAK + "two" + menu.CHUNK_BREAK + "three")
+    assert (tmp_path / "wine_tables.tex").read_text() == (
+        "\\input{wine_tables-1.tex}\n\\input{wine_tables-2.tex}\n\\input{wine_tables-3.tex}\n"
+    )
+    assert (tmp_path / "wine_tables-3.tex").read_text() == "three"
+    chunked = menu.section_hash(path)
+
+    (tmp_path / "wine_tables-2.tex").write_text("edited")
+    assert menu.section_hash(path) != chunked
+
+    assert menu.write_section(path, "whole")
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["wine_tables.tex"]
+    assert menu.section_hash(path) == menu.file_hash(path)
+
+
+def test_wine_tables_are_not_chunked_unless_the_spec_asks():
+    assert menu.SECTION_SPECS["wine"]["chunk_rows"] == 0
+    assert menu.CHUNK_BREAK not in menu.generate_wine_menu(wine_rows(150))
+    assert "TASMenuContinued" in menu.WINE_CHUNK_PREAMBLE
+    assert "TASMenuContinued" not in open("menu.tex", encoding="utf-8").read()
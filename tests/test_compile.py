@@ -0,0 +1,56 @@
+import os
+import shutil
+
+import pytest
+
+import bench
+import menu
+
+needs_latex = pytest.mark.skipif(shutil.which(menu.LATEX) is None, reason=f"{menu.LATEX} is not installed")
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "menu.tex"
+    path.write_text("\\documentclass{article}\n\\usepackage{graphicx}\n\\begin{document}\nMenu\n\\end{document}\n")
+    return str(path)
+
+
+def cached_format(document, *extensions):
+    """
+    Leave files named like the format of `document` in its .cache folder, and return the format.
+    """
+    directory = os.path.dirname(document)
+    fmt = os.path.join(".cache", "menu-preamble-" + menu.preamble_hash(menu.split_preamble(document), directory)[:16])
+    os.makedirs(os.path.join(directory, ".cache"))
+    for extension in extensions:
+        open(os.path.join(directory, fmt + extension), "w").close()
+    return fmt
+
+
+def test_a_dumped_format_is_reused(document):
+    fmt = cached_format(document, ".fmt")
+    assert menu.preamble_format(document, ".cache") == (fmt, False)
+
+
+def test_a_format_that_logged_more_errors_is_not_used(document):
+    cached_format(document, ".fmt", menu.FORMAT_FAILED)
+    assert menu.preamble_format(document, ".cache") == (None, False)
+
+
+@needs_latex
+def test_the_format_typesets_the_same_menu(tmp_path):
+    for asset in bench.MENU_ASSETS:
+        shutil.copy(asset, tmp_path)
+    df = menu.load_sheet("data.xlsx", "The Data", cache_dir=None)
+    for name, section_df, _ in menu.select_sections(df):
+        menu.write_section(str(tmp_path / menu.SECTION_FILES[name]), menu.render_section(name, section_df))
+    tex_path = str(tmp_path / "menu.tex")
+    plain = menu.compile_pdf(tex_path, cache_dir=None)
+    built = menu.compile_pdf(tex_path)
+    reused = menu.compile_pdf(tex_path)
+    for compiled in (plain, built, reused):
+        print(f"format {compiled['format']}: {compiled['pages']} pages, {compiled['passes']} passes in "
+              f"{compiled['seconds']:.2f}s, memory {compiled['memory']}, {compiled['errors']} errors")
+    assert plain["pages"] and built["pages"] == reused["pages"] == plain["pages"]
+    assert reused["format"] in ("reused", None) and reused["errors"] <= plain["errors"]
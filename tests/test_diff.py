@@ -0,0 +1,43 @@
+import pandas as pd
+
+import menu
+
+
+def sheet(rows):
+    columns = ["Heading", "Glass", "Carafe", "Bottle", "Vintage", "Winery", "Name", "Grape Variety"]
+    return pd.DataFrame([dict(zip(columns, row)) for row in rows], columns=columns)
+
+
+RED = ("Wine - Red", 14.0, 45.0, 70.0, 2022.0, "Tumblong Hills", "Nebbiolo", "Nebbiolo")
+SPARKLING = ("Wine - Sparkling", 15.0, None, 75.0, "NV", "See Saw", "Balance", "Chardonnay")
+GIN = ("Gin", 12.0, None, None, None, "Archie Rose", None, "Signature Dry Gin")
+
+
+def test_added_removed_and_repriced():
+    old = sheet([RED, SPARKLING])
+    new = sheet([RED[:1] + (15.0,) + RED[2:], GIN])
+    changes = menu.diff_sheets(old, new)
+    assert changes["added"] == [("Gin", "Archie Rose", None, None)]
+    assert changes["removed"] == [("Wine - Sparkling", "See Saw", "Balance", "NV")]
+    assert changes["repriced"] == [(("Wine - Red", "Tumblong Hills", "Nebbiolo", 2022), {"Glass": (14, 15)})]
+
+
+def test_vintages_read_as_floats_match_ints():
+    old = sheet([RED])
+    new = sheet([RED[:4] + (2022,) + RED[5:]])
+    assert menu.diff_sheets(old, new) == menu.diff_sheets(old, old)
+
+
+def test_prices_the_heading_does_not_print_are_ignored():
+    old = sheet([SPARKLING, GIN])
+    new = sheet([SPARKLING[:2] + (86.25,) + SPARKLING[3:], GIN[:3] + (120.0,) + GIN[4:]])
+    assert menu.diff_sheets(old, new)["repriced"] == []
+
+
+def test_rows_sharing_a_key_are_told_apart_by_grape_variety():
+    tonic = GIN[:-1] + ("Tonic",)
+    old = sheet([GIN, tonic])
+    new = sheet([GIN, tonic[:1] + (13.0,) + tonic[2:]])
+    changes = menu.diff_sheets(old, new)
+    assert changes["repriced"] == [(("Gin", "Archie Rose", None, None, "Tonic"), {"Glass": (12, 13)})]
+    assert menu.diff_report(changes) == ["~ Gin: Archie Rose (Tonic): Glass 12 -> 13"]
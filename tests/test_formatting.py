@@ -0,0 +1,43 @@
+import pandas as pd
+
+import menu
+
+
+def test_escape_latex_special_characters():
+    assert menu.escape_latex("Smith & Sons 100% #3 $12") == r"Smith \& Sons 100\% \#3 \$12"
+    assert menu.escape_latex("{house}_blend ~ ^") == r"\{house\}\_blend \textasciitilde{} \textasciicircum{}"
+    assert menu.escape_latex("back\\slash") == r"back\textbackslash{}slash"
+
+
+def test_escape_latex_keeps_line_breaks_and_non_text():
+    assert menu.escape_latex("Tap \\\\ beer") == "Tap \\\\ beer"
+    assert menu.escape_latex(12.5) == 12.5
+
+
+def test_escaped_column_matches_escape_latex():
+    column = pd.Series(["a & b", None, "a & b", "50%"])
+    assert menu.escaped_column(column, missing="~").tolist() == [r"a \& b", "~", r"a \& b", r"50\%"]
+
+
+def test_price_column():
+    column = pd.Series([12.0, 12.5, None, "POA"], dtype=object)
+    assert menu.price_column(column, missing="-", fraction="{:.1f}").tolist() == ["12", "12.5", "-", "POA"]
+
+
+def test_cell_price_matches_price_column():
+    for value in (12.0, 12.5, 9.25, None, "POA"):
+        expected = menu.price_column(pd.Series([value], dtype=object), fraction="{:.2f}")[0]
+        assert menu.cell_price(value, fraction="{:.2f}") == expected
+
+
+def test_wine_prices_leave_out_the_carafe_of_no_carafe_headings():
+    data = pd.DataFrame({column: [None, None] for column in menu.WINE_COLUMNS})
+    data["Heading"] = ["Wine - Red", "Wine - Sparkling"]
+    data["Glass"] = [14.0, 15.0]
+    data["Carafe"] = [48.5, 50.0]
+    data["Bottle"] = [70.0, 75.0]
+    entries, _ = menu.render_wine_entries(data)
+    assert "{\\\\14/49/70}" in entries[0]
+    assert "{\\\\15/75}" in entries[1]
+    for row, entry in zip(data.to_dict("records"), entries):
+        assert menu.render_wine_entry(row)[0] == entry
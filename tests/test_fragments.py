@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import pytest
+
+import bench
+import menu
+
+needs_latex = pytest.mark.skipif(shutil.which(menu.LATEX) is None, reason=f"{menu.LATEX} is not installed")
+
+
+@pytest.fixture
+def document(tmp_path):
+    shutil.copy("menu.tex", tmp_path)
+    df = menu.load_sheet("data.xlsx", "The Data", cache_dir=None)
+    for name, section_df, _ in menu.select_sections(df):
+        menu.write_section(str(tmp_path / menu.SECTION_FILES[name]), menu.render_section(name, section_df))
+    return str(tmp_path / "menu.tex")
+
+
+def test_menu_tex_splits_at_its_page_breaks(document):
+    preamble, fragments = menu.split_fragments(document)
+    assert "\\documentclass" in preamble
+    assert len(fragments) == 10
+    inputs = [name for fragment in fragments for name in menu.FRAGMENT_FILES.findall(menu.uncommented(fragment))]
+    assert [name for name in inputs if name.endswith(".tex")] == [menu.SECTION_FILES[name] for name in menu.SECTION_FILES]
+    # The commented \newpage after the wine list is not a break
+    assert "\\input{wine_tables.tex}" in fragments[3] and "%\\newpage" in fragments[3]
+
+
+def test_a_fragment_key_follows_its_own_inputs_and_first_page(document):
+    directory = os.path.dirname(document)
+    preamble, fragments = menu.split_fragments(document)
+    wine, beer = fragments[3], fragments[4]
+    keys = menu.fragment_key(preamble, wine, 4, directory), menu.fragment_key(preamble, beer, 8, directory)
+    with open(os.path.join(directory, "beer_cider_table.tex"), "a") as file:
+        file.write("% edited\n")
+    assert menu.fragment_key(preamble, wine, 4, directory) == keys[0]
+    assert menu.fragment_key(preamble, beer, 8, directory) != keys[1]
+    assert menu.fragment_key(preamble, wine, 5, directory) != keys[0]
+    assert menu.fragment_key(preamble + "% more\n", wine, 4, directory) != keys[0]
+
+
+def test_a_fragment_is_compiled_when_its_pdf_is_newer(tmp_path):
+    stem = str(tmp_path / "menu-3-key")
+    assert not menu.fragment_compiled(stem)
+    open(stem + ".tex", "w").close()
+    assert not menu.fragment_compiled(stem)
+    open(stem + ".pdf", "w").close()
+    os.utime(stem + ".tex", (0, 0))
+    assert menu.fragment_compiled(stem)
+
+
+@needs_latex
+def test_fragments_typeset_the_same_pages_as_the_whole_menu(document):
+    for asset in bench.MENU_ASSETS[1:]:
+        shutil.copy(asset, os.path.dirname(document))
+    whole = menu.compile_pdf(document, cache_dir=None)
+    first = menu.compile_fragments(document)
+    again = menu.compile_fragments(document)
+    for compiled in (whole, first, again):
+        print(f"{compiled.get('fragments', 'whole')}: {compiled['pages']} pages, {compiled['passes']} passes in "
+              f"{compiled['seconds']:.2f}s, memory {compiled['memory']}, {compiled['errors']} errors")
+    assert first["pages"] == again["pages"] == whole["pages"]
+    assert again["cached"] == again["fragments"] and again["passes"] == 0
@@ -0,0 +1,55 @@
+import math
+import os
+
+import pytest
+
+import menu
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def document(tmp_path):
+    for name in ("logo.PNG", "map.JPG", "photo.jpeg"):
+        Image.radial_gradient("L").resize((3000, 2000)).convert("RGB").save(tmp_path / name)
+    (tmp_path / "menu.tex").write_text(
+        "\\includegraphics[width=\\textwidth]{\\menuimage{logo.PNG}}\n"
+        "\\includegraphics[width=0.5\\textwidth]{map.JPG}\n"
+        "% \\includegraphics{unused.png}\n"
+        "\\includegraphics[width=40mm]{photo.jpeg}\n"
+    )
+    return tmp_path
+
+
+def test_copies_keep_the_format_of_any_extension(document):
+    optimized = menu.optimize_images(str(document / "menu.tex"), cache_dir=".cache")
+    images = {image["source"]: image for image in optimized["images"]}
+    assert sorted(images) == ["logo.PNG", "map.JPG", "photo.jpeg"]
+    formats = {"logo.PNG": "PNG", "map.JPG": "JPEG", "photo.jpeg": "JPEG"}
+    for name, image in images.items():
+        assert image["optimized"] and image["after"] < image["before"]
+        with Image.open(document / image["optimized"]) as copy:
+            assert copy.format == formats[name]
+    assert images["map.JPG"]["optimized"].endswith(f"-{math.ceil(0.5 * menu.LINE_WIDTH / 72.27 * menu.IMAGE_DPI)}.JPG")
+    images_tex = (document / menu.IMAGES_TEX).read_text()
+    assert f"\\csname menuimage@map.JPG\\endcsname{{{images['map.JPG']['optimized']}}}" in images_tex
+
+
+def test_unchanged_images_are_cached(document):
+    menu.optimize_images(str(document / "menu.tex"), cache_dir=".cache")
+    again = menu.optimize_images(str(document / "menu.tex"), cache_dir=".cache")
+    assert all(image["cached"] for image in again["images"])
+    assert len(os.listdir(document / ".cache" / menu.IMAGES_DIR)) == 3
+
+
+def test_a_copy_of_menu_tex_is_switched_over_to_the_copies(tmp_path):
+    document = tmp_path / "menu.tex"
+    document.write_text(open("menu.tex", encoding="utf-8").read(), encoding="utf-8")
+    assert "\\menuimage" not in document.read_text(encoding="utf-8")
+    for _ in range(2):
+        menu.use_menu_images(str(document))
+    latex = document.read_text(encoding="utf-8")
+    assert latex.count("\\InputIfFileExists{images.tex}") == 1
+    assert "{\\menuimage{Art Syndicate_LOGO_v2_FINAL.png}}" in latex
+    assert "{\\menuimage{Wine Map.png}}" in latex
+    assert sorted(menu.included_images(str(document))) == ["Art Syndicate_LOGO_v2_FINAL.png", "Wine Map.png"]
@@ -0,0 +1,38 @@
+import pytest
+
+import menu
+
+
+@pytest.fixture(scope="module")
+def sheet():
+    return menu.load_sheet("data.xlsx", "The Data", cache_dir=None)
+
+
+@pytest.mark.parametrize("lines, height", [(7, 116), (8, 128), (9, 140)])
+def test_wine_entries_take_the_height_they_have_in_menu_pdf(lines, height):
+    details = " \\\\ ".join(["line"] * (lines - 1))
+    assert menu.wine_entry_height(details, "", "short") == height
+
+
+def test_table_rows_take_the_height_they_have_in_menu_pdf():
+    assert menu.row_height("one line") == 28
+    assert menu.row_height("two \\\\ lines", "one") == 40
+
+
+def test_the_wines_that_compiled_come_to_the_pages_of_menu_pdf(sheet):
+    # The compile in menu.log stopped reading wine_tables.tex after the Rosé table
+    typeset = ["Wine - Sparkling", "Wine - White", "Wine - Amber", "Wine - Rosé"]
+    wines = sheet["Heading"].str.startswith("Wine - ")
+    df = sheet[~wines | sheet["Heading"].isin(typeset)]
+    pages = menu.predict_pages(df)
+    assert pages == {
+        "wine": 4, "beer_cider": 1, "cocktails": 1, "spirits": 3,
+        "more_spirits": 0, "non_alcoholic": 1, "food": 1,
+    }
+    report = menu.page_report(df)
+    assert report["predicted"] == report["actual"] == 15
+
+
+def test_a_run_on_section_only_counts_the_pages_it_begins(sheet):
+    pages = menu.predict_pages(sheet)
+    assert pages["more_spirits"] == 0
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+import menu
+
+
+def test_profile_report(workbook, capsys):
+    path = workbook(300)
+    menu.main([path, "--out-dir", "out", "--no-cache", "--profile", "profile.json", "--cprofile", "render.prof"])
+    with open("profile.json") as file:
+        report = json.load(file)
+    stages = [record["stage"] for record in report["records"] if record["section"] is None]
+    assert stages == ["load", "route", "validate", "render", "write"]
+    sections = {record["section"]: record["rows"] for record in report["records"] if record["section"] is not None}
+    assert sections["wine"] > 0 and set(sections) <= set(menu.SECTION_FILES)
+    assert report["total"]["wall"] == pytest.approx(sum(
+        record["wall"] for record in report["records"] if record["section"] is None
+    ))
+    assert "Profile written to profile.json" in capsys.readouterr().out
+    with open("render.prof", "rb") as file:
+        assert file.read()
+
+
+@pytest.mark.parametrize("option", [["--serve"], ["--watch"], ["--diff", "old.xlsx"]])
+def test_profile_needs_a_build_to_report(option, capsys):
+    with pytest.raises(SystemExit) as error:
+        menu.main(["--profile", *option])
+    assert error.value.code == 2
+    assert f"--profile cannot be combined with {option[0]}" in capsys.readouterr().err
@@ -0,0 +1,27 @@
+import pandas as pd
+
+import bench
+import menu
+
+
+def test_each_row_goes_to_its_first_matching_section():
+    df = pd.DataFrame({"Heading": ["Wine - Red", "Gin", None, "Agave", "Wine - Non-alcoholic", "Agave", "Rum", "Wine - Red"]})
+    routing = menu.route_sheet(df)
+    sections = {name: rows.tolist() for name, rows in routing["sections"].items() if len(rows)}
+    assert sections == {"wine": [0, 4, 7], "spirits": [1, 6]}
+    assert routing["unmatched"] == {"Agave": 2}
+    assert routing["ambiguous"] == {"Wine - Non-alcoholic": ["wine", "non_alcoholic"]}
+    assert menu.routing_report(routing) == [
+        "Warning: 2 row(s) with heading 'Agave' match no section and were left out",
+        "Warning: heading 'Wine - Non-alcoholic' matches wine, non_alcoholic; its rows went to wine only",
+    ]
+
+
+def test_routes_match_the_old_per_section_scans():
+    df = bench.synthetic_sheet(1000)
+    routing = menu.route_sheet(df)
+    selected = {name: data for name, data, _ in menu.select_sections(df, routing)}
+    old = dict(bench.sections(df))
+    for name in ("beer_cider", "cocktails", "more_spirits", "food"):
+        assert selected[name].index.tolist() == old[name].index.tolist()
+    assert sorted(routing["unmatched"]) == ["Agave"]
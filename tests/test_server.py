@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import bench
+import menu
+
+
+def serving(workbook, requests, cache_dir):
+    """
+    Start the server on `workbook`, run `requests(port)` against it and return what it returns.
+    """
+    async def run():
+        server, state = await menu.start_server(workbook, cache_dir=cache_dir, port=0)
+        try:
+            return await requests(server.sockets[0].getsockname()[1])
+        finally:
+            server.close()
+            await server.wait_closed()
+            state["pool"].shutdown()
+    return asyncio.run(run())
+
+
+def get(port, *paths):
+    return asyncio.gather(*(menu.fetch(menu.SERVE_HOST, port, path) for path in paths))
+
+
+def test_endpoints_answer_what_a_build_writes(workbook, tmp_path):
+    path = workbook(300)
+    menu.build_menu(path, out_dir="out", cache_dir=None, targets=["json", "html"])
+    paths = ["/sections/wine.tex", "/sections/spirits.tex?backend=longtable", "/sections/food.json",
+             "/menu.json", "/menu.html"]
+
+    async def requests(port):
+        answers = await get(port, *paths)
+        for path in ("/sections/wine.tex", "/metrics"):
+            answers.append(await menu.fetch(menu.SERVE_HOST, port, path))
+        return answers
+    answers = serving(path, requests, str(tmp_path / "cache"))
+    assert [status for status, _ in answers] == [200] * (len(paths) + 2)
+    with open("out/wine_tables.tex") as file:
+        assert answers[0][1].decode() == file.read()
+    assert answers[1][1].decode() == menu.render_section("spirits", menu.select_sections(
+        menu.load_sheet(path, "The Data", cache_dir=None), sections=["spirits"])[0][1], "longtable")
+    food = json.loads(answers[2][1])
+    assert food["name"] == "food" and food["items"] and all("name" in item for item in food["items"])
+    for name, (_, body) in (("menu.json", answers[3]), ("menu.html", answers[4])):
+        with open(f"out/{name}", "rb") as file:
+            assert body == file.read()
+    assert answers[5][1] == answers[0][1]
+    metrics = json.loads(answers[6][1])
+    assert metrics["latency"]["/sections/*.tex"]["requests"] >= 2
+    assert metrics["caches"]["sections"]["hits"] >= 1
+
+
+def test_errors(workbook, tmp_path):
+    answers = serving(workbook(100), lambda port: get(port, "/sections/dessert.tex", "/menu.tex", "/menu.json?backend=troff"),
+                      str(tmp_path / "cache"))
+    assert [status for status, _ in answers] == [404, 404, 400]
+
+
+def test_a_bad_sheet_is_unprocessable(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = bench.synthetic_sheet(100).astype({"Glass": object})
+    df.loc[0, "Glass"] = "twelve"
+    df.to_excel("bad.xlsx", sheet_name="The Data", index=False)
+    [(status, body)] = serving("bad.xlsx", lambda port: get(port, "/menu.json"), str(tmp_path / "cache"))
+    assert status == 422 and b"Glass 'twelve' is not a number" in body
+
+
+def test_a_stalled_request_times_out(workbook, tmp_path, monkeypatch):
+    monkeypatch.setattr(menu, "REQUEST_TIMEOUT", 0.1)
+
+    async def stall(port):
+        reader, writer = await asyncio.open_connection(menu.SERVE_HOST, port)
+        writer.write(b"GET /menu.json HTTP/1.1\r\n")
+        response = await reader.read()
+        writer.close()
+        return response
+
+    assert serving(workbook(100), stall, str(tmp_path / "cache")).startswith(b"HTTP/1.1 408 ")
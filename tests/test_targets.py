@@ -0,0 +1,56 @@
+import json
+
+import pandas as pd
+import pytest
+
+import menu
+
+
+def read(path):
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_json_catalog(workbook, stream):
+    path = workbook(300)
+    result = menu.build_menu(path, out_dir="out", stream=stream, cache_dir=None, targets=["json"])
+    assert "out/menu.json" in result["regenerated"]
+    catalog = json.loads(read("out/menu.json"))
+    assert [section["name"] for section in catalog["sections"]] == list(menu.SECTION_FILES)
+    wine = [item for item in catalog["items"] if item["section"] == "wine"]
+    assert wine and all(isinstance(item["glass"], (int, float)) for item in wine)
+    assert all("\\" not in value for item in catalog["items"] for value in item.values() if isinstance(value, str))
+
+
+def test_stream_writes_the_same_targets_as_pandas(workbook):
+    path = workbook(300)
+    menu.build_menu(path, out_dir="pandas", cache_dir=None, targets=["json", "html"])
+    menu.build_menu(path, out_dir="stream", stream=True, targets=["json", "html"])
+    for name in ("menu.json", "menu.html"):
+        assert read(f"pandas/{name}") == read(f"stream/{name}")
+
+
+def test_html_menu_escapes_text_and_groups_headings():
+    item = {"heading": "Wine - Red", "glass": 14, "carafe": 45, "bottle": 70.5, "vintage": 2022,
+            "winery": "Smith & Sons", "name": "<Reserve>", "region": "Hunter\nValley"}
+    assert menu.html_item(item) == (
+        '<li><span class="price">14/45/70.5</span><strong>2022 Smith &amp; Sons &lt;Reserve&gt;</strong>'
+        '<br><span class="details">Hunter<br>Valley</span></li>\n'
+    )
+    empty = pd.DataFrame(columns=menu.USED_COLUMNS)
+    page = menu.render_target([("wine", empty, menu.SECTION_SPECS["wine"])], "html")
+    assert page.startswith("<!DOCTYPE html>") and page.endswith("</html>\n")
+    assert '<section id="wine">' not in page
+
+
+def test_item_values():
+    assert menu.item_value(12.0) == 12
+    assert menu.item_value(float("nan")) is None
+    assert menu.item_value("  Hunter \\\\ Valley ") == "Hunter\nValley"
+    assert menu.item_value("   ") is None
+
+
+def test_unknown_targets_are_refused(workbook):
+    with pytest.raises(ValueError, match="Unknown targets: pdf"):
+        menu.build_menu(workbook(100), out_dir="out", targets=["pdf"])
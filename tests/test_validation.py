@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import bench
+import menu
+
+
+@pytest.fixture
+def bad_sheet():
+    df = bench.synthetic_sheet(300)
+    df["Glass"] = df["Glass"].astype(object)
+    wine = df.index[df["Heading"] == "Wine - Red"]
+    gin = df.index[df["Heading"] == "Gin"]
+    beer = df.index[df["Heading"] == "Beer & Cider"]
+    df.loc[wine[0], "Glass"] = "twelve"
+    df.loc[wine[1], "Vintage"] = None
+    df.loc[gin[0], "Glass"] = 250.0
+    df.loc[beer[0], "Name"] = "Lager ✓"
+    return df
+
+
+def test_synthetic_sheets_pass():
+    for rows in (100, 1000):
+        df = bench.synthetic_sheet(rows)
+        assert menu.validate_sheet(df, menu.select_sections(df)) == []
+
+
+@pytest.mark.parametrize("workbook", ["data.xlsx", "data2.xlsx"])
+def test_the_repository_workbooks_pass(workbook):
+    df = menu.load_sheet(os.path.join(os.path.dirname(menu.__file__), workbook), "The Data", cache_dir=None)
+    assert menu.validate_sheet(df, menu.select_sections(df)) == []
+
+
+def test_problems_name_the_workbook_row(bad_sheet):
+    problems = menu.validate_sheet(bad_sheet, menu.select_sections(bad_sheet))
+    messages = {(row, message) for row, _, message in problems}
+    wine = bad_sheet.index[bad_sheet["Heading"] == "Wine - Red"]
+    gin = bad_sheet.index[bad_sheet["Heading"] == "Gin"]
+    beer = bad_sheet.index[bad_sheet["Heading"] == "Beer & Cider"]
+    assert messages == {
+        (wine[0] + menu.FIRST_ROW, "Glass 'twelve' is not a number"),
+        (wine[1] + menu.FIRST_ROW, "Vintage is empty"),
+        (gin[0] + menu.FIRST_ROW, "Glass 250 is not between 5 and 100"),
+        (beer[0] + menu.FIRST_ROW, "Name has '✓' (U+2713), which pdflatex cannot typeset"),
+    }
+
+
+def test_a_null_heading_range_drops_the_column():
+    df = bench.synthetic_sheet(300)
+    sparkling = df.index[df["Heading"] == "Wine - Sparkling"]
+    df.loc[sparkling, "Carafe"] = None
+    assert menu.validate_sheet(df, menu.select_sections(df)) == []
+
+
+def test_streamed_rows_get_the_same_report(bad_sheet, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "bad.xlsx")
+    bad_sheet.to_excel(path, sheet_name="The Data", index=False)
+    reports = []
+    for stream in (False, True):
+        with pytest.raises(ValueError) as error:
+            menu.build_menu(path, out_dir="out", stream=stream, cache_dir=None)
+        reports.append(str(error.value))
+    assert reports[0] == reports[1]
+    assert reports[0].startswith("4 problem(s)")
+    assert not os.listdir("out")
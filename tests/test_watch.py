@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+import bench
+import menu
+
+
+def test_a_missing_file_does_not_hold_up_a_change(tmp_path):
+    workbook = tmp_path / "data.xlsx"
+    workbook.write_text("before")
+    states = {str(path): menu.file_state(str(path)) for path in (workbook, tmp_path / "menu.tex")}
+    threading.Timer(0.05, workbook.write_text, ["after"]).start()
+    start = time.perf_counter()
+    changed, _ = menu.wait_for_change(states, interval=0.01, settle=0.05)
+    assert changed == [str(workbook)]
+    assert time.perf_counter() - start < 5
+
+
+def test_a_deleted_file_is_not_a_change_until_it_comes_back(tmp_path):
+    workbook = tmp_path / "data.xlsx"
+    workbook.write_text("before")
+    states = {str(workbook): menu.file_state(str(workbook))}
+    workbook.unlink()
+    threading.Timer(0.3, workbook.write_text, ["after"]).start()
+    changed, states = menu.wait_for_change(states, interval=0.01, settle=0.05)
+    assert changed == [str(workbook)] and states[str(workbook)] is not None
+
+
+def test_a_bad_sheet_at_startup_waits_for_the_next_save(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    df = bench.synthetic_sheet(200)
+    bad = df.astype({"Glass": object})
+    bad.loc[0, "Glass"] = "twelve"
+    bad.to_excel("data.xlsx", sheet_name="The Data", index=False)
+    saves = []
+
+    def save(states, **_):
+        if saves:
+            raise KeyboardInterrupt
+        saves.append(True)
+        df.to_excel("data.xlsx", sheet_name="The Data", index=False)
+        states = {path: menu.file_state(path) for path in states}
+        return ["data.xlsx"], states
+
+    monkeypatch.setattr(menu, "wait_for_change", save)
+    menu.watch("data.xlsx", out_dir="out", cache_dir=None)
+    output = capsys.readouterr().out
+    assert "Error: 1 problem(s)" in output
+    assert "Regenerated: out/wine_tables.tex" in output
+    assert output.rstrip().endswith("Stopped watching")
+    assert "wine_tables.tex" in os.listdir("out")